@@ -0,0 +1,348 @@
+"""
+Synthetic source data for benchmarks
+
+Writes the seven sources of config.CSV_FILES (same headers, types and date formats as the real
+files) at any scale, so the pipeline can be profiled without copying production data.
+
+Cardinalities follow the real data set: 35 stores in 7 countries, ~12 employees per store,
+up to 17,940 products, one customer per ~4 transaction lines, 1-3 lines per invoice and
+daily exchange rates for USD, EUR, GBP and CNY. Every value is derived from a hash of the
+row number, so the output is the same for a given seed and Polars version.
+
+Usage:
+    python -m benchmarks.generate_data --rows 10M --output data/synthetic_10m
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Dict, Iterator, List
+
+import polars as pl
+
+from src.config import config
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+# country -> (invoice code, currency, currency symbol, store cities)
+COUNTRIES = {
+    "United States": ("US", "USD", "$", ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix"]),
+    "China": ("CN", "CNY", "¥", ["Shanghai", "Beijing", "Guangzhou", "Shenzhen", "Chongqing"]),
+    "Germany": ("DE", "EUR", "€", ["Berlin", "Hamburg", "Munich", "Frankfurt", "Cologne"]),
+    "United Kingdom": ("UK", "GBP", "£", ["London", "Manchester", "Birmingham", "Glasgow", "Liverpool"]),
+    "France": ("FR", "EUR", "€", ["Paris", "Marseille", "Lyon", "Toulouse", "Nice"]),
+    "Spain": ("ES", "EUR", "€", ["Madrid", "Barcelona", "Valencia", "Sevilla", "Bilbao"]),
+    "Portugal": ("PT", "EUR", "€", ["Lisboa", "Porto", "Braga", "Coimbra", "Faro"]),
+}
+
+# Rate to USD around which the daily rates move (±2%)
+BASE_RATES = {"USD": 1.0, "EUR": 1.08, "GBP": 1.27, "CNY": 0.14}
+
+CATEGORIES = {
+    "Feminine": ["Coats and Blazers", "Dresses and Jumpsuits", "Pants and Jeans", "Sweaters and Knitwear", "T-shirts and Tops"],
+    "Masculine": ["Coats and Blazers", "Pants", "Shirts", "Suits and Blazers", "T-shirts and Polos"],
+    "Children": ["Boys and Girls (8-16 years)", "Girl and Boy (1-5 years)", "Baby (0-12 months)"],
+}
+
+# None is written as an empty field (the real files leave some colors, sizes and job titles empty)
+COLORS = ["BLACK", "WHITE", "BLUE", "RED", "GREEN", "GREY", "BEIGE", "PINK", None]
+SIZES = ["S", "M", "L", "XL", None]
+POSITIONS = ["Seller"] * 8 + ["Cashier"] * 2 + ["Stock Clerk", "Store Manager"]
+JOB_TITLES = ["Engineer", "Teacher", "Nurse", "Designer", "Accountant", "Student", "Manager", None, None]
+
+# (description, start month/day, end month/day, discount, categories)
+CAMPAIGNS = [
+    ("Winter sale", (1, 1), (1, 15), 0.4, list(CATEGORIES)),
+    ("Spring collection", (3, 1), (3, 15), 0.2, ["Feminine"]),
+    ("Summer sale", (7, 1), (7, 15), 0.3, list(CATEGORIES)),
+    ("Back to school", (9, 1), (9, 10), 0.15, ["Children"]),
+    ("Black Friday", (11, 24), (11, 30), 0.5, list(CATEGORIES)),
+]
+
+EMPLOYEES_PER_STORE = 12
+MAX_PRODUCTS = 17_940
+LINES_PER_INVOICE = 3  # 1..3 lines, 2 on average
+
+
+def parse_scale(value: str) -> int:
+    """Parse a row count such as "1M", "100k", "2.5M" or "1_000_000" """
+    match = re.fullmatch(r"\s*([\d_.]+)\s*([kKmMbB]?)\s*", str(value))
+    if not match:
+        raise ValueError(f"Invalid scale: {value}")
+    number = float(match.group(1).replace("_", ""))
+    factor = {"": 1, "k": 1_000, "m": 1_000_000, "b": 1_000_000_000}[match.group(2).lower()]
+    return int(number * factor)
+
+
+class SyntheticDataGenerator:
+    """
+    Class for writing synthetic source CSVs at a given number of transaction lines
+
+    transactions.csv and customers.csv are written in chunks of chunk_size rows, so memory
+    stays bounded at 100M rows.
+    """
+
+    def __init__(self, output_dir: str, transactions: int, seed: int = 42,
+                 chunk_size: int = 1_000_000, start: date = date(2023, 1, 1), end: date = date(2025, 3, 18)):
+        """
+        Args:
+            output_dir: Directory the CSVs are written to
+            transactions: Number of transaction lines
+            seed: Seed of the row hashes
+            chunk_size: Rows generated and written at a time
+            start, end: Date range of the transactions and exchange rates
+        """
+        self.config = config()
+        self.output_dir = output_dir
+        self.transactions = transactions
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.start = start
+        self.end = end
+
+        self.stores = [(country, city) for country, (_, _, _, cities) in COUNTRIES.items() for city in cities]
+        self.n_stores = len(self.stores)
+        self.n_employees = self.n_stores * EMPLOYEES_PER_STORE
+        self.n_products = min(MAX_PRODUCTS, max(100, transactions // 10))
+        self.n_customers = max(1_000, transactions // 4)
+
+    def cardinalities(self) -> Dict[str, int]:
+        return {
+            "stores": self.n_stores,
+            "employees": self.n_employees,
+            "products": self.n_products,
+            "customers": self.n_customers,
+            "transactions": self.transactions,
+        }
+
+    def _hash(self, expr: pl.Expr, salt: int) -> pl.Expr:
+        """Pseudo-random UInt64 derived from an integer column (one salt per attribute)"""
+        return expr.hash(self.seed * 1_000 + salt)
+
+    @staticmethod
+    def _pick(index: pl.Expr, choices: List) -> pl.Expr:
+        """choices[index]; repeat a choice in the list to weight it"""
+        return pl.lit(pl.Series(choices)).gather(index % len(choices))
+
+    def _production_cost(self, product_id: pl.Expr) -> pl.Expr:
+        """Production cost of a product (also the base of its unit price in transactions)"""
+        return (5 + (self._hash(product_id, 20) % 9_500) / 100).round(2)
+
+    def _write(self, table_name: str, frames: Iterator[pl.DataFrame]) -> int:
+        """Write frames one after another to the source CSV of a table"""
+        path = os.path.join(self.output_dir, self.config.CSV_FILES[table_name])
+        rows = 0
+        with open(path, "wb") as f:
+            for frame in frames:
+                frame.write_csv(f, include_header=rows == 0,
+                                date_format=self.config.DATE_FORMAT,
+                                datetime_format=self.config.DATETIME_FORMAT)
+                rows += len(frame)
+        logger.info(f"Wrote {rows} rows to {path}")
+        return rows
+
+    def _id_chunks(self, total: int) -> Iterator[pl.DataFrame]:
+        """Frames of ids 1..total, chunk_size at a time"""
+        for first in range(1, total + 1, self.chunk_size):
+            last = min(first + self.chunk_size, total + 1)
+            yield pl.select(pl.int_range(first, last, dtype=pl.Int64).alias("id"))
+
+    def generate_stores(self) -> Iterator[pl.DataFrame]:
+        store_ids = range(1, self.n_stores + 1)
+        yield pl.DataFrame({
+            "Store ID": list(store_ids),
+            "Country": [country for country, _ in self.stores],
+            "City": [city for _, city in self.stores],
+            "Store Name": [f"Store {city}" for _, city in self.stores],
+            "Number of Employees": [EMPLOYEES_PER_STORE] * self.n_stores,
+            "ZIP Code": [f"{10000 + 37 * i}" for i in store_ids],
+            "Latitude": [round(-60 + (i * 7.31) % 120, 4) for i in store_ids],
+            "Longitude": [round(-170 + (i * 13.7) % 340, 4) for i in store_ids],
+        })
+
+    def generate_employees(self) -> Iterator[pl.DataFrame]:
+        employee_id = pl.col("id")
+        yield next(self._id_chunks(self.n_employees)).select(
+            employee_id.alias("Employee ID"),
+            # employee e works in store (e - 1) % n_stores + 1, as the transactions assume
+            ((employee_id - 1) % self.n_stores + 1).alias("Store ID"),
+            pl.format("Employee {}", employee_id).alias("Name"),
+            self._pick(self._hash(employee_id, 10), POSITIONS).alias("Position"),
+        )
+
+    def generate_products(self) -> Iterator[pl.DataFrame]:
+        pairs = [(category, sub) for category, subs in CATEGORIES.items() for sub in subs]
+        product_id = pl.col("id")
+        pair = self._hash(product_id, 21) % len(pairs)
+        color = self._pick(self._hash(product_id, 22), COLORS)
+        yield next(self._id_chunks(self.n_products)).with_columns(
+            self._pick(pair, [category for category, _ in pairs]).alias("Category"),
+            self._pick(pair, [sub for _, sub in pairs]).alias("Sub Category"),
+            color.alias("Color"),
+        ).select(
+            product_id.alias("Product ID"),
+            pl.col("Category"),
+            pl.col("Sub Category"),
+            *[pl.format(f"{language} {{}} {{}}", pl.col("Sub Category"), product_id)
+              .alias(f"Description {language}") for language in ["PT", "DE", "FR", "ES", "EN", "ZH"]],
+            pl.col("Color"),
+            self._pick(self._hash(product_id, 23), ["S|M|L|XL"] * 4 + [None]).alias("Sizes"),
+            self._production_cost(product_id).alias("Production Cost"),
+        )
+
+    def generate_customers(self) -> Iterator[pl.DataFrame]:
+        customer_id = pl.col("id")
+        store = self._hash(customer_id, 30) % self.n_stores
+        for chunk in self._id_chunks(self.n_customers):
+            yield chunk.select(
+                customer_id.alias("Customer ID"),
+                pl.format("Customer {}", customer_id).alias("Name"),
+                pl.format("customer{}@example.com", customer_id).alias("Email"),
+                pl.format("+1-555-{}", (customer_id % 10_000_000).cast(pl.String).str.zfill(7)).alias("Telephone"),
+                self._pick(store, [city for _, city in self.stores]).alias("City"),
+                self._pick(store, [country for country, _ in self.stores]).alias("Country"),
+                self._pick(self._hash(customer_id, 31), ["F", "F", "M", "M", "D"]).alias("Gender"),
+                (pl.lit(date(1950, 1, 1)) + pl.duration(days=self._hash(customer_id, 32) % 20_000))
+                .alias("Date Of Birth"),
+                self._pick(self._hash(customer_id, 33), JOB_TITLES).alias("Job Title"),
+            )
+
+    def generate_discounts(self) -> Iterator[pl.DataFrame]:
+        rows = []
+        for year in range(self.start.year, self.end.year + 1):
+            for description, (start_month, start_day), (end_month, end_day), discount, categories in CAMPAIGNS:
+                for category in categories:
+                    for sub in CATEGORIES[category]:
+                        rows.append((date(year, start_month, start_day), date(year, end_month, end_day),
+                                     discount, f"{description} {year}", category, sub))
+        yield pl.DataFrame(rows, schema=["Start", "End", "Discont", "Description", "Category", "Sub Category"],
+                           orient="row")
+
+    def generate_exchange_rates(self) -> Iterator[pl.DataFrame]:
+        days = pl.select(pl.date_range(self.start, self.end, "1d").alias("date")).with_row_index("day")
+        frames = []
+        for salt, (currency, base) in enumerate(BASE_RATES.items(), start=40):
+            noise = (self._hash(pl.col("day").cast(pl.Int64), salt) % 2_001).cast(pl.Int64) - 1_000
+            frames.append(days.select(
+                pl.col("date"),
+                pl.lit(currency).alias("currency"),
+                (base * (1 + noise / 50_000)).round(4).alias("rate_to_usd"),
+            ))
+        yield pl.concat(frames).sort("date", "currency", maintain_order=True)
+
+    def generate_transactions(self) -> Iterator[pl.DataFrame]:
+        """Invoices in date order; each has 1-3 lines, the last chunk is cut at the row count"""
+        invoices_total = max(1, self.transactions * 2 // (LINES_PER_INVOICE + 1))
+        span_seconds = int((datetime.combine(self.end, datetime.max.time())
+                            - datetime.combine(self.start, datetime.min.time())).total_seconds())
+        invoices_per_chunk = max(1, self.chunk_size * 2 // (LINES_PER_INVOICE + 1))
+
+        invoice = pl.col("invoice")
+        line_key = invoice * 8 + pl.col("Line")
+        store = (self._hash(invoice, 1) % self.n_stores + 1).cast(pl.Int64)
+        store_codes = {i + 1: COUNTRIES[country][0] for i, (country, _) in enumerate(self.stores)}
+        store_currencies = {i + 1: COUNTRIES[country][1] for i, (country, _) in enumerate(self.stores)}
+        store_symbols = {i + 1: COUNTRIES[country][2] for i, (country, _) in enumerate(self.stores)}
+        is_return = self._hash(invoice, 5) % 20 == 0
+
+        written = 0
+        first_invoice = 0
+        while written < self.transactions:
+            chunk = pl.select(
+                pl.int_range(first_invoice, first_invoice + invoices_per_chunk, dtype=pl.Int64).alias("invoice"))
+            first_invoice += invoices_per_chunk
+            chunk = (chunk
+                     .with_columns(pl.int_ranges(1, 2 + self._hash(invoice, 0) % LINES_PER_INVOICE,
+                                                 dtype=pl.Int64).alias("Line"))
+                     .explode("Line")
+                     .head(self.transactions - written)
+                     .with_columns(
+                         store.alias("Store ID"),
+                         (self._hash(line_key, 6) % self.n_products + 1).cast(pl.Int64).alias("Product ID"),
+                         self._pick(self._hash(line_key, 9), [0.0] * 6 + [0.1, 0.2, 0.3, 0.4]).alias("Discount"),
+                         (1 + self._hash(line_key, 8) % 3).cast(pl.Int64).alias("Quantity"),
+                     )
+                     .with_columns(
+                         (self._production_cost(pl.col("Product ID")) * 2.2).round(2).alias("Unit Price"),
+                     )
+                     .with_columns(
+                         ((pl.col("Unit Price") * pl.col("Quantity") * (1 - pl.col("Discount"))).round(2)
+                          * pl.when(is_return).then(-1).otherwise(1)).alias("Line Total"),
+                         pl.format("INV-{}-{}-{}",
+                                   pl.col("Store ID").replace_strict(store_codes, return_dtype=pl.String),
+                                   pl.col("Store ID").cast(pl.String).str.zfill(3),
+                                   invoice.cast(pl.String).str.zfill(8)).alias("Invoice ID"),
+                     ))
+            written += len(chunk)
+            yield chunk.select(
+                pl.col("Invoice ID"),
+                pl.col("Line"),
+                (self._hash(invoice, 2) % self.n_customers + 1).cast(pl.Int64).alias("Customer ID"),
+                pl.col("Product ID"),
+                self._pick(self._hash(line_key, 7), SIZES).alias("Size"),
+                self._pick(self._hash(line_key, 11), COLORS).alias("Color"),
+                pl.col("Unit Price"),
+                pl.col("Quantity"),
+                (pl.lit(datetime.combine(self.start, datetime.min.time()))
+                 + pl.duration(seconds=(invoice * span_seconds // invoices_total).clip(upper_bound=span_seconds)))
+                .alias("Date"),
+                pl.col("Discount"),
+                pl.col("Line Total"),
+                pl.col("Store ID"),
+                (pl.col("Store ID") + self.n_stores * (self._hash(invoice, 3) % EMPLOYEES_PER_STORE).cast(pl.Int64))
+                .alias("Employee ID"),
+                pl.col("Store ID").replace_strict(store_currencies, return_dtype=pl.String).alias("Currency"),
+                pl.col("Store ID").replace_strict(store_symbols, return_dtype=pl.String).alias("Currency Symbol"),
+                pl.format("SKU-{}-{}", pl.col("Product ID"), self._pick(self._hash(line_key, 7), SIZES).fill_null(""))
+                .alias("SKU"),
+                pl.when(is_return).then(pl.lit("Return")).otherwise(pl.lit("Sale")).alias("Transaction Type"),
+                self._pick(self._hash(invoice, 4), ["Credit Card"] * 3 + ["Cash"] * 2).alias("Payment Method"),
+                pl.col("Line Total").sum().over("Invoice ID").round(2).alias("Invoice Total"),
+            )
+
+    def generate_all(self) -> Dict[str, int]:
+        """
+        Write every source CSV
+
+        Returns:
+            Dictionary of table name to rows written
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        logger.info(f"Generating synthetic data in {self.output_dir}: {self.cardinalities()}")
+        start = time.perf_counter()
+        generators = {
+            "stores": self.generate_stores,
+            "employees": self.generate_employees,
+            "products": self.generate_products,
+            "customers": self.generate_customers,
+            "discounts": self.generate_discounts,
+            "exchange_rates": self.generate_exchange_rates,
+            "transactions": self.generate_transactions,
+        }
+        rows = {name: self._write(name, generate()) for name, generate in generators.items()}
+        logger.info(f"Synthetic data generated in {time.perf_counter() - start:.1f}s")
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic source CSVs for benchmarks")
+    parser.add_argument("--rows", default="1M", help="Transaction lines, e.g. 1M, 10M, 100M (default 1M)")
+    parser.add_argument("--output", help="Output directory (default <PROCESSED_DATA_DIR>/synthetic/<rows>)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", default="1M", help="Rows generated at a time (default 1M)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(config.PROCESSED_DATA_DIR, "synthetic", args.rows)
+    SyntheticDataGenerator(output, parse_scale(args.rows), seed=args.seed,
+                           chunk_size=parse_scale(args.chunk_size)).generate_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Scale benchmarks of the ETL pipeline
+
+For every scale, synthetic sources are generated (or reused) and the three pipeline stages are
+timed separately against a fresh warehouse file:
+
+- extract:   DataExtractor.extract_data
+- transform: DataTransformer.transform_all_data
+- load:      DataLoader.load_all_data
+
+Each stage records wall and CPU seconds, throughput (transaction rows/s, and source MB/s for
+extract) and the peak RSS sampled while it ran. Results are written as JSON; with --baseline
+the run is compared to an earlier result file and the exit code is 1 when a stage got slower
+than --tolerance allows.
+
+Usage:
+    python -m benchmarks.run_benchmarks --scales 1M 10M
+    python -m benchmarks.run_benchmarks --scales 1M --baseline benchmarks/results/<file>.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import duckdb as dd
+import polars as pl
+
+from benchmarks.generate_data import SyntheticDataGenerator, parse_scale
+from src.config import config
+from src.etl.extract import DataExtractor
+from src.etl.load_std import DataLoader
+from src.etl.report import PeakMemorySampler, current_rss
+from src.etl.transform import DataTransformer
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class PipelineBenchmark:
+    """
+    Class for timing the extract, transform and load stages at several scales
+    """
+
+    STAGES = ["extract", "transform", "load"]
+
+    def __init__(self, data_root: str, work_dir: str, use_cache: bool = False,
+                 regenerate: bool = False, seed: int = 42):
+        """
+        Args:
+            data_root: Directory holding one sub-directory of synthetic sources per scale
+            work_dir: Directory of the throwaway warehouse files
+            use_cache: Let extract use the parse cache (off: every run parses the CSVs)
+            regenerate: Write the sources again even if they already exist
+            seed: Seed of the synthetic data
+        """
+        self.config = config
+        self.data_root = data_root
+        self.work_dir = work_dir
+        self.use_cache = use_cache
+        self.regenerate = regenerate
+        self.seed = seed
+
+    def prepare_data(self, scale: str) -> str:
+        """Generate the sources of a scale unless they are already there"""
+        data_dir = os.path.join(self.data_root, scale)
+        rows = parse_scale(scale)
+        complete = all(os.path.exists(os.path.join(data_dir, f)) for f in self.config.CSV_FILES.values())
+        if self.regenerate or not complete:
+            SyntheticDataGenerator(data_dir, rows, seed=self.seed).generate_all()
+        else:
+            logger.info(f"Reusing synthetic data in {data_dir}")
+        return data_dir
+
+    @staticmethod
+    def measure(stage: Callable):
+        """
+        Run one stage
+
+        Returns:
+            (result, {"wall_seconds", "cpu_seconds", "peak_rss_bytes", "rss_before_bytes"})
+        """
+        rss_before = current_rss()
+        with PeakMemorySampler() as sampler:
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            result = stage()
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        return result, {
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(cpu, 3),
+            "peak_rss_bytes": sampler.peak,
+            "rss_before_bytes": rss_before,
+        }
+
+    def run_scale(self, scale: str) -> dict:
+        """Benchmark the three stages at one scale"""
+        data_dir = self.prepare_data(scale)
+        db_path = os.path.join(self.work_dir, f"bench_{scale}.duckdb")
+        for path in (db_path, db_path + ".wal"):
+            if os.path.exists(path):
+                os.remove(path)
+
+        # config ถูกอ่านตอนสร้าง object แต่ละตัว จึงชี้ไปที่ข้อมูลของ scale นี้ก่อน
+        self.config.RAW_DATA_PATH = data_dir
+        self.config.DATABASE_PATH = db_path
+        source_bytes = sum(os.path.getsize(os.path.join(data_dir, f)) for f in self.config.CSV_FILES.values())
+        transactions = parse_scale(scale)
+        logger.info(f"Benchmarking {scale} ({transactions} transaction rows, {source_bytes / 1e6:.1f} MB of CSV)")
+
+        stages = {}
+        raw_data, stages["extract"] = self.measure(
+            lambda: DataExtractor(use_cache=self.use_cache).extract_data())
+        if not raw_data:
+            raise RuntimeError(f"extract failed at scale {scale}")
+        transformed, stages["transform"] = self.measure(
+            lambda: DataTransformer().transform_all_data(raw_data))
+        if not transformed:
+            raise RuntimeError(f"transform failed at scale {scale}")
+        loader = DataLoader()
+        loaded, stages["load"] = self.measure(lambda: loader.load_all_data(transformed))
+        loader.disconnect()
+        if not loaded:
+            raise RuntimeError(f"load failed at scale {scale}")
+
+        for name, stage in stages.items():
+            stage["rows_per_second"] = round(transactions / stage["wall_seconds"]) if stage["wall_seconds"] else None
+        stages["extract"]["mb_per_second"] = round(source_bytes / 1e6 / stages["extract"]["wall_seconds"], 1)
+
+        result = {
+            "scale": scale,
+            "transaction_rows": transactions,
+            "source_bytes": source_bytes,
+            "database_bytes": os.path.getsize(db_path),
+            "table_rows": {name: len(df) for name, df in transformed.items()},
+            "stages": stages,
+        }
+        for name in self.STAGES:
+            stage = stages[name]
+            logger.info(f"{scale} {name}: {stage['wall_seconds']:.2f}s wall, {stage['cpu_seconds']:.2f}s cpu, "
+                        f"{stage['rows_per_second']} rows/s, peak RSS {(stage['peak_rss_bytes'] or 0) / 2**20:.0f} MiB")
+        del raw_data, transformed
+        return result
+
+    def run(self, scales: List[str]) -> dict:
+        """
+        Benchmark every scale
+
+        Returns:
+            Result document (environment, settings and one entry per scale)
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        return {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "polars": pl.__version__,
+                "duckdb": dd.__version__,
+            },
+            "settings": {
+                "parse_cache": self.use_cache,
+                "extract_workers": self.config.EXTRACT_WORKERS,
+                "transform_workers": self.config.TRANSFORM_WORKERS,
+                "dim_load_mode": self.config.DIM_LOAD_MODE,
+                "fact_load_mode": self.config.FACT_LOAD_MODE,
+                "seed": self.seed,
+            },
+            "results": [self.run_scale(scale) for scale in scales],
+            # สูงสุดของทั้ง process (kB บน Linux)
+            "process_max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Stages whose wall time grew by more than tolerance (0.1 = 10%) against the baseline
+
+    Returns:
+        One message per regression
+    """
+    regressions = []
+    baseline_scales = {entry["scale"]: entry for entry in baseline.get("results", [])}
+    for entry in current["results"]:
+        previous = baseline_scales.get(entry["scale"])
+        if not previous:
+            continue
+        for name, stage in entry["stages"].items():
+            before = previous["stages"].get(name, {}).get("wall_seconds")
+            if before and stage["wall_seconds"] > before * (1 + tolerance):
+                regressions.append(f"{entry['scale']} {name}: {before:.2f}s -> {stage['wall_seconds']:.2f}s "
+                                   f"(+{(stage['wall_seconds'] / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark extract, transform and load on synthetic data")
+    parser.add_argument("--scales", nargs="+", default=["1M"], help="Transaction rows per run, e.g. 1M 10M 100M")
+    parser.add_argument("--data-dir", default=os.path.join(config.PROCESSED_DATA_DIR, "synthetic"),
+                        help="Root of the synthetic sources (one sub-directory per scale)")
+    parser.add_argument("--work-dir", default=os.path.join(config.PROCESSED_DATA_DIR, "benchmark"),
+                        help="Directory of the throwaway warehouse files")
+    parser.add_argument("--output", help=f"Result JSON file (default {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--cache", action="store_true", help="Use the parse cache during extract")
+    parser.add_argument("--regenerate", action="store_true", help="Regenerate the synthetic sources")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed wall-time increase against the baseline (default 0.1 = 10%%)")
+    parser.add_argument("--keep-db", action="store_true", help="Keep the benchmark warehouse files")
+    args = parser.parse_args()
+
+    benchmark = PipelineBenchmark(args.data_dir, args.work_dir, use_cache=args.cache,
+                                  regenerate=args.regenerate, seed=args.seed)
+    results = benchmark.run(args.scales)
+    if not args.keep_db:
+        shutil.rmtree(args.work_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Benchmark results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            logger.error(f"Regression: {message}")
+        if regressions:
+            return 1
+        logger.info("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,8 +2,20 @@ from src import config
 from src.etl.extract import SrcChecker,DataExtractor
 from src.etl.transform import DataTransformer
 from src.etl.load_std import DataLoader
+from src.etl.duckdb_engine import DuckDBTransformer
+from src.etl.aggregates import AggregateRefresher
+from src.etl.export import ParquetExporter
+from src.etl.layout import LayoutOptimizer
+from src.etl.report import RunReport, file_size
+from src.etl.profiling import Profiler
+from src.etl.snapshot import SnapshotManager
+from src.etl.checkpoint import RunCheckpoint
+from src.etl.fingerprint import SourceManifest
+from src.etl.resources import ResourceGovernor
 import os
+import time
 import logging
+import duckdb as dd
 import polars as pl
 
 # Setup logging
@@ -16,12 +28,83 @@ class ETLPipeline():
     """
     This class for managing the ETL pipeline
     """
-    def __init__(self):
+    def __init__(self, lazy: bool = None, batched: bool = None, engine: str = None, profile: bool = None,
+                 pipelined: bool = None):
         self.config =config()
+        # engine: "polars" (DataTransformer), "duckdb" (SQL inside the warehouse) หรือ "compare"
+        self.engine = engine or self.config.ETL_ENGINE
+        # lazy mode: extract เป็น LazyFrame แล้ว collect ครั้งเดียวตอนท้ายของ transform
+        self.lazy = self.config.LAZY_EXECUTION if lazy is None else lazy
+        # batched mode: transactions ถูกอ่าน/แปลง/โหลดทีละ config.BATCH_SIZE แถว
+        self.batched = self.config.BATCHED_TRANSACTIONS if batched is None else batched
+        # pipelined mode: โหลดแต่ละตารางทันทีที่ transform เสร็จ (dimension โหลดระหว่างที่ fact ยัง transform อยู่)
+        self.pipelined = self.config.PIPELINED_LOAD if pipelined is None else pipelined
         self.check_src = SrcChecker()
         self.extractor = DataExtractor()
         self.transformer = DataTransformer()
         self.loader = DataLoader()
+        # memory budget: DuckDB ได้ memory_limit/threads/temp_directory ตอน connect
+        # ถ้า source ใหญ่เกินงบของ Polars จะเปลี่ยนไปโหลด transactions ทีละ batch
+        self.resources = self.loader.resources
+        self.batch_size = None
+        if self.resources.enabled:
+            if not self.batched and self.resources.exceeds_budget():
+                self.batched = True
+                self.batch_size = self.resources.batch_rows("transactions")
+                logger.warning(f"Falling back to batched transactions ({self.batch_size} rows per batch) "
+                               f"to stay within MAX_MEMORY_GB={self.config.MAX_MEMORY_GB}")
+            # lazy plans ถูก collect แบบ streaming ทีละ chunk ตามงบหน่วยความจำ ไม่ต้องโหลดทั้งตารางเข้าหน่วยความจำ
+            self.transformer.config.STREAMING_ENGINE = True
+            self.resources.configure_polars()
+        # เวลา, จำนวนแถว, bytes และ peak RSS ของแต่ละ stage/ตาราง (JSON + ตาราง etl_runs)
+        self.report = RunReport(engine=self.engine, settings={
+            "lazy": self.lazy,
+            "batched": self.batched,
+            "pipelined_load": self.pipelined,
+            "transform_workers": self.config.TRANSFORM_WORKERS,
+            "dim_load_mode": self.config.DIM_LOAD_MODE,
+            "fact_load_mode": self.config.FACT_LOAD_MODE,
+            "raw_data_dir": self.config.RAW_DATA_PATH,
+            "max_memory_gb": self.config.MAX_MEMORY_GB,
+            "thread_count": self.config.THREAD_COUNT,
+        })
+        # profile mode: query plans, EXPLAIN ANALYZE ของทุก load statement และ cProfile ต่อ stage
+        self.profiler = None
+        if (self.config.PROFILE if profile is None else profile):
+            self.profiler = Profiler(self.report.run_id)
+            self.loader.profiler = self.profiler
+            self.report.profiler = self.profiler
+            self.report.settings["profile_dir"] = self.profiler.run_dir
+        # snapshot mode: โหลดลงไฟล์ใหม่แล้วค่อยสลับ symlink ของ DATABASE_PATH ตอนจบ (compare mode ไม่โหลด)
+        self.snapshots = None
+        if self.config.SNAPSHOT_MODE and self.engine != "compare":
+            self.snapshots = SnapshotManager(self.loader)
+            self.report.settings["snapshot_dir"] = self.snapshots.snapshot_dir
+        # checkpoint mode: ตารางที่ extract/transform แล้วถูกเก็บเป็น Arrow IPC, run ที่ล้มเหลวถูกทำต่อในครั้งถัดไป
+        self.checkpoint = None
+        if self.config.CHECKPOINT_ENABLED and self.engine == "polars":
+            # checkpoint ที่ทำด้วย transform code หรือ engine อื่นจะไม่ถูก resume
+            self.checkpoint = RunCheckpoint.resume(self.report.run_id, {
+                "engine": self.engine,
+                "lazy": self.lazy,
+                "code_versions": {t: DataTransformer.code_version(t) for t in DataTransformer.TABLE_SOURCES},
+                "batched": self.batched,
+                "dim_load_mode": self.config.DIM_LOAD_MODE,
+                "fact_load_mode": self.config.FACT_LOAD_MODE,
+                "raw_data_dir": self.config.RAW_DATA_PATH,
+                "database_path": str(self.config.DATABASE_PATH),
+                "snapshot_mode": self.snapshots is not None,
+            })
+            if self.config.RETRY_TABLES:
+                self.checkpoint.invalidate(self.config.RETRY_TABLES)
+            self.report.settings["checkpoint_run"] = self.checkpoint.run_id
+        # ตารางที่ต้อง build ใน run นี้ (None = ทุกตาราง) กำหนดโดย plan_tables จาก source fingerprints
+        self.tables = None
+        self.source_manifest = None
+        # แถวของแต่ละ batch ของ transactions.csv ใน batched mode (สำหรับ run report)
+        self.batched_rows = []
+        if self.config.SKIP_UNCHANGED_TABLES and self.engine == "polars":
+            self.source_manifest = SourceManifest(self.loader)
 
     def run_check_src(self,src: list[str]=['csv']) -> bool:
         """
@@ -49,26 +132,497 @@ class ETLPipeline():
         Run the extraction step and return raw data
         """
         logger.info("Running extraction step...")
-        raw_data = self.extractor.extract_data()
+        if self.plan_tables() == []:
+            logger.info("✅ Every table is up to date, nothing to extract.")
+            return {}
+        tables = None
+        if self.tables is not None:
+            # อ่านเฉพาะ source ของตารางที่ต้อง build
+            sources = {source for name in self.tables for source in self.transformer.TABLE_SOURCES[name]}
+            tables = [name for name in self.config.CSV_FILES if name in sources]
+        if self.batched:
+            # transactions จะถูกอ่านทีละ batch ตอนโหลด
+            tables = [name for name in (tables or self.config.CSV_FILES) if name != "transactions"]
+        with self.report.stage("extract") as stage:
+            if self._resumed("extract"):
+                raw_data = self.checkpoint.load_frames("extract")
+                if self.lazy:
+                    raw_data = {name: frame.lazy() for name, frame in raw_data.items()}
+            else:
+                self.read_enum_dictionaries()
+                raw_data = self.extractor.extract_data(lazy=self.lazy, tables=tables)
+                # lazy mode ยังไม่ได้อ่านข้อมูล จึงไม่มีอะไรให้เก็บ
+                if raw_data and self.checkpoint is not None and not self.lazy:
+                    self.checkpoint.save_frames("extract", raw_data)
+                    self.checkpoint.mark("extract", True)
+        self.report.add_tables(stage, {
+            name: {"wall_seconds": self.extractor.timings.get(name),
+                   "rows_out": self._frame_rows(frame),
+                   "bytes_read": file_size(self.config.get_csv_path(name))}
+            for name, frame in (raw_data or {}).items()})
         if raw_data:
             logger.info("✅ Complete all reading the file.")
         else:
+            stage["status"] = "failed"
             logger.error("❌ Extraction failed.")
         return raw_data
 
+    def plan_tables(self):
+        """
+        Decide which tables this run builds (SKIP_UNCHANGED_TABLES): only those whose source
+        files, transform code or load settings changed since the last successful run
+
+        Returns:
+            Names of the tables to build, or None for every table
+        """
+        if self.source_manifest is None:
+            return None
+        # snapshot mode: อ่าน fingerprint จาก snapshot ใหม่ ไม่ใช่ไฟล์ที่ reader เปิดอยู่
+        self.begin_snapshot()
+        try:
+            tables = self.source_manifest.changed_tables()
+        except Exception as e:
+            logger.warning(f"Could not compare source fingerprints, every table is rebuilt: {str(e)}")
+            return None
+        if self.batched and {"fact_transactions", "dim_date"} & set(tables):
+            # batched mode สร้าง dim_date ไปพร้อมกับ fact_transactions
+            tables = [name for name in self.transformer.TABLE_SOURCES
+                      if name in tables or name in ("fact_transactions", "dim_date")]
+        self.tables = tables
+        unchanged = [name for name in self.transformer.TABLE_SOURCES if name not in tables]
+        self.report.settings["unchanged_tables"] = unchanged
+        if unchanged:
+            logger.info(f"⏭️ Unchanged since the last run, left as they are: {', '.join(unchanged)}")
+        return tables
+
+    def read_enum_dictionaries(self):
+        """
+        Give the extractor the ENUM dictionaries of the warehouse, so eager reads build pl.Enum columns
+        in the order DuckDB stores them (lazy scans keep categorical columns)
+        """
+        if self.lazy:
+            return
+        # snapshot mode: อ่านจาก snapshot ใหม่ ไม่ใช่ไฟล์ที่ reader เปิดอยู่
+        self.begin_snapshot()
+        try:
+            self.extractor.enum_values = self.loader.enum_dictionaries()
+        except Exception as e:
+            logger.warning(f"Could not read the ENUM dictionaries of the warehouse, ENUM columns stay categorical: {str(e)}")
+
+    def read_loaded_dates(self) -> bool:
+        """
+        Read the date range of the persisted dim_date for the transformer (only missing dates are built)
+
+        Returns:
+            False when the warehouse could not be read (e.g. DuckDB ran out of its memory_limit)
+        """
+        try:
+            self.transformer.loaded_dates = self.loader.get_date_range()
+        except Exception as e:
+            logger.error(f"❌ Could not read dim_date from the warehouse: {str(e)}")
+            return False
+        return True
+
+    def _resumed(self, stage_name: str) -> bool:
+        """True when the resumed run already finished this stage, so it is skipped"""
+        if self.checkpoint is None or not self.checkpoint.stage_done(stage_name):
+            return False
+        # snapshot ของ run ที่ล้มเหลวถูกทิ้งไปแล้ว เหลือแค่ผลของ extract/transform
+        if self.snapshots is not None and stage_name not in RunCheckpoint.FRAME_STAGES:
+            return False
+        logger.info(f"⏭️ {stage_name} was done by run {self.checkpoint.run_id}, skipped")
+        return True
+
+    def _checkpoint(self, stage_name: str, success: bool):
+        """Record the outcome of a warehouse stage in the checkpoint manifest"""
+        if self.checkpoint is not None:
+            self.checkpoint.mark(stage_name, success)
+
+    def _transformed_tables(self, raw_data: dict):
+        """
+        (table name, DataFrame) as each table is transformed; with checkpoints, the tables the
+        resumed run finished are read back first and every new table is saved as soon as it is done
+        """
+        done = {}
+        if self.checkpoint is not None:
+            done = self.checkpoint.load_frames("transform", self.tables)
+            if done:
+                logger.info(f"⏭️ Reusing transformed {', '.join(done)} from run {self.checkpoint.run_id}")
+            yield from done.items()
+        missing = [name for name in self.tables or self.transformer.TABLE_SOURCES if name not in done]
+        for name, frame in self.transformer.iter_transform_data(raw_data, tables=missing):
+            if self.checkpoint is not None:
+                self.checkpoint.save_frame("transform", name, frame)
+            yield name, frame
+        self._checkpoint("transform", True)
+
+    @staticmethod
+    def _frame_rows(frame):
+        """Rows of a DataFrame (None for a LazyFrame, which has not been read yet)"""
+        return None if frame is None or isinstance(frame, pl.LazyFrame) else len(frame)
+
     def run_transform(self, raw_data: dict) -> dict:
         logger.info("\n" + "="*50)
         logger.info("Running transformation step...")
         logger.info("=" * 50 + "\n")
         
+        if not any(all(source in raw_data for source in self.transformer.TABLE_SOURCES[name])
+                   for name in self.tables or self.transformer.TABLE_SOURCES):
+            # batched mode: ตารางที่เปลี่ยนมีแค่ fact_transactions/dim_date ซึ่งสร้างทีละ batch ตอนโหลด
+            logger.info("Nothing to transform before the batched load.")
+            return {}
+        # dim_date ถูกเก็บไว้ใน warehouse: สร้างเฉพาะวันที่ที่ยังไม่มี
+        # (snapshot mode อ่านจาก snapshot ใหม่ ไฟล์ที่ reader เปิดอยู่ไม่ถูกแตะ)
+        self.begin_snapshot()
+        if not self.read_loaded_dates():
+            return None
         #transform all data
-        transformed_data = self.transformer.transform_all_data(raw_data)
+        with self.report.stage("transform") as stage:
+            if self.checkpoint is None:
+                transformed_data = self.transformer.transform_all_data(raw_data, tables=self.tables)
+            else:
+                transformed = dict(self._transformed_tables(raw_data))
+                transformed_data = {name: transformed[name] for name in self.transformer.TABLE_SOURCES
+                                    if name in transformed}
+        self.report.add_tables(stage, self._transform_metrics(raw_data, transformed_data))
+        self.report.tasks = self.transformer.task_timings
         if not transformed_data:
+            stage["status"] = "failed"
             logger.error("❌ No data transformed.")
+            return None
+        elif self.profiler:
+            # นอก stage "transform" เพื่อไม่ให้เวลาที่รายงานรวมการ profile
+            self.profiler.profile_transforms(self.transformer, raw_data)
         return transformed_data
 
-    def run_load(self, transformed_data):
-        success =  self.loader.load_all_data(transformed_data)
+    def _transform_metrics(self, raw_data: dict, transformed_data: dict) -> dict:
+        """Per-table transform metrics for the run report"""
+        return {
+            name: {"wall_seconds": self.transformer.timings.get(name),
+                   "rows_in": sum(self._frame_rows(raw_data.get(source)) or 0
+                                  for source in self.transformer.TABLE_SOURCES.get(name, [])) or None,
+                   "rows_out": self._frame_rows(frame)}
+            for name, frame in (transformed_data or {}).items()}
+
+    def _load_metrics(self, transformed_data: dict, success: bool) -> dict:
+        """Per-table load metrics for the run report"""
+        return {
+            name: {"wall_seconds": self.loader.timings.get(name),
+                   "rows_in": len(df),
+                   "rows_out": self._table_rows(name) if success else None,
+                   # in-memory (Arrow) size of the frame written to the warehouse
+                   "bytes_read": df.estimated_size()}
+            for name, df in transformed_data.items() if name in self.loader.timings}
+
+    def run_transform_load(self, raw_data: dict) -> bool:
+        """
+        Transform and load in one step: every table is loaded as soon as its transform is done,
+        so the dimension loads overlap the fact transform (PIPELINED_LOAD)
+        """
+        logger.info("Running transformation and load step...")
+        if self._resumed("load"):
+            return self.run_post_load(True, raw_data)
+        self.begin_snapshot()
+        if not self.read_loaded_dates():
+            return self.run_post_load(False, raw_data)
+        streamed = self.batched_load(raw_data)
+        if streamed is None:
+            return self.run_post_load(False, raw_data)
+        batched_tables, batches = streamed
+        transformed_data = {}
+
+        def transformed_tables():
+            for name, frame in self._transformed_tables(raw_data):
+                transformed_data[name] = frame
+                yield name, frame
+            yield from batched_tables.items()
+
+        bytes_before = self._database_bytes()
+        with self.report.stage("transform_load") as stage:
+            success = self.loader.load_all_data(transformed_tables(), batches=batches)
+        load_metrics = self._load_metrics({**transformed_data, **batched_tables}, success)
+        if batches:
+            load_metrics.update(self._batched_metrics(success))
+        # ตาราง transform/load แยกกันใน report แต่เวลารวมอยู่ใน stage transform_load
+        for stage_name, tables in (("transform", self._transform_metrics(raw_data, transformed_data)),
+                                   ("load", load_metrics)):
+            for name, metrics in tables.items():
+                self.report.add_table(stage_name, name, **metrics)
+        self.report.tasks = self.transformer.task_timings
+        self._checkpoint("load", success)
+        stage.update(status="ok" if success else "failed",
+                     rows_out=sum(len(df) for df in transformed_data.values()) or None,
+                     bytes_written=self._growth(bytes_before))
+        if success and self.profiler:
+            self.profiler.profile_transforms(self.transformer, raw_data)
+        return self.run_post_load(success, raw_data)
+
+    def run_duckdb_engine(self) -> bool:
+        """
+        Run extract and transform inside DuckDB: stage the CSVs and build every table with SQL
+        """
+        logger.info("Running DuckDB engine...")
+        self.begin_snapshot()
+        engine = DuckDBTransformer(self.loader)
+        connection = self.loader.connection
+        bytes_before = self._database_bytes()
+        rows = {}
+        # ทุกตารางถูกเขียนใน transaction เดียว เหมือน DataLoader.load_all_data
+        with self.report.stage("duckdb_engine") as stage:
+            connection.begin()
+            try:
+                self.loader.prepare_warehouse()
+                staged = engine.stage_sources()
+                rows = engine.load_all_tables()
+                connection.commit()
+                self.loader.bump_generation()
+                connection.execute("CHECKPOINT")
+                success = True
+            except Exception as e:
+                self.loader.rollback()
+                logger.error(f"❌ DuckDB engine failed: {e}")
+                stage["status"] = "failed"
+                staged, success = [], False
+        self.report.add_tables(stage, {
+            name: {"wall_seconds": engine.timings.get(name), "rows_out": rows[name]} for name in rows})
+        stage["bytes_read"] = sum(file_size(self.config.get_csv_path(name)) or 0 for name in staged) or None
+        stage["bytes_written"] = self._growth(bytes_before)
+        if success:
+            success = self.run_optimize_layout()
+        if success:
+            success = self.run_refresh_aggregates()
+        if success:
+            success = self.run_export()
+        self.loader.disconnect()
+        return success
+
+    def run_compare_engines(self) -> dict:
+        """
+        Time the Polars and DuckDB engines table by table (read + transform, nothing is loaded)
+
+        Returns:
+            Dictionary of table name to {"polars": seconds, "duckdb": seconds, "rows": int, "faster": engine},
+            or None if a table could not be built
+        """
+        logger.info("Comparing Polars and DuckDB engines...")
+        # ไม่ใช้ parse cache เพื่อให้ทั้งสอง engine ต้อง parse CSV เหมือนกัน
+        extractor = DataExtractor(use_cache=False)
+        connection = dd.connect()
+        self.resources.configure_duckdb(connection)
+        engine = DuckDBTransformer(connection=connection)
+        results = {}
+        try:
+            for table_name, sources in self.transformer.TABLE_SOURCES.items():
+                start = time.perf_counter()
+                raw_data = {name: extractor.extract_csv(self.config.get_csv_path(name), name) for name in sources}
+                rows = len(self.transformer.transform_table(table_name, raw_data))
+                polars_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                engine.stage_sources(sources)
+                engine.build_table(table_name)
+                duckdb_seconds = time.perf_counter() - start
+
+                results[table_name] = {
+                    "polars": polars_seconds,
+                    "duckdb": duckdb_seconds,
+                    "rows": rows,
+                    "faster": "polars" if polars_seconds <= duckdb_seconds else "duckdb",
+                }
+                logger.info(f"{table_name}: polars {polars_seconds:.3f}s, duckdb {duckdb_seconds:.3f}s "
+                            f"-> {results[table_name]['faster']}")
+        except Exception as e:
+            # e.g. DuckDB or Polars ran out of MAX_MEMORY_GB
+            logger.error(f"❌ Engine comparison failed: {str(e)}")
+            return None
+        finally:
+            engine.connection.close()
+        return results
+
+    def loads_batches(self) -> bool:
+        """True when this run streams transactions.csv into fact_transactions batch by batch"""
+        return self.batched and (self.tables is None or "fact_transactions" in self.tables)
+
+    def batched_load(self, raw_data: dict):
+        """
+        Prepare the batched load of transactions.csv: dim_date for its whole date range and a
+        generator that reads, transforms and yields one batch of fact rows at a time. Both are
+        written by DataLoader.load_all_data in the run's single transaction.
+
+        Returns:
+            (tables, batches) for load_all_data (both empty outside batched mode),
+            or None when transactions.csv could not be scanned or the warehouse could not be read
+        """
+        if not self.loads_batches():
+            return {}, {}
+        logger.info(f"Loading transactions in batches of {self.batch_size or self.config.BATCH_SIZE} rows...")
+        # rates ถูกเตรียมครั้งเดียวแล้วใช้กับทุก batch
+        rates = self.transformer.prepare_exchange_rates(raw_data["exchange_rates"])
+        if isinstance(rates, pl.LazyFrame):
+            rates = rates.collect()
+        transactions = self.extractor.extract_csv(self.config.get_csv_path("transactions"), "transactions", lazy=True)
+        if transactions is None:
+            logger.error("❌ transactions.csv could not be scanned for the batched load.")
+            return None
+        # dim_date มาจากช่วงวันที่ของทั้งไฟล์ (scan อ่านแค่คอลัมน์ Date) และถูกโหลดก่อน batch แรก
+        tables = {}
+        bounds = self.transformer.date_bounds(transactions)
+        if bounds:
+            if not self.read_loaded_dates():
+                return None
+            tables["dim_date"] = self.transformer.create_date_dimension(*bounds, loaded=self.transformer.loaded_dates)
+        self.batched_rows = []
+
+        def transform_batches():
+            for batch in self.extractor.extract_csv_batches("transactions", self.batch_size):
+                self.batched_rows.append(len(batch))
+                yield self.transformer.transform_transactions_fact(batch, None, rates=rates)
+
+        return tables, {"fact_transactions": transform_batches()}
+
+    def _batched_metrics(self, success: bool) -> dict:
+        """Load metrics of fact_transactions when it was streamed in batches"""
+        return {"fact_transactions": {
+            "wall_seconds": self.loader.timings.get("fact_transactions"),
+            "rows_in": sum(self.batched_rows),
+            "rows_out": self._table_rows("fact_transactions") if success else None,
+            "bytes_read": file_size(self.config.get_csv_path("transactions"))}}
+
+    def _database_bytes(self):
+        """Size of the warehouse file and its WAL"""
+        return file_size(str(self.loader.db_path), f"{self.loader.db_path}.wal")
+
+    def _growth(self, bytes_before):
+        """Bytes the warehouse grew by since bytes_before (None when it shrank or is unknown)"""
+        bytes_after = self._database_bytes()
+        if bytes_after is None:
+            return None
+        return max(bytes_after - (bytes_before or 0), 0)
+
+    def _table_rows(self, table_name: str):
+        """Rows of a warehouse table after the load"""
+        if not self.loader.table_exists(table_name):
+            return None
+        return self.loader.connection.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+
+    def run_optimize_layout(self) -> bool:
+        """
+        Cluster the fact table by (date, store_id), restore dimension key indexes and report zonemap pruning
+        """
+        if not self.config.OPTIMIZE_LAYOUT or self._resumed("optimize_layout"):
+            return True
+        logger.info("Optimizing table layout...")
+        with self.report.stage("optimize_layout") as stage:
+            success = LayoutOptimizer(self.loader).optimize() is not None
+        stage["status"] = "ok" if success else "failed"
+        self._checkpoint("optimize_layout", success)
+        return success
+
+    def run_refresh_aggregates(self) -> bool:
+        """
+        Refresh the aggregate tables (only the partitions touched by the latest load)
+        """
+        if not self.config.REFRESH_AGGREGATES or self._resumed("refresh_aggregates"):
+            return True
+        if self.tables is not None and not set(self.tables) & set(AggregateRefresher.SOURCE_TABLES):
+            if not self.loader.connection:
+                self.loader.connect()
+            if all(self.loader.table_exists(name) for name in AggregateRefresher.AGGREGATES):
+                logger.info("⏭️ Aggregates are up to date, their source tables did not change")
+                return True
+        logger.info("Refreshing aggregate tables...")
+        with self.report.stage("refresh_aggregates") as stage:
+            rows = AggregateRefresher(self.loader).refresh_all()
+        self.report.add_tables(stage, {name: {"rows_out": count} for name, count in (rows or {}).items()})
+        stage["status"] = "ok" if rows is not None else "failed"
+        self._checkpoint("refresh_aggregates", rows is not None)
+        return rows is not None
+
+    def run_export(self) -> bool:
+        """
+        Export the warehouse tables to Parquet (only changed tables and fact partitions are rewritten)
+        """
+        if not self.config.EXPORT_PARQUET or self._resumed("export"):
+            return True
+        logger.info("Exporting Parquet...")
+        exporter = ParquetExporter(self.loader)
+        with self.report.stage("export") as stage:
+            manifest = exporter.export_all()
+        self._checkpoint("export", manifest is not None)
+        if manifest is None:
+            stage["status"] = "failed"
+            return False
+        self.report.add_tables(stage, {
+            name: {"rows_out": entry["rows"], "bytes_written": exporter.bytes_written.get(name, 0)}
+            for name, entry in manifest["tables"].items()})
+        return True
+
+    def begin_snapshot(self):
+        """In snapshot mode, point the loader at a new snapshot copied from the published one (once per run)"""
+        if self.snapshots is not None and self.snapshots.path is None:
+            self.snapshots.begin(self.report.run_id)
+
+    def save_report(self, success: bool):
+        """
+        Write the run report: a JSON file in config.RUN_REPORT_DIR and rows in etl_runs
+        (compare mode loads nothing, so only the JSON file is written)
+
+        In snapshot mode the etl_runs rows go into the new snapshot, which is then published;
+        the snapshot of a failed run is discarded, so only its JSON file is kept.
+
+        Returns:
+            False if the snapshot could not be published, otherwise success
+        """
+        self.report.finish(success)
+        if success and self.source_manifest is not None:
+            # บันทึกหลัง run สำเร็จทั้งหมด (รวม aggregates/export) run ที่ล้มเหลวจะ build ตารางเหล่านี้ใหม่
+            self.source_manifest.record(list(self.transformer.TABLE_SOURCES) if self.tables is None else self.tables,
+                                        self.report.run_id)
+        if self.snapshots is not None and self.snapshots.path is not None:
+            self.report.save(self.loader if success else None)
+            if success:
+                success = self.snapshots.publish()
+            else:
+                self.snapshots.discard()
+        else:
+            self.report.save(None if self.engine == "compare" else self.loader)
+        self.loader.disconnect()
+        if self.checkpoint is not None:
+            self.checkpoint.finish(success)
+        return success
+
+    def run_load(self, transformed_data, raw_data: dict = None):
+        if self._resumed("load") or not (transformed_data or self.loads_batches()):
+            return self.run_post_load(True, raw_data)
+        self.begin_snapshot()
+        streamed = self.batched_load(raw_data)
+        if streamed is None:
+            return self.run_post_load(False, raw_data)
+        tables, batches = streamed
+        transformed_data = {**transformed_data, **tables}
+        bytes_before = self._database_bytes()
+        # ทุกตาราง รวมถึง fact ที่โหลดทีละ batch ถูกเขียนใน transaction เดียว (commit/checkpoint ครั้งเดียวต่อ run)
+        with self.report.stage("load") as stage:
+            success =  self.loader.load_all_data(transformed_data, batches=batches)
+        metrics = self._load_metrics(transformed_data, success)
+        if batches:
+            metrics.update(self._batched_metrics(success))
+        self.report.add_tables(stage, metrics)
+        self._checkpoint("load", success)
+        stage["status"] = "ok" if success else "failed"
+        stage["bytes_written"] = self._growth(bytes_before)
+        return self.run_post_load(success, raw_data)
+
+    def run_post_load(self, success: bool, raw_data: dict = None) -> bool:
+        """
+        Steps after the main load: batched transactions, table layout, aggregates and export
+        """
+        if success:
+            success = self.run_optimize_layout()
+        if success:
+            success = self.run_refresh_aggregates()
+        if success:
+            success = self.run_export()
         if success:
             logger.info("✅ Data loaded successfully.")
         else:
@@ -81,22 +635,46 @@ def main():
     # Run ETL pipeline
     pipeline = ETLPipeline()  # Create an instance of the ETLPipeline class
     success = pipeline.run_check_src()
-    if success:
+    if success and pipeline.engine == "compare":
+        success = pipeline.run_compare_engines() is not None
+    elif success and pipeline.engine == "duckdb":
+        success = pipeline.run_duckdb_engine()
+        if success:
+            logger.info("✅ ETL pipeline completed successfully.")
+        else:
+            logger.error("❌ ETL pipeline failed in the DuckDB engine.")
+    elif success:
         raw_data = pipeline.run_extract_znumunz()
+        success = False
         
-        if raw_data:
+        if pipeline.tables == []:
+            # ไม่มี source ไหนเปลี่ยน: ข้าม transform/load ทำเฉพาะขั้นตอนหลังโหลดที่ยังค้างอยู่
+            success = pipeline.run_post_load(True, raw_data)
+            if success:
+                logger.info("✅ ETL pipeline completed successfully, the warehouse was already up to date.")
+            else:
+                logger.error("❌ ETL pipeline failed after the load phase.")
+        elif raw_data and pipeline.pipelined:
+            success = pipeline.run_transform_load(raw_data)
+            if success:
+                logger.info("✅ ETL pipeline completed successfully.")
+            else:
+                logger.error("❌ ETL pipeline failed during the transform and load phase.")
+        elif raw_data:
             transformed_data = pipeline.run_transform(raw_data)
-            if transformed_data:
-                success = pipeline.run_load(transformed_data)
+            if transformed_data is not None:
+                success = pipeline.run_load(transformed_data, raw_data)
             
                 if success:
                     logger.info("✅ ETL pipeline completed successfully.")
-                    logger.info("You can now start the dashboard with: streamlit run src/dashboard.py")
+                    logger.info("Dashboard KPIs can now be queried with src.query.WarehouseQuery")
                 else:
                     logger.error("❌ ETL pipeline failed during loading phase.")
     else:   
         logger.error("❌ Missing source files. Please check the logs for details.")
-        return
+    published = pipeline.save_report(success)
+    if success and not published:
+        logger.error("❌ The loaded snapshot could not be published, the previous one stays in place.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -16,6 +16,10 @@ class config:
     RAW_DATA_PATH = os.getenv("RAW_DATA_DIR", "D:\Project\data")
     PROCESSED_DATA_DIR = os.getenv("PROCESSED_DATA_DIR", "processed")
 
+    # Parsed copies of the raw CSVs (Arrow IPC), keyed by file fingerprint
+    PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "false").lower() == "true"
+    PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", os.path.join(PROCESSED_DATA_DIR, "parse_cache"))
+
     DATABASE_DIR = os.getenv("DATABASE_DIR", "data_warehouse")
 
     # Database configuration
@@ -31,6 +35,58 @@ class config:
     # ETL configuration
     BATCH_SIZE = int(os.getenv("BATCH_SIZE", 1000))
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # Lazy mode: scan the CSVs and collect every table once from a single fused query plan
+    LAZY_EXECUTION = os.getenv("LAZY_EXECUTION", "false").lower() == "true"
+    STREAMING_ENGINE = os.getenv("STREAMING_ENGINE", "true").lower() == "true"
+    # Dimension load mode: "replace" rewrites dim_* tables, "upsert" applies row-hash changes,
+    # "scd2" keeps history (valid_from/valid_to/is_current) for customers, employees, products and stores
+    DIM_LOAD_MODE = os.getenv("DIM_LOAD_MODE", "replace")
+    # Read, transform and load transactions.csv in chunks of BATCH_SIZE rows (bounded memory)
+    BATCHED_TRANSACTIONS = os.getenv("BATCHED_TRANSACTIONS", "false").lower() == "true"
+    # Fact table load mode: "replace" rebuilds the table, "incremental" appends rows past the watermark
+    FACT_LOAD_MODE = os.getenv("FACT_LOAD_MODE", "replace")
+    # Transform engine: "polars", "duckdb" (SQL inside the warehouse) or "compare" (time both, load nothing)
+    ETL_ENGINE = os.getenv("ETL_ENGINE", "polars")
+    # Keep fact tables clustered (only rows appended since the last layout are checked and re-sorted),
+    # restore dimension key indexes and log zonemap pruning after every load
+    OPTIMIZE_LAYOUT = os.getenv("OPTIMIZE_LAYOUT", "false").lower() == "true"
+    # Refresh the aggregate tables (agg_*) after every successful load
+    REFRESH_AGGREGATES = os.getenv("REFRESH_AGGREGATES", "false").lower() == "true"
+    # Parquet export of the warehouse tables (fact tables Hive-partitioned by year, month and store_id)
+    EXPORT_PARQUET = os.getenv("EXPORT_PARQUET", "false").lower() == "true"
+    EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(PROCESSED_DATA_DIR, "parquet"))
+    PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+    PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", 122880))
+    # Opt-in profiling: Polars plans, DuckDB EXPLAIN ANALYZE per load statement (and cProfile per stage)
+    # written to PROFILE_DIR/<run_id>
+    PROFILE = os.getenv("PROFILE", "false").lower() == "true"
+    PROFILE_CPROFILE = os.getenv("PROFILE_CPROFILE", "false").lower() == "true"
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(PROCESSED_DATA_DIR, "profiles"))
+    # Run reports (per-stage/per-table timings, rows, bytes and peak RSS), also appended to etl_runs
+    RUN_REPORT_DIR = os.getenv("RUN_REPORT_DIR", os.path.join(PROCESSED_DATA_DIR, "run_reports"))
+    # Blue/green snapshots: every load writes a new database file under SNAPSHOT_DIR
+    # (default <directory of DATABASE_PATH>/snapshots) and DATABASE_PATH becomes a symlink to the
+    # published one; the last SNAPSHOT_RETENTION snapshots before it are kept for rollback
+    SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "false").lower() == "true"
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
+    SNAPSHOT_RETENTION = int(os.getenv("SNAPSHOT_RETENTION", 3))
+    # Stage checkpoints: extracted and transformed tables are kept as Arrow IPC under CHECKPOINT_DIR
+    # and a failed run is resumed by the next one; RETRY_TABLES (comma separated) are rebuilt anyway
+    CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "false").lower() == "true"
+    CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(PROCESSED_DATA_DIR, "checkpoints"))
+    RETRY_TABLES = [name.strip() for name in os.getenv("RETRY_TABLES", "").split(",") if name.strip()]
+    # Rebuild only the tables whose source files, transform code or load settings changed since the
+    # last successful run (fingerprints in the etl_source_fingerprints table); false rebuilds every table
+    SKIP_UNCHANGED_TABLES = os.getenv("SKIP_UNCHANGED_TABLES", "false").lower() == "true"
+    # Results kept by the dashboard query cache (src.query.WarehouseQuery), least recently used evicted first
+    QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 128))
+    # Number of CSV files read concurrently by DataExtractor.extract_data (1 = sequential)
+    EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", 4))
+    # Tables transformed concurrently by DataTransformer.transform_all_data (1 = sequential)
+    TRANSFORM_WORKERS = int(os.getenv("TRANSFORM_WORKERS", 4))
+    # Load each table as soon as its transform is done, overlapping the dimension loads with
+    # the fact transform (the run report then has one transform_load stage)
+    PIPELINED_LOAD = os.getenv("PIPELINED_LOAD", "false").lower() == "true"
 
     # Date formats
     DATE_FORMAT = os.getenv("DATE_FORMAT", "%Y-%m-%d")
@@ -40,9 +96,12 @@ class config:
     # COMPANY_NAME = os.getenv("COMPANY_NAME", "Retail Analytics Co.")
     # TIMEZONE = os.getenv("TIMEZONE", "Asia/Bangkok")
 
-    # # Performance settings
-    # MAX_MEMORY_GB = int(os.getenv("MAX_MEMORY_GB", 4))
-    # THREAD_COUNT = int(os.getenv("THREAD_COUNT", 4))
+    # Performance settings: memory budget of the whole pipeline in GB and threads used by Polars and
+    # DuckDB (unset = no limit). With a budget DuckDB spills to SPILL_DIR and transactions.csv is
+    # processed in batches when it would not fit (src.etl.resources.ResourceGovernor)
+    MAX_MEMORY_GB = float(os.getenv("MAX_MEMORY_GB")) if os.getenv("MAX_MEMORY_GB") else None
+    THREAD_COUNT = int(os.getenv("THREAD_COUNT")) if os.getenv("THREAD_COUNT") else None
+    SPILL_DIR = os.getenv("SPILL_DIR", os.path.join(PROCESSED_DATA_DIR, "spill"))
 
     # CSV files mapping
     # CSV_FILES = {
@@ -68,6 +127,84 @@ class config:
         "transactions":"transactions.csv",
         "exchange_rates":"exchange_rates.csv",
     }
+    # Schema of each source CSV: header -> type (DuckDB type names, "ENUM" = low-cardinality string).
+    # Only the listed columns are read (no type inference); DATE and TIMESTAMP columns are parsed
+    # with DATE_FORMAT and DATETIME_FORMAT. Columns missing from a file are skipped (e.g. the
+    # optional date of exchange_rates). Sources not listed here fall back to type inference.
+    CSV_SCHEMAS = {
+        "customers": {
+            "Customer ID": "BIGINT",
+            "Name": "VARCHAR",
+            "Email": "VARCHAR",
+            "Telephone": "VARCHAR",
+            "City": "ENUM",
+            "Country": "ENUM",
+            "Gender": "ENUM",
+            "Date Of Birth": "DATE",
+            "Job Title": "VARCHAR",
+        },
+        "discounts": {
+            "Start": "DATE",
+            "End": "DATE",
+            "Discont": "DOUBLE",
+            "Description": "VARCHAR",
+            "Category": "ENUM",
+            "Sub Category": "ENUM",
+        },
+        "employees": {
+            "Employee ID": "BIGINT",
+            "Store ID": "BIGINT",
+            "Name": "VARCHAR",
+            "Position": "ENUM",
+        },
+        "products": {
+            "Product ID": "BIGINT",
+            "Category": "ENUM",
+            "Sub Category": "ENUM",
+            "Description PT": "VARCHAR",
+            "Description DE": "VARCHAR",
+            "Description FR": "VARCHAR",
+            "Description ES": "VARCHAR",
+            "Description EN": "VARCHAR",
+            "Description ZH": "VARCHAR",
+            "Color": "VARCHAR",
+            "Sizes": "VARCHAR",
+            "Production Cost": "DOUBLE",
+        },
+        "stores": {
+            "Store ID": "BIGINT",
+            "Country": "ENUM",
+            "City": "ENUM",
+            "Store Name": "VARCHAR",
+            "Number of Employees": "INTEGER",
+            "ZIP Code": "VARCHAR",
+            "Latitude": "DOUBLE",
+            "Longitude": "DOUBLE",
+        },
+        # Size, Color, Currency Symbol and Invoice Total are not used by any table
+        "transactions": {
+            "Invoice ID": "VARCHAR",
+            "Line": "BIGINT",
+            "Customer ID": "BIGINT",
+            "Product ID": "BIGINT",
+            "Unit Price": "DOUBLE",
+            "Quantity": "BIGINT",
+            "Date": "TIMESTAMP",
+            "Discount": "DOUBLE",
+            "Line Total": "DOUBLE",
+            "Store ID": "BIGINT",
+            "Employee ID": "BIGINT",
+            "Currency": "ENUM",
+            "SKU": "VARCHAR",
+            "Transaction Type": "ENUM",
+            "Payment Method": "ENUM",
+        },
+        "exchange_rates": {
+            "date": "DATE",
+            "currency": "ENUM",
+            "rate_to_usd": "DOUBLE",
+        },
+    }
     # @classmethod
     # def ensure_directories(cls):
     # """Ensure all required directories exist"""
@@ -92,4 +229,8 @@ class config:
     def get_database_path(cls) -> str:
         """Get the full path to the database file"""
         # return cls.DATABASE_DIR / cls.DATABASE_PATH
-        return cls.DATABASE_PATH
\ No newline at end of file
+        return cls.DATABASE_PATH
+
+# Polars sizes its thread pool once, when it is first imported (src/__init__ imports this module first)
+if config.THREAD_COUNT and "POLARS_MAX_THREADS" not in os.environ:
+    os.environ["POLARS_MAX_THREADS"] = str(config.THREAD_COUNT)
@@ -0,0 +1,215 @@
+"""
+Aggregate (rollup) tables maintained inside the warehouse
+
+Dashboards read small pre-summed tables instead of scanning fact_transactions.
+After each load only the partitions touched since the last refresh are recomputed.
+"""
+
+import logging
+from typing import Dict, Optional
+
+from src.config import config
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class AggregateRefresher:
+    """
+    Class for building and incrementally refreshing the aggregate tables
+
+    Every aggregate has:
+    - select: the rollup query over fact_transactions f, restricted by {scope}
+    - scope: fact rows to recompute when rows from date key {from_key} onward changed
+    - stale: aggregate rows replaced by that recomputation
+    - dimensions (optional): dimension columns copied into the rollup
+    Incremental fact loads only insert rows at or after the fact watermark, so every day from the
+    watermark seen at the previous refresh onward is recomputed; older partitions are left alone.
+    A replace load (no fact watermark) rebuilds every aggregate, and so does a change to the
+    dimension columns an aggregate copies (e.g. renamed product categories), which would
+    otherwise stay in the older partitions.
+    """
+
+    AGGREGATES = {
+        # Daily sales by store
+        "agg_daily_store_sales": {
+            "select": """
+                SELECT f.date_key, f.store_id,
+                       count(*) AS line_items, count(DISTINCT f.invoice_id) AS invoices,
+                       sum(f.quantity) AS quantity,
+                       sum(f.total_revenue_usd) AS total_revenue_usd,
+                       sum(f.discount_usd) AS discount_usd,
+                       sum(f.net_amount_usd) AS net_amount_usd
+                FROM fact_transactions f
+                WHERE {scope}
+                GROUP BY f.date_key, f.store_id
+                ORDER BY f.date_key, f.store_id
+            """,
+            "scope": "f.date_key >= {from_key}",
+            "stale": "date_key >= {from_key}",
+        },
+        # Monthly revenue by product category (month_key = YYYYMM)
+        "agg_monthly_category_revenue": {
+            "select": """
+                SELECT f.date_key // 100 AS month_key,
+                       CAST(p.category AS VARCHAR) AS category,
+                       CAST(p.sub_category AS VARCHAR) AS sub_category,
+                       count(*) AS line_items,
+                       sum(f.quantity) AS quantity,
+                       sum(f.total_revenue_usd) AS total_revenue_usd,
+                       sum(f.net_amount_usd) AS net_amount_usd
+                FROM fact_transactions f
+                LEFT JOIN ({products}) p ON p.product_id = f.product_id
+                WHERE {scope}
+                GROUP BY ALL
+                ORDER BY month_key, category, sub_category
+            """,
+            "scope": "f.date_key >= {from_key} // 100 * 100",
+            "stale": "month_key >= {from_key} // 100",
+            "dimensions": "SELECT product_id, category, sub_category FROM ({products})",
+        },
+        # Customer lifetime value in USD (recomputed for customers who bought again)
+        "agg_customer_lifetime_value": {
+            "select": """
+                SELECT f.customer_id,
+                       min(f.date) AS first_purchase,
+                       max(f.date) AS last_purchase,
+                       count(DISTINCT f.invoice_id) AS invoices,
+                       sum(f.quantity) AS quantity,
+                       sum(f.net_amount_usd) AS lifetime_value_usd
+                FROM fact_transactions f
+                WHERE {scope}
+                GROUP BY f.customer_id
+                ORDER BY f.customer_id
+            """,
+            "scope": "f.customer_id IN (SELECT customer_id FROM fact_transactions WHERE date_key >= {from_key})",
+            "stale": "customer_id IN (SELECT customer_id FROM fact_transactions WHERE date_key >= {from_key})",
+        },
+    }
+
+    FACT_TABLE = "fact_transactions"
+    # Warehouse tables the aggregates are computed from
+    SOURCE_TABLES = [FACT_TABLE, "dim_products"]
+
+    def __init__(self, loader):
+        """
+        Args:
+            loader: DataLoader whose warehouse connection is used
+        """
+        self.config = config()
+        self.loader = loader
+        if not loader.connection:
+            loader.connect()
+        self.connection = loader.connection
+
+    def create_state_table(self):
+        """Create the table recording the fact watermark each aggregate was refreshed at"""
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS etl_aggregates (
+                aggregate_name VARCHAR PRIMARY KEY,
+                fact_watermark VARCHAR,
+                rows_written BIGINT,
+                refreshed_at TIMESTAMP
+            )
+        """)
+        # Hash of the dimension columns each aggregate was built with (added after the first release)
+        self.connection.execute("ALTER TABLE etl_aggregates ADD COLUMN IF NOT EXISTS dimension_hash VARCHAR")
+
+    def _products_sql(self) -> str:
+        """dim_products with one row per product (the current version in scd2 mode)"""
+        if self.loader.column_type("dim_products", "is_current"):
+            return "SELECT product_id, category, sub_category FROM dim_products WHERE is_current"
+        return "SELECT product_id, category, sub_category FROM dim_products"
+
+    def _dimension_hash(self, aggregate_name: str) -> Optional[str]:
+        """Order-independent hash of the dimension rows an aggregate copies (None when it copies none)"""
+        dimensions = self.AGGREGATES[aggregate_name].get("dimensions")
+        if dimensions is None:
+            return None
+        sql = dimensions.format(products=self._products_sql())
+        return self.connection.execute(f"""
+            SELECT CAST(count(*) AS VARCHAR) || ':' || CAST(coalesce(bit_xor(hash(CAST(d AS VARCHAR))), 0) AS VARCHAR)
+            FROM ({sql}) d
+        """).fetchone()[0]
+
+    def _from_key(self, aggregate_name: str, dimension_hash: Optional[str] = None) -> Optional[int]:
+        """
+        First date key to recompute, or None when the aggregate has to be rebuilt
+        """
+        if not self.loader.table_exists(aggregate_name):
+            return None
+        row = self.connection.execute(
+            "SELECT fact_watermark, dimension_hash FROM etl_aggregates WHERE aggregate_name = ?",
+            [aggregate_name]).fetchone()
+        if row is None or row[0] is None:
+            return None
+        if row[1] != dimension_hash:
+            logger.info(f"Dimension rows of {aggregate_name} changed since its last refresh, rebuilding it")
+            return None
+        return self.connection.execute(
+            "SELECT CAST(strftime(CAST(? AS TIMESTAMP), '%Y%m%d') AS INTEGER)", [row[0]]).fetchone()[0]
+
+    def refresh(self, aggregate_name: str, full: bool = False) -> int:
+        """
+        Refresh one aggregate table
+
+        Args:
+            aggregate_name: Name of the aggregate in AGGREGATES
+            full: Rebuild the whole table (e.g. after dimension attributes such as categories changed)
+
+        Returns:
+            Number of aggregate rows written
+        """
+        spec = self.AGGREGATES[aggregate_name]
+        self.create_state_table()
+        fact_watermark = None
+        if self.loader.table_exists("etl_watermarks"):
+            row = self.connection.execute(
+                "SELECT watermark_value FROM etl_watermarks WHERE table_name = ?", [self.FACT_TABLE]).fetchone()
+            fact_watermark = row[0] if row else None
+
+        dimension_hash = self._dimension_hash(aggregate_name)
+        from_key = None if full or fact_watermark is None else self._from_key(aggregate_name, dimension_hash)
+        if from_key is None:
+            sql = spec["select"].format(scope="true", products=self._products_sql())
+            rows = self.connection.execute(f"CREATE OR REPLACE TABLE {aggregate_name} AS {sql}").fetchone()[0]
+            logger.info(f"Rebuilt {aggregate_name}: {rows} rows")
+        else:
+            scope = spec["scope"].format(from_key=from_key)
+            sql = spec["select"].format(scope=scope, products=self._products_sql())
+            deleted = self.connection.execute(
+                f"DELETE FROM {aggregate_name} WHERE {spec['stale'].format(from_key=from_key)}").fetchone()[0]
+            rows = self.connection.execute(f"INSERT INTO {aggregate_name} {sql}").fetchone()[0]
+            logger.info(f"Refreshed {aggregate_name} from date key {from_key}: "
+                        f"{deleted} rows replaced by {rows}")
+
+        self.connection.execute("""
+            INSERT OR REPLACE INTO etl_aggregates
+                (aggregate_name, fact_watermark, rows_written, refreshed_at, dimension_hash)
+            VALUES (?, ?, ?, current_timestamp, ?)
+        """, [aggregate_name, fact_watermark, rows, dimension_hash])
+        return rows
+
+    def refresh_all(self, full: bool = False) -> Dict[str, int]:
+        """
+        Refresh every aggregate in one transaction
+
+        Returns:
+            Dictionary of aggregate name to rows written, or None if the refresh failed
+        """
+        if not self.loader.table_exists(self.FACT_TABLE):
+            logger.warning(f"{self.FACT_TABLE} does not exist, no aggregates to refresh")
+            return {}
+        self.connection.begin()
+        try:
+            rows = {name: self.refresh(name, full=full) for name in self.AGGREGATES}
+            self.connection.commit()
+        except Exception as e:
+            self.loader.rollback()
+            logger.error(f"Error refreshing aggregates, rolled back: {str(e)}")
+            return None
+        self.loader.bump_generation()
+        return rows
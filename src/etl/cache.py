@@ -0,0 +1,147 @@
+"""
+Columnar parse cache for raw CSV sources
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+import polars as pl
+
+from src.config import config
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class ParseCache:
+    """
+    Class for caching parsed CSV files as Arrow IPC files
+
+    Each cached copy is keyed by the source path, size, mtime and content hash
+    (plus the read options), so a changed file or a changed reader never hits a stale entry.
+    Later runs read the cached copy with read_ipc (memory-mapped) or scan_ipc instead of reparsing the CSV.
+    Only eager reads write the cache: sinking a lazy scan would read the whole file and defeat
+    the projection and filter pushdown of the plan that scans it.
+    """
+
+    INDEX_FILE = "index.json"
+    CHUNK_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.config = config()
+        self.cache_dir = cache_dir or self.config.PARSE_CACHE_DIR
+        self._lock = threading.Lock()
+        self._index = None
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    def _load_index(self) -> Dict[str, dict]:
+        if self._index is None:
+            try:
+                with open(self._index_path(), encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(tmp_path, self._index_path())
+
+    def _hash_file(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def fingerprint(self, path: str) -> dict:
+        """
+        Fingerprint a source file
+
+        The content hash is only recomputed when size or mtime changed since the last run.
+
+        Returns:
+            dict with path, size, mtime_ns and sha256
+        """
+        abs_path = os.path.abspath(path)
+        stat = os.stat(abs_path)
+        with self._lock:
+            entry = self._load_index().get(abs_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry
+
+        entry = {
+            "path": abs_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": self._hash_file(abs_path),
+        }
+        with self._lock:
+            self._load_index()[abs_path] = entry
+            self._save_index()
+        return entry
+
+    def cache_key(self, path: str, read_options: dict) -> str:
+        """Build the cache key from the file fingerprint and the CSV read options"""
+        payload = json.dumps({"source": self.fingerprint(path), "options": read_options},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def cached_path(self, table_name: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{table_name}-{key}.arrow")
+
+    def load(self, table_name: str, key: str, lazy: bool = False) -> pl.DataFrame | pl.LazyFrame | None:
+        """
+        Read a cached copy if one exists
+
+        Returns:
+            Memory-mapped DataFrame, LazyFrame in lazy mode, or None on a cache miss
+        """
+        path = self.cached_path(table_name, key)
+        if not os.path.exists(path):
+            return None
+        logger.info(f"Parse cache hit for {table_name} ({path})")
+        if lazy:
+            return pl.scan_ipc(path)
+        return pl.read_ipc(path)
+
+    def store(self, table_name: str, key: str, frame: pl.DataFrame) -> pl.DataFrame:
+        """
+        Write a parsed frame into the cache and drop older entries for the same table
+
+        Returns:
+            The frame to use downstream
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.cached_path(table_name, key)
+        tmp_path = path + ".tmp"
+        frame.write_ipc(tmp_path)
+        os.replace(tmp_path, path)
+        self._purge(table_name, keep=path)
+        logger.info(f"Cached parsed {table_name} at {path}")
+        return frame
+
+    def _purge(self, table_name: str, keep: str):
+        """Remove stale cache files of a table"""
+        prefix = f"{table_name}-"
+        for file_name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, file_name)
+            if file_name.startswith(prefix) and file_name.endswith(".arrow") and path != keep:
+                # Only <table>-<16 hex key>.arrow, so a table whose name shares the prefix is left alone
+                if len(file_name) - len(prefix) == len("0123456789abcdef.arrow"):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        logger.warning(f"Could not remove stale cache file {path}: {e}")
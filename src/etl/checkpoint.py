@@ -0,0 +1,184 @@
+"""
+Stage checkpoints of a pipeline run
+
+The extracted and transformed tables of a run are written as Arrow IPC files under
+<CHECKPOINT_DIR>/<run_id>/<stage>/<table>.arrow, and manifest.json records which stages and
+tables are done. When a run fails, the next run with the same source files and load settings
+resumes it: finished tables are read back (memory-mapped) instead of being extracted and
+transformed again, only the tables that are missing are rebuilt, and warehouse stages that
+already committed are skipped. A run that completes deletes its checkpoint.
+"""
+
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import polars as pl
+
+from src.config import config
+from src.etl.cache import ParseCache
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class RunCheckpoint:
+    """
+    Class for persisting the stage outputs of a run and resuming a failed one
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    # Stages whose output is a set of tables kept as Arrow IPC files
+    FRAME_STAGES = ["extract", "transform"]
+
+    def __init__(self, run_id: str, settings: dict, checkpoint_dir: Optional[str] = None):
+        """
+        Args:
+            run_id: Id of the run (RunReport.run_id); names the checkpoint directory
+            settings: Settings a resumed run must share (load modes, paths, ...)
+            checkpoint_dir: Root of the run directories (default config.CHECKPOINT_DIR)
+        """
+        self.config = config()
+        self.checkpoint_dir = checkpoint_dir or self.config.CHECKPOINT_DIR
+        self.run_id = run_id
+        self.run_dir = os.path.join(self.checkpoint_dir, run_id)
+        self.manifest = {
+            "run_id": run_id,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "status": "running",
+            "settings": settings,
+            "sources": self.source_fingerprints(),
+            "stages": {},
+        }
+
+    @staticmethod
+    def source_fingerprints() -> Dict[str, str]:
+        """Content hash of every source file that exists (ParseCache.fingerprint)"""
+        cache = ParseCache()
+        fingerprints = {}
+        for table_name in config.CSV_FILES:
+            path = config.get_csv_path(table_name)
+            if os.path.exists(path):
+                fingerprints[table_name] = cache.fingerprint(path)["sha256"]
+        return fingerprints
+
+    @classmethod
+    def resume(cls, run_id: str, settings: dict, checkpoint_dir: Optional[str] = None) -> "RunCheckpoint":
+        """
+        Continue the latest unfinished run with the same sources and settings, or start a new one
+
+        Args:
+            run_id: Id of this run, used when there is nothing to resume
+        """
+        checkpoint = cls(run_id, settings, checkpoint_dir)
+        if not os.path.isdir(checkpoint.checkpoint_dir):
+            return checkpoint
+        for name in sorted(os.listdir(checkpoint.checkpoint_dir), reverse=True):
+            path = os.path.join(checkpoint.checkpoint_dir, name, cls.MANIFEST_FILE)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if manifest.get("status") == "complete":
+                continue
+            if manifest.get("settings") != settings or manifest.get("sources") != checkpoint.manifest["sources"]:
+                logger.info(f"Checkpoint of run {name} does not match this run's sources or settings, not resumed")
+                continue
+            manifest.setdefault("resumed_by", []).append(run_id)
+            checkpoint.run_id = manifest["run_id"]
+            checkpoint.run_dir = os.path.join(checkpoint.checkpoint_dir, name)
+            checkpoint.manifest = manifest
+            done = [stage for stage, entry in manifest["stages"].items() if entry["status"] == "ok"]
+            logger.info(f"Resuming run {checkpoint.run_id} (stages done: {', '.join(done) or 'none'})")
+            break
+        return checkpoint
+
+    def _save_manifest(self):
+        os.makedirs(self.run_dir, exist_ok=True)
+        path = os.path.join(self.run_dir, self.MANIFEST_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _stage(self, stage: str) -> dict:
+        return self.manifest["stages"].setdefault(stage, {"status": "running", "tables": {}})
+
+    def stage_done(self, stage: str) -> bool:
+        return self.manifest["stages"].get(stage, {}).get("status") == "ok"
+
+    def mark(self, stage: str, success: bool):
+        """Record the outcome of a stage"""
+        entry = self._stage(stage)
+        entry["status"] = "ok" if success else "failed"
+        entry["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        self._save_manifest()
+
+    def save_frame(self, stage: str, table_name: str, frame: pl.DataFrame):
+        """Write one table of a stage and record it in the manifest"""
+        directory = os.path.join(self.run_dir, stage)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{table_name}.arrow")
+        tmp_path = path + ".tmp"
+        frame.write_ipc(tmp_path)
+        os.replace(tmp_path, path)
+        self._stage(stage)["tables"][table_name] = {"file": os.path.relpath(path, self.run_dir), "rows": len(frame)}
+        self._save_manifest()
+
+    def save_frames(self, stage: str, frames: Dict[str, pl.DataFrame]):
+        for table_name, frame in frames.items():
+            self.save_frame(stage, table_name, frame)
+
+    def tables(self, stage: str) -> List[str]:
+        """Tables of a stage that are checkpointed"""
+        return list(self.manifest["stages"].get(stage, {}).get("tables", {}))
+
+    def load_frames(self, stage: str, tables: Optional[List[str]] = None) -> Dict[str, pl.DataFrame]:
+        """
+        Read the checkpointed tables of a stage (memory-mapped)
+
+        A table whose file is missing is left out, so it is rebuilt.
+        """
+        frames = {}
+        for table_name, entry in self.manifest["stages"].get(stage, {}).get("tables", {}).items():
+            if tables is not None and table_name not in tables:
+                continue
+            path = os.path.join(self.run_dir, entry["file"])
+            if os.path.exists(path):
+                frames[table_name] = pl.read_ipc(path)
+        return frames
+
+    def invalidate(self, tables: List[str]):
+        """
+        Forget checkpointed tables (e.g. to retry one table after fixing its transform) and the
+        warehouse stages that would have used them
+        """
+        for stage in self.FRAME_STAGES:
+            for table_name in tables:
+                self.manifest["stages"].get(stage, {}).get("tables", {}).pop(table_name, None)
+            if stage in self.manifest["stages"]:
+                self.manifest["stages"][stage]["status"] = "running"
+        for stage in list(self.manifest["stages"]):
+            if stage not in self.FRAME_STAGES:
+                del self.manifest["stages"][stage]
+        self._save_manifest()
+        logger.info(f"Checkpoints of {', '.join(tables)} dropped, they will be rebuilt")
+
+    def finish(self, success: bool):
+        """
+        Delete the checkpoint of a completed run; keep the one of a failed run for the next attempt
+        """
+        if not success:
+            self.manifest["status"] = "failed"
+            self._save_manifest()
+            logger.info(f"Checkpoint kept in {self.run_dir}, the next run resumes it")
+            return
+        self.manifest["status"] = "complete"
+        shutil.rmtree(self.run_dir, ignore_errors=True)
@@ -0,0 +1,273 @@
+"""
+DuckDB-native extract and transform engine
+
+Stages the raw CSVs with DuckDB's parallel CSV reader and builds the star schema
+with SQL inside the warehouse, without a Python-side DataFrame hop.
+The SQL mirrors DataTransformer so both engines produce the same tables.
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional
+
+import duckdb as dd
+
+from src.config import config
+from src.etl.extract import DataExtractor
+from src.etl.transform import DataTransformer
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class DuckDBTransformer:
+    """
+    Class for transforming the raw CSVs into the dimensional model with DuckDB SQL
+    """
+
+    # SQL of each warehouse table, reading from the raw_<source> views created by stage_sources
+    TABLE_SQL = {
+        "dim_customers": """
+            SELECT customer_id, name AS customer_name, email, telephone, city, country,
+                   gender, date_of_birth, coalesce(job_title, '') AS job_title,
+                   current_localtimestamp() AS created_at, current_localtimestamp() AS updated_at
+            FROM raw_customers
+            WHERE customer_id IS NOT NULL
+            ORDER BY customer_id
+        """,
+        "dim_discounts": """
+            SELECT "start", "end", discont AS discount, description,
+                   coalesce(category, '') AS category, coalesce(sub_category, '') AS sub_category,
+                   current_localtimestamp() AS created_at, current_localtimestamp() AS updated_at
+            FROM raw_discounts
+            ORDER BY category
+        """,
+        "dim_employees": """
+            SELECT employee_id, store_id, name, position,
+                   current_localtimestamp() AS created_at, current_localtimestamp() AS updated_at
+            FROM raw_employees
+            WHERE employee_id IS NOT NULL
+            ORDER BY employee_id
+        """,
+        "dim_products": """
+            SELECT product_id, category, sub_category,
+                   description_pt, description_de, description_fr,
+                   description_es, description_en, description_zh,
+                   coalesce(color, '') AS color, coalesce(sizes, '') AS sizes, production_cost,
+                   current_localtimestamp() AS created_at, current_localtimestamp() AS updated_at
+            FROM raw_products
+            WHERE product_id IS NOT NULL
+            ORDER BY product_id
+        """,
+        "dim_stores": """
+            SELECT store_id, country, city, store_name, number_of_employees,
+                   zip_code, latitude, longitude,
+                   current_localtimestamp() AS created_at, current_localtimestamp() AS updated_at
+            FROM raw_stores
+            WHERE store_id IS NOT NULL
+            ORDER BY store_id
+        """,
+        "dim_date": """
+            SELECT CAST(d AS DATE) AS date,
+                   year(d) AS year, quarter(d) AS quarter, month(d) AS month,
+                   strftime(d, '%B') AS month_name, day(d) AS day,
+                   isodow(d) AS day_of_week, strftime(d, '%A') AS day_name,
+                   weekofyear(d) AS week_of_year, isodow(d) IN (6, 7) AS is_weekend,
+                   CAST(year(d) * 10000 + month(d) * 100 + day(d) AS INTEGER) AS date_key,
+                   (month(d) - 10 + 12) % 12 // 3 + 1 AS fiscal_quarter
+            FROM (SELECT min(CAST(date AS DATE)) AS first_date, max(CAST(date AS DATE)) AS last_date
+                  FROM raw_transactions) AS bounds,
+                 generate_series(bounds.first_date, bounds.last_date, INTERVAL 1 DAY) AS t(d)
+            ORDER BY date_key
+        """,
+        "fact_transactions": """
+            WITH fact AS (
+                SELECT invoice_id, line AS line_item, customer_id, product_id, quantity, date,
+                       discount, line_total, store_id, employee_id, currency,
+                       sku AS stock_keeping_unit, transaction_type, payment_method, unit_price,
+                       current_localtimestamp() AS created_at, current_localtimestamp() AS updated_at,
+                       CAST(year(date) * 10000 + month(date) * 100 + day(date) AS INTEGER) AS date_key
+                FROM raw_transactions
+            ), converted AS (
+                SELECT fact.*, rates.rate_to_usd,
+                       fact.unit_price * rates.rate_to_usd AS unit_price_usd
+                FROM fact
+                {rates_join}
+            ), revenue AS (
+                SELECT *, quantity * unit_price_usd AS total_revenue_usd
+                FROM converted
+            )
+            SELECT *,
+                   -- discount is a fraction (0.2 = 20% off)
+                   total_revenue_usd * (1 - discount) AS net_amount_usd,
+                   total_revenue_usd * discount AS discount_usd
+            FROM revenue
+            ORDER BY date_key
+        """,
+    }
+
+    # Daily rates: the latest rate on or before the transaction date (mirrors join_asof)
+    RATES_JOIN_ASOF = """
+                ASOF LEFT JOIN (
+                    SELECT currency, CAST(date AS DATE) AS rate_date, last(rate_to_usd) AS rate_to_usd
+                    FROM raw_exchange_rates GROUP BY ALL
+                ) AS rates
+                ON fact.currency = rates.currency AND CAST(fact.date AS DATE) >= rates.rate_date
+    """
+    # One rate per currency
+    RATES_JOIN_LATEST = """
+                LEFT JOIN (
+                    SELECT currency, last(rate_to_usd) AS rate_to_usd
+                    FROM raw_exchange_rates GROUP BY currency
+                ) AS rates
+                ON fact.currency = rates.currency
+    """
+
+    def __init__(self, loader=None, connection: Optional[dd.DuckDBPyConnection] = None):
+        """
+        Args:
+            loader: DataLoader whose warehouse connection is used (needed for incremental fact loads)
+            connection: DuckDB connection to use instead (e.g. in-memory for engine comparison)
+        """
+        self.config = config()
+        self.loader = loader
+        if connection is None and loader is not None:
+            if not loader.connection:
+                loader.connect()
+            connection = loader.connection
+        self.connection = connection
+        self.staged = set()
+        # Seconds spent building each table in the last load_all_tables
+        self.timings = {}
+
+    @staticmethod
+    def _quote_identifier(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    @staticmethod
+    def _quote_literal(value: str) -> str:
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def _read_csv_sql(self, file_path: str, types: Optional[Dict[str, str]] = None) -> str:
+        null_values = ", ".join(self._quote_literal(v) for v in DataExtractor.NULL_VALUES)
+        options = f"header = true, nullstr = [{null_values}]"
+        if types:
+            type_list = ", ".join(f"{self._quote_literal(col)}: {self._quote_literal(col_type)}"
+                                  for col, col_type in types.items())
+            options += (f", types = {{{type_list}}}"
+                        f", dateformat = {self._quote_literal(self.config.DATE_FORMAT)}"
+                        f", timestampformat = {self._quote_literal(self.config.DATETIME_FORMAT)}")
+        return f"read_csv({self._quote_literal(file_path)}, {options})"
+
+    def stage_sources(self, tables: Optional[List[str]] = None) -> List[str]:
+        """
+        Create a raw_<table> view over each source CSV with standardized column names
+
+        Column names follow DataTransformer.standardize_column_names, so the SQL can use
+        the same names as the Polars transforms. Sources in config.CSV_SCHEMAS are read with
+        the declared types and date formats, and only their declared columns are staged.
+
+        Args:
+            tables: Sources to stage (default all of config.CSV_FILES)
+
+        Returns:
+            List of staged source names
+        """
+        tables = tables or list(self.config.CSV_FILES)
+        for table_name in tables:
+            file_path = self.config.get_csv_path(table_name)
+            columns = [row[0] for row in self.connection.execute(
+                f"DESCRIBE SELECT * FROM {self._read_csv_sql(file_path)}").fetchall()]
+            registry = self.config.CSV_SCHEMAS.get(table_name)
+            types = None
+            if registry:
+                columns = [col for col in columns if col in registry]
+                # ENUM columns are staged as text; the loader encodes them on insert
+                types = {col: "VARCHAR" if registry[col] == "ENUM" else registry[col] for col in columns}
+            read_csv = self._read_csv_sql(file_path, types)
+            select_list = ", ".join(
+                f"{self._quote_identifier(col)} AS {self._quote_identifier(col.lower().replace(' ', '_').replace('-', '_'))}"
+                for col in columns)
+            self.connection.execute(
+                f"CREATE OR REPLACE TEMP VIEW raw_{table_name} AS SELECT {select_list} FROM {read_csv}")
+            self.staged.add(table_name)
+            logger.info(f"Staged {table_name} from {file_path}")
+        return tables
+
+    def table_sql(self, table_name: str) -> str:
+        """SQL of one table, with the exchange-rate join chosen from the staged rates columns"""
+        sql = self.TABLE_SQL[table_name]
+        if table_name == "fact_transactions":
+            rate_columns = [row[0] for row in self.connection.execute("DESCRIBE raw_exchange_rates").fetchall()]
+            sql = sql.replace("{rates_join}",
+                              self.RATES_JOIN_ASOF if "date" in rate_columns else self.RATES_JOIN_LATEST)
+        return sql
+
+    def build_table(self, table_name: str, target: Optional[str] = None) -> int:
+        """
+        Materialize one warehouse table with CREATE OR REPLACE TABLE ... AS <sql>
+
+        Args:
+            table_name: Name of the table in TABLE_SQL
+            target: Name of the table to create (default table_name)
+
+        Returns:
+            Number of rows written
+        """
+        target = target or table_name
+        return self.connection.execute(
+            f"CREATE OR REPLACE TABLE {target} AS {self.table_sql(table_name)}").fetchone()[0]
+
+    def load_table(self, table_name: str) -> int:
+        """
+        Build one table into the warehouse, honoring config.FACT_LOAD_MODE and config.DIM_LOAD_MODE
+
+        Extended tables (dim_date) only get the rows that are not loaded yet.
+
+        With a loader the table is written once into its declared schema (DataLoader.TABLE_SCHEMAS).
+
+        Returns:
+            Number of rows written
+        """
+        if self.loader is None:
+            return self.build_table(table_name)
+        if table_name in self.loader.FACT_TABLES and self.config.FACT_LOAD_MODE == "incremental":
+            stage_name = f"stage_{table_name}"
+            self.connection.execute(f"CREATE OR REPLACE TEMP VIEW {stage_name} AS {self.table_sql(table_name)}")
+            rows = self.loader.insert_incremental(stage_name, table_name)
+            self.connection.execute(f"DROP VIEW {stage_name}")
+            return rows
+        if table_name in self.loader.DIMENSION_KEYS and self.config.DIM_LOAD_MODE in ("upsert", "scd2"):
+            stats = self.loader.merge_dimension(f"({self.table_sql(table_name)})", table_name)
+            return stats["inserted"] + stats["changed"] + stats["deleted"]
+        if table_name in self.loader.EXTENDED_TABLES:
+            return self.loader.insert_missing(f"({self.table_sql(table_name)})", table_name)
+        # a full rebuild also drops the watermark and the recorded layout, as in DataLoader.load_dataframe
+        self.loader.reset_table(table_name)
+        rows = self.loader.insert_from(f"({self.table_sql(table_name)})", table_name)
+        if table_name in self.loader.FACT_TABLES:
+            # written in one ORDER BY cluster_by insert
+            self.loader.set_clustered_rows(table_name, rows)
+        return rows
+
+    def load_all_tables(self) -> Dict[str, int]:
+        """
+        Build every table whose sources are staged, dimensions before facts
+
+        Returns:
+            Dictionary of table name to rows written
+        """
+        logger.info("Starting DuckDB transformation process")
+        rows = {}
+        self.timings = {}
+        for table_name, sources in DataTransformer.TABLE_SOURCES.items():
+            if all(source in self.staged for source in sources):
+                start = time.perf_counter()
+                rows[table_name] = self.load_table(table_name)
+                self.timings[table_name] = time.perf_counter() - start
+                logger.info(f"Successfully built {rows[table_name]} rows into {table_name}")
+        logger.info(f"DuckDB transformation complete. Created {len(rows)} tables")
+        return rows
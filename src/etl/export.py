@@ -0,0 +1,282 @@
+"""
+Parquet export of the star schema
+
+Writes every warehouse table as Parquet next to the DuckDB file, so other tools can read
+the data without opening the database. Fact tables are Hive-partitioned; only partitions
+whose contents changed since the previous export are rewritten.
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.config import config
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class ParquetExporter:
+    """
+    Class for exporting the warehouse tables to (partitioned) Parquet
+
+    Layout under the export directory:
+    - <dim_table>/<dim_table>.parquet
+    - <fact_table>/year=YYYY/month=M/store_id=N/data_0.parquet
+    - manifest.json: settings, row counts, checksums and files of every table and partition
+
+    Each table and fact partition has a checksum (sum of the row hashes, audit columns
+    excluded, so duplicated rows change it too); a table or partition is only rewritten when its row count or checksum changed,
+    or when the compression, row-group size or partitioning changed. Files under a fact table
+    directory that the manifest does not list are removed after each export.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+
+    # Hive partition columns of each fact table (column -> expression over the fact row)
+    FACT_PARTITIONS = {
+        "fact_transactions": {"year": "year(date)", "month": "month(date)", "store_id": "store_id"},
+    }
+
+    # Columns left out of the checksums (they change on every reload without changing the data)
+    AUDIT_COLUMNS = ("created_at", "updated_at")
+
+    # Directory value DuckDB writes for a NULL partition value (see null_partition_value)
+    _null_partition_value: Optional[str] = None
+
+    def __init__(self, loader, export_dir: Optional[str] = None,
+                 compression: Optional[str] = None, row_group_size: Optional[int] = None):
+        """
+        Args:
+            loader: DataLoader whose warehouse connection is used
+            export_dir: Output directory (default config.EXPORT_DIR)
+            compression: Parquet compression codec (default config.PARQUET_COMPRESSION)
+            row_group_size: Rows per Parquet row group (default config.PARQUET_ROW_GROUP_SIZE)
+        """
+        self.config = config()
+        self.loader = loader
+        if not loader.connection:
+            loader.connect()
+        self.connection = loader.connection
+        self.export_dir = export_dir or self.config.EXPORT_DIR
+        self.compression = compression or self.config.PARQUET_COMPRESSION
+        self.row_group_size = row_group_size or self.config.PARQUET_ROW_GROUP_SIZE
+        # Bytes of Parquet written per table by the last export_all (0 when it was unchanged)
+        self.bytes_written: Dict[str, int] = {}
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.export_dir, self.MANIFEST_FILE)
+
+    def load_manifest(self) -> dict:
+        """Manifest of the previous export ({} when there is none)"""
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: dict):
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _copy_options(self) -> str:
+        return f"FORMAT parquet, COMPRESSION {self.compression}, ROW_GROUP_SIZE {int(self.row_group_size)}"
+
+    def _checksum_sql(self, table_name: str) -> str:
+        """Aggregate expression fingerprinting the rows of a table (or of one partition)"""
+        columns = [row[0] for row in self.connection.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [table_name]).fetchall() if row[0] not in self.AUDIT_COLUMNS]
+        return f"CAST(sum(hash({', '.join(map(self.loader.quote, columns))})) AS VARCHAR)"
+
+    def null_partition_value(self) -> str:
+        """
+        Name DuckDB gives the directory of a NULL partition value ("NULL" or "__HIVE_DEFAULT_PARTITION__"
+        depending on the version), found once by writing a one-row partitioned COPY
+        """
+        if ParquetExporter._null_partition_value is None:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                files = self.connection.execute(f"""
+                    COPY (SELECT CAST(NULL AS INTEGER) AS p, 1 AS v) TO '{tmp_dir}'
+                    (FORMAT parquet, PARTITION_BY (p), RETURN_FILES)
+                """).fetchone()[1]
+                ParquetExporter._null_partition_value = os.path.basename(os.path.dirname(files[0])).split("=", 1)[1]
+        return ParquetExporter._null_partition_value
+
+    def partition_key(self, columns: List[str], values) -> str:
+        """Relative directory of a partition, named as DuckDB names it (e.g. year=2024/month=1/store_id=5)"""
+        null_value = self.null_partition_value()
+        return "/".join(f"{col}={null_value if value is None else value}" for col, value in zip(columns, values))
+
+    def export_table(self, table_name: str, previous: Optional[dict]) -> dict:
+        """
+        Export an unpartitioned table as one Parquet file if it changed
+
+        Returns:
+            Manifest entry of the table
+        """
+        rows, checksum = self.connection.execute(
+            f"SELECT count(*), {self._checksum_sql(table_name)} FROM {table_name}").fetchone()
+        relative_path = os.path.join(table_name, f"{table_name}.parquet")
+        path = os.path.join(self.export_dir, relative_path)
+        if previous and previous.get("rows") == rows and previous.get("checksum") == checksum and os.path.exists(path):
+            logger.info(f"{table_name} unchanged, export skipped")
+            return previous
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        self.connection.execute(f"COPY {table_name} TO '{tmp_path}' ({self._copy_options()})")
+        os.replace(tmp_path, path)
+        self.bytes_written[table_name] = os.path.getsize(path)
+        logger.info(f"Exported {rows} rows of {table_name} to {path}")
+        return {"path": relative_path, "rows": rows, "checksum": checksum}
+
+    def export_partitioned(self, table_name: str, previous: Optional[dict]) -> dict:
+        """
+        Export a fact table as Hive-partitioned Parquet, rewriting only changed partitions
+
+        Returns:
+            Manifest entry of the table
+        """
+        partitions = self.FACT_PARTITIONS[table_name]
+        partition_columns = list(partitions)
+        table_columns = [row[0] for row in self.connection.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ?", [table_name]).fetchall()]
+        # Partition columns that are not table columns are derived (e.g. year and month of the date)
+        derived = ", ".join(f"{expr} AS {col}" for col, expr in partitions.items() if col not in table_columns)
+        select_list = f"f.*, {derived}" if derived else "f.*"
+        keys = ", ".join(f"{expr} AS {col}" for col, expr in partitions.items())
+
+        current = {}
+        for row in self.connection.execute(f"""
+            SELECT {keys}, count(*), {self._checksum_sql(table_name)}
+            FROM {table_name} GROUP BY ALL
+        """).fetchall():
+            values = row[:len(partition_columns)]
+            key = self.partition_key(partition_columns, values)
+            current[key] = {"values": list(values), "rows": row[-2], "checksum": row[-1]}
+
+        table_dir = os.path.join(self.export_dir, table_name)
+        if previous and previous.get("partition_by") != partition_columns:
+            previous = None
+        if previous is None:
+            # No usable entry (first export, other settings or partitioning): start from an empty directory
+            shutil.rmtree(table_dir, ignore_errors=True)
+
+        old_partitions = (previous or {}).get("partitions", {})
+        changed = [key for key, part in current.items()
+                   if key not in old_partitions or not old_partitions[key].get("files")
+                   or (old_partitions[key]["rows"], old_partitions[key]["checksum"]) != (part["rows"], part["checksum"])]
+        removed = [key for key in old_partitions if key not in current]
+
+        for key in changed + removed:
+            shutil.rmtree(os.path.join(table_dir, key), ignore_errors=True)
+
+        files_by_partition: Dict[str, List[str]] = {}
+        if changed:
+            # Stage the changed partition keys and write only their rows
+            self.connection.execute(f"""
+                CREATE OR REPLACE TEMP TABLE export_partitions ({', '.join(f'{col} VARCHAR' for col in partition_columns)})
+            """)
+            self.connection.executemany(
+                f"INSERT INTO export_partitions VALUES ({', '.join('?' for _ in partition_columns)})",
+                [[None if v is None else str(v) for v in current[key]["values"]] for key in changed])
+            match = " AND ".join(f"CAST(f.{col} AS VARCHAR) IS NOT DISTINCT FROM p.{col}" for col in partition_columns)
+            os.makedirs(table_dir, exist_ok=True)
+            files = self.connection.execute(f"""
+                COPY (
+                    SELECT * FROM (SELECT {select_list} FROM {table_name} f) f
+                    WHERE EXISTS (SELECT 1 FROM export_partitions p WHERE {match})
+                ) TO '{table_dir}'
+                ({self._copy_options()}, PARTITION_BY ({', '.join(partition_columns)}), OVERWRITE_OR_IGNORE, RETURN_FILES)
+            """).fetchone()[1]
+            self.connection.execute("DROP TABLE export_partitions")
+            self.bytes_written[table_name] = sum(os.path.getsize(file_path) for file_path in files)
+            for file_path in files:
+                key = os.path.relpath(os.path.dirname(file_path), table_dir).replace(os.sep, "/")
+                files_by_partition.setdefault(key, []).append(os.path.relpath(file_path, self.export_dir))
+
+        entry_partitions = {}
+        for key, part in current.items():
+            if key in changed:
+                part_files = files_by_partition.get(key, [])
+            else:
+                part_files = old_partitions[key].get("files", [])
+            entry_partitions[key] = {"rows": part["rows"], "checksum": part["checksum"], "files": part_files}
+        self._remove_orphans(table_dir, {path for part in entry_partitions.values() for path in part["files"]})
+
+        logger.info(f"Exported {table_name}: {len(changed)} partitions written, {len(removed)} removed, "
+                    f"{len(current) - len(changed)} unchanged")
+        return {
+            "path": table_name,
+            "partition_by": partition_columns,
+            "rows": sum(part["rows"] for part in current.values()),
+            "partitions": entry_partitions,
+        }
+
+    def _remove_orphans(self, table_dir: str, keep: set):
+        """Delete files under a table directory that are not in keep (paths relative to the export dir)"""
+        removed = 0
+        for root, _, files in os.walk(table_dir, topdown=False):
+            for name in files:
+                path = os.path.join(root, name)
+                if os.path.relpath(path, self.export_dir) not in keep:
+                    os.remove(path)
+                    removed += 1
+            if root != table_dir and not os.listdir(root):
+                os.rmdir(root)
+        if removed:
+            logger.info(f"Removed {removed} orphaned files from {table_dir}")
+
+    def export_all(self, tables: Optional[List[str]] = None) -> Optional[dict]:
+        """
+        Export every existing warehouse table and write the manifest
+
+        Args:
+            tables: Tables to export (default every table in DataLoader.TABLE_SCHEMAS)
+
+        Returns:
+            The new manifest, or None if the export failed
+        """
+        tables = tables or list(self.loader.TABLE_SCHEMAS)
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+            previous = self.load_manifest()
+            # Other settings produce different files, so everything is rewritten
+            same_settings = (previous.get("compression") == self.compression
+                             and previous.get("row_group_size") == self.row_group_size)
+            old_tables = previous.get("tables", {}) if same_settings else {}
+            self.bytes_written = {}
+
+            manifest = {
+                "exported_at": datetime.now().isoformat(timespec="seconds"),
+                "database": str(self.loader.db_path),
+                "compression": self.compression,
+                "row_group_size": self.row_group_size,
+                "tables": {},
+            }
+            for table_name in tables:
+                if not self.loader.table_exists(table_name):
+                    continue
+                if table_name in self.FACT_PARTITIONS:
+                    entry = self.export_partitioned(table_name, old_tables.get(table_name))
+                else:
+                    entry = self.export_table(table_name, old_tables.get(table_name))
+                manifest["tables"][table_name] = entry
+
+            self._save_manifest(manifest)
+            logger.info(f"Parquet export complete: {len(manifest['tables'])} tables in {self.export_dir}")
+            return manifest
+
+        except Exception as e:
+            logger.error(f"Error exporting Parquet: {str(e)}")
+            return None
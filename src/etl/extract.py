@@ -1,7 +1,10 @@
 import polars as pl
 import os
-from typing import Dict , Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict , Iterator, Optional
 from src.config import config
+from src.etl.cache import ParseCache
 import logging
 
 # Setup logging
@@ -49,37 +52,204 @@ class DataExtractor:
     Class for extracting data from CSV files
     """
     
-    def __init__(self):
+    NULL_VALUES = ["", "NULL", "null", "N/A", "n/a","\\N"]
+
+    # dtype ที่ใช้อ่านแต่ละ type ใน config.CSV_SCHEMAS (DATE/TIMESTAMP อ่านเป็น text แล้วแปลงด้วย format ที่กำหนด)
+    POLARS_TYPES = {
+        "VARCHAR": pl.String,
+        "BIGINT": pl.Int64,
+        "INTEGER": pl.Int32,
+        "DOUBLE": pl.Float64,
+        "BOOLEAN": pl.Boolean,
+        "ENUM": pl.Categorical,
+        "DATE": pl.String,
+        "TIMESTAMP": pl.String,
+    }
+
+    def __init__(self, use_cache: Optional[bool] = None):
         self.config = config()
+        self.timings = {}
+        if use_cache is None:
+            use_cache = self.config.PARSE_CACHE_ENABLED
+        # cache ไฟล์ที่ parse แล้วเป็น Arrow IPC เพื่อไม่ต้อง parse CSV ซ้ำทุกครั้ง
+        self.cache = ParseCache() if use_cache else None
+        # dictionary ของ ENUM type ใน warehouse ตามชื่อคอลัมน์ (DataLoader.enum_dictionaries)
+        # คอลัมน์ที่อยู่ในนี้จะถูกอ่านเป็น pl.Enum ที่เรียงค่าเหมือนใน DuckDB
+        self.enum_values: Dict[str, list[str]] = {}
     
-    def extract_csv(self,file_path: str, table_name: str) -> pl.DataFrame:
+    def extract_csv(self,file_path: str, table_name: str, lazy: bool = False) -> pl.DataFrame | pl.LazyFrame:
         """
         อ่านไฟล์ CSV ไฟล์เดียว และรีเทิร์นค่าเป็น Polars DataFrame
+        อ่านเฉพาะคอลัมน์และ dtype ที่ประกาศไว้ใน config.CSV_SCHEMAS (ไม่ต้องเดา type)
         Args:
             file_path (str): ที่อยู่ของไฟล์ CSV
             table_name (str): ชื่อของตารางที่ใช้ในการตั้งชื่อคอลัมน์
+            lazy (bool): ถ้าเป็น True จะใช้ pl.scan_csv และรีเทิร์น LazyFrame (ยังไม่อ่านไฟล์จริง)
         Returns:
-            pl.DataFrame: DataFrame ที่อ่านจากไฟล์ CSV
+            pl.DataFrame | pl.LazyFrame: DataFrame ที่อ่านจากไฟล์ CSV หรือ LazyFrame ในโหมด lazy
         """
         try:
             logger.info("Starting ETL process...")
+            cache_key = None
+            if self.cache is not None:
+                try:
+                    cache_key = self.cache.cache_key(file_path, self._read_options(table_name))
+                    cached = self.cache.load(table_name, cache_key, lazy=lazy)
+                    if cached is not None:
+                        return cached if lazy else self._to_enums(cached, table_name)
+                except Exception as e:
+                    logger.warning(f"Parse cache unavailable for {table_name}: {e}")
+                    cache_key = None
+
+            columns, schema_overrides = self._read_schema(file_path, table_name)
+            if lazy:
+                # scan_csv สร้างแค่ query plan ให้ Polars push projection/filter ลงไปถึงตอนอ่านไฟล์
+                lf = pl.scan_csv(file_path,encoding="utf8",
+                        **self._csv_options(schema_overrides))
+                if columns is not None:
+                    lf = lf.select(columns)
+                lf = self._parse_dates(lf, table_name)
+                logging.info(f"Successfully scanned {table_name} (lazy)")
+                # ไม่เขียน cache ในโหมด lazy: sink_ipc จะอ่านทั้งไฟล์และทำให้ pushdown ไม่มีผล
+                return lf
             df = pl.read_csv(file_path,encoding="utf-8",
-                    try_parse_dates=True,
-                    null_values=["", "NULL", "null", "N/A", "n/a","\\N"])
-                # try_parse_dates=True ช่วยให้ Polars พยายามแปลงคอลัมน์ที่เป็นวันที่ให้เป็นชนิดข้อมูล DateTime
+                    columns=columns,
+                    **self._csv_options(schema_overrides))
+                # ตารางที่ไม่มีใน CSV_SCHEMAS ใช้ try_parse_dates=True ให้ Polars พยายามแปลงคอลัมน์วันที่เป็น DateTime
+            df = self._parse_dates(df, table_name)
             logging.info(f"Successfully extracted {len(df)} rows from {table_name}")
-            return df
+            return self._to_enums(self._store_cache(table_name, cache_key, df), table_name)
         except Exception as e:
             logging.error(f"Error reading {file_path}: {e}")
             return None
 
-    def extract_data(self) -> dict:
+    def extract_csv_batches(self, table_name: str, batch_size: Optional[int] = None) -> Iterator[pl.DataFrame]:
+        """
+        อ่านไฟล์ CSV ทีละ batch เพื่อใช้หน่วยความจำจำกัด (ใช้กับไฟล์ที่ใหญ่กว่า RAM เช่น transactions)
+        Args:
+            table_name (str): ชื่อตารางใน config.CSV_FILES
+            batch_size (int): จำนวนแถวต่อ batch (ค่าเริ่มต้น config.BATCH_SIZE)
+        Returns:
+            Iterator[pl.DataFrame]: DataFrame ทีละ batch
+        """
+        batch_size = batch_size or self.config.BATCH_SIZE
+        file_path = self.config.get_csv_path(table_name)
+        logger.info(f"Reading {table_name} in batches of {batch_size} rows from {file_path}")
+        columns, schema_overrides = self._read_schema(file_path, table_name)
+
+        total_rows = 0
+        if hasattr(pl, "read_csv_batched"):
+            reader = pl.read_csv_batched(file_path, encoding="utf8",
+                    columns=columns,
+                    batch_size=batch_size,
+                    **self._csv_options(schema_overrides))
+            while True:
+                batches = reader.next_batches(1)
+                if not batches:
+                    break
+                total_rows += len(batches[0])
+                yield self._parse_dates(batches[0], table_name)
+        else:
+            # Polars รุ่นใหม่ไม่มี read_csv_batched แล้ว ใช้ streaming engine ของ scan_csv แทน
+            lf = pl.scan_csv(file_path, encoding="utf8",
+                    **self._csv_options(schema_overrides))
+            if columns is not None:
+                lf = lf.select(columns)
+            for batch in self._parse_dates(lf, table_name).collect_batches(chunk_size=batch_size):
+                total_rows += len(batch)
+                yield batch
+
+        logger.info(f"Successfully extracted {total_rows} rows from {table_name} in batches")
+
+    def _read_schema(self, file_path: str, table_name: str) -> tuple[Optional[list[str]], Dict[str, pl.DataType]]:
+        """
+        คอลัมน์ที่ต้องอ่าน (ตามลำดับใน header) และ dtype ของแต่ละคอลัมน์จาก config.CSV_SCHEMAS
+        Returns:
+            (columns, schema_overrides) หรือ (None, {}) ถ้าตารางไม่มีใน registry (ใช้ type inference)
+        """
+        registry = self.config.CSV_SCHEMAS.get(table_name)
+        if not registry:
+            return None, {}
+        header = pl.read_csv(file_path, n_rows=0).columns
+        columns = [col for col in header if col in registry]
+        return columns, {col: self.POLARS_TYPES[registry[col]] for col in columns}
+
+    def _csv_options(self, schema_overrides: Dict[str, pl.DataType]) -> dict:
+        """ตัวเลือกของ read_csv/scan_csv: ใช้ dtype จาก registry ถ้ามี ไม่งั้นให้ Polars เดา type"""
+        if schema_overrides:
+            return {"null_values": self.NULL_VALUES, "schema_overrides": schema_overrides, "infer_schema": False}
+        return {"null_values": self.NULL_VALUES, "try_parse_dates": True}
+
+    def _parse_dates(self, frame: pl.DataFrame | pl.LazyFrame, table_name: str) -> pl.DataFrame | pl.LazyFrame:
+        """แปลงคอลัมน์ DATE/TIMESTAMP ใน registry ด้วย config.DATE_FORMAT/DATETIME_FORMAT (format ตายตัว ไม่ต้องเดา)"""
+        registry = self.config.CSV_SCHEMAS.get(table_name) or {}
+        names = frame.collect_schema().names()
+        dates = []
+        for col, col_type in registry.items():
+            if col not in names:
+                continue
+            if col_type == "DATE":
+                dates.append(pl.col(col).str.to_date(self.config.DATE_FORMAT))
+            elif col_type == "TIMESTAMP":
+                dates.append(pl.col(col).str.to_datetime(self.config.DATETIME_FORMAT))
+        return frame.with_columns(dates) if dates else frame
+
+    def _to_enums(self, df: pl.DataFrame, table_name: str) -> pl.DataFrame:
+        """
+        แปลงคอลัมน์ ENUM ที่มี dictionary ใน self.enum_values เป็น pl.Enum
+        ลำดับค่าคือ dictionary ใน warehouse ตามด้วยค่าใหม่ที่เรียงแล้ว (ลำดับเดียวกับที่ DataLoader.extend_enum ต่อท้าย)
+        คอลัมน์อื่น (เช่น currency ที่ใช้ join ระหว่างตาราง) ยังเป็น pl.Categorical
+        """
+        registry = self.config.CSV_SCHEMAS.get(table_name) or {}
+        casts = []
+        for col, col_type in registry.items():
+            # ชื่อคอลัมน์ใน warehouse เหมือน DataTransformer.standardize_column_names
+            column = col.lower().replace(' ', '_').replace('-', '_')
+            if col_type != "ENUM" or col not in df.columns or column not in self.enum_values:
+                continue
+            known = self.enum_values[column]
+            values = df.get_column(col).cast(pl.String).drop_nulls().unique().to_list()
+            categories = known + sorted(set(values) - set(known))
+            casts.append(pl.col(col).cast(pl.String).cast(pl.Enum(categories)))
+        return df.with_columns(casts) if casts else df
+
+    def _read_options(self, table_name: str) -> dict:
+        """ตัวเลือกการอ่าน CSV ที่มีผลต่อผลลัพธ์ (ใช้เป็นส่วนหนึ่งของ cache key)"""
+        return {"null_values": self.NULL_VALUES, "polars": pl.__version__,
+                "schema": self.config.CSV_SCHEMAS.get(table_name),
+                "date_format": self.config.DATE_FORMAT, "datetime_format": self.config.DATETIME_FORMAT}
+
+    def _store_cache(self, table_name: str, cache_key: Optional[str], frame: pl.DataFrame) -> pl.DataFrame:
+        """เขียนสำเนา Arrow IPC ลง parse cache ถ้าเขียนไม่ได้ก็ใช้ frame เดิมต่อ"""
+        if cache_key is None:
+            return frame
+        try:
+            return self.cache.store(table_name, cache_key, frame)
+        except Exception as e:
+            logger.warning(f"Could not write parse cache for {table_name}: {e}")
+            return frame
+
+    def _timed_extract(self, path: str, name: str, lazy: bool) -> pl.DataFrame | pl.LazyFrame:
+        """
+        อ่านไฟล์ CSV หนึ่งไฟล์และเก็บเวลาที่ใช้ไว้ใน self.timings
+        """
+        logger.info(f"Reading the data from {name} at {path}")
+        start = time.perf_counter()
+        pl_df = self.extract_csv(path, name, lazy=lazy)
+        self.timings[name] = time.perf_counter() - start
+        return pl_df
+
+    def extract_data(self, lazy: bool = False, max_workers: Optional[int] = None,
+                     tables: Optional[list[str]] = None) -> dict:
         """
         อ่านข้อมูลจากไฟล์ CSV ทั้งหมดจากโฟลเดอร์ที่ระบุ
         Args:
-            - None:
+            lazy (bool): ถ้าเป็น True จะรีเทิร์น LazyFrame จาก pl.scan_csv แทน DataFrame
+            max_workers (int): จำนวน thread ที่ใช้อ่านไฟล์พร้อมกัน (ค่าเริ่มต้น config.EXTRACT_WORKERS, 1 = อ่านทีละไฟล์)
+            tables (list[str]): อ่านเฉพาะตารางเหล่านี้ (ค่าเริ่มต้นอ่านทุกตารางใน config.CSV_FILES)
         Returns:
-            dict: Dictionary ที่มีชื่อตารางเป็น key และ Polars DataFrame เป็น value
+            dict: Dictionary ที่มีชื่อตารางเป็น key และ Polars DataFrame (หรือ LazyFrame) เป็น value
+                  เวลาที่ใช้อ่านแต่ละตารางเก็บไว้ใน self.timings
             
         """
         logger.info("📁 Reading the data from file CSVs...")
@@ -94,6 +264,8 @@ class DataExtractor:
             # ตรวจสอบว่าไฟล์ CSVs มีอยู่ในโฟลเดอร์ 
             paths = {}   
             for table_name, file_name in csv_files.items():
+                if tables is not None and table_name not in tables:
+                    continue
                 # file_path = os.path.join(datasource_dir, file_name)
                 file_path = config.get_csv_path(table_name)
                 
@@ -102,14 +274,32 @@ class DataExtractor:
                 else:
                     logger.warning(f"Error: cannot find '{file_name}' in the folder '{datasource_dir}'")
                     return None
+            if max_workers is None:
+                max_workers = config.EXTRACT_WORKERS
+            self.timings = {}
             dict_df = {}
-            for name, path in paths.items():
-                logger.info(f"Reading the data from {name} at {path}")
-                pl_df = self.extract_csv(path,name)
-                
-                dict_df[name] =  pl_df
-                
-                    
+            if max_workers > 1 and len(paths) > 1:
+                # อ่านหลายไฟล์พร้อมกัน ไฟล์ dimension เล็กๆ ไม่ต้องรอไฟล์ transactions ที่ใหญ่
+                logger.info(f"Reading {len(paths)} CSV files with {max_workers} workers")
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {executor.submit(self._timed_extract, path, name, lazy): name
+                               for name, path in paths.items()}
+                    for future in as_completed(futures):
+                        dict_df[futures[future]] = future.result()
+                # คืนค่าตามลำดับของ config.CSV_FILES เหมือนโหมดปกติ
+                dict_df = {name: dict_df[name] for name in paths}
+            else:
+                for name, path in paths.items():
+                    dict_df[name] = self._timed_extract(path, name, lazy)
+
+            for name, seconds in self.timings.items():
+                logger.info(f"⏱️ {name}: {seconds:.3f}s")
+
+            failed = [name for name, pl_df in dict_df.items() if pl_df is None]
+            if failed:
+                logger.error(f"❌ Failed to read: {', '.join(failed)}")
+                return None
+
             # dict_df = {name: extract_csv(path,name) for name, path in paths.items()}
             logger.info("✅ Completed reading all CSV files.")
             return  dict_df
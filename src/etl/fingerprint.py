@@ -0,0 +1,145 @@
+"""
+Source fingerprints of the warehouse tables
+
+Every warehouse table is fingerprinted from the content of its source files (TABLE_SOURCES),
+the code of its transform (DataTransformer.code_version), how its sources are read (CSV_SCHEMAS,
+date formats) and its warehouse schema and load mode. The fingerprints of the last successful run
+are kept in the etl_source_fingerprints table of the warehouse, so they follow the data through
+snapshots and rollbacks. A run then extracts, transforms and loads only the tables whose
+fingerprint differs; the other tables are left as they are.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from src.config import config
+from src.etl.cache import ParseCache
+from src.etl.transform import DataTransformer
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class SourceManifest:
+    """
+    Class for deciding which warehouse tables have to be rebuilt and recording what was loaded
+    """
+
+    TABLE = "etl_source_fingerprints"
+
+    def __init__(self, loader):
+        """
+        Args:
+            loader: DataLoader whose warehouse holds the recorded fingerprints
+        """
+        self.config = config()
+        self.loader = loader
+        self.cache = ParseCache()
+        # table name -> fingerprint dictionary of this run (computed once)
+        self._fingerprints: Dict[str, dict] = {}
+
+    def create_table(self):
+        self.loader.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                table_name VARCHAR PRIMARY KEY,
+                fingerprint VARCHAR,
+                sources VARCHAR,
+                code_version VARCHAR,
+                run_id VARCHAR,
+                loaded_at TIMESTAMP
+            )
+        """)
+
+    def _source_hashes(self, sources: List[str]) -> Dict[str, Optional[str]]:
+        hashes = {}
+        for source in sources:
+            path = self.config.get_csv_path(source)
+            hashes[source] = self.cache.fingerprint(path)["sha256"] if os.path.exists(path) else None
+        return hashes
+
+    def fingerprint(self, table_name: str) -> dict:
+        """
+        Fingerprint of a table for this run
+
+        Returns:
+            dict with the per-source content hashes, the transform code version and the combined hash
+        """
+        if table_name in self._fingerprints:
+            return self._fingerprints[table_name]
+        sources = DataTransformer.TABLE_SOURCES[table_name]
+        entry = {
+            "sources": self._source_hashes(sources),
+            "code_version": DataTransformer.code_version(table_name),
+        }
+        payload = json.dumps({
+            **entry,
+            "read_schemas": {source: self.config.CSV_SCHEMAS.get(source) for source in sources},
+            "formats": [self.config.DATE_FORMAT, self.config.DATETIME_FORMAT],
+            "table_schema": self.loader.table_schema(table_name),
+            "load_mode": self.config.FACT_LOAD_MODE if table_name.startswith("fact_") else self.config.DIM_LOAD_MODE,
+        }, sort_keys=True, default=str)
+        entry["fingerprint"] = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        self._fingerprints[table_name] = entry
+        return entry
+
+    def recorded(self) -> Dict[str, str]:
+        """Fingerprint of every table as of the last successful run (empty for a new warehouse)"""
+        if not self.loader.table_exists(self.TABLE):
+            return {}
+        return dict(self.loader.connection.execute(f"SELECT table_name, fingerprint FROM {self.TABLE}").fetchall())
+
+    def changed_tables(self, tables: Optional[List[str]] = None) -> List[str]:
+        """
+        Tables whose sources, transform code or load settings changed since the last successful
+        run, or that are missing from the warehouse
+
+        Args:
+            tables: Tables to check (default every table in DataTransformer.TABLE_SOURCES)
+
+        Returns:
+            Names of the tables to rebuild, in TABLE_SOURCES order
+        """
+        if not self.loader.connection:
+            self.loader.connect()
+        recorded = self.recorded()
+        changed = []
+        for table_name in tables or DataTransformer.TABLE_SOURCES:
+            if recorded.get(table_name) != self.fingerprint(table_name)["fingerprint"]:
+                changed.append(table_name)
+            elif not self.loader.table_exists(table_name):
+                logger.info(f"{table_name} is missing from the warehouse, it will be rebuilt")
+                changed.append(table_name)
+        return changed
+
+    def record(self, tables: List[str], run_id: Optional[str] = None) -> bool:
+        """
+        Record the fingerprints of the tables a successful run loaded
+
+        A failure is logged: the tables are then rebuilt by the next run, which is safe because
+        every load mode is idempotent for unchanged input.
+
+        Returns:
+            True if the fingerprints were written
+        """
+        if not tables:
+            return True
+        try:
+            if not self.loader.connection:
+                self.loader.connect()
+            self.create_table()
+            for table_name in tables:
+                entry = self.fingerprint(table_name)
+                self.loader.connection.execute(f"""
+                    INSERT OR REPLACE INTO {self.TABLE} VALUES (?, ?, ?, ?, ?, current_timestamp)
+                """, [table_name, entry["fingerprint"], json.dumps(entry["sources"]), entry["code_version"], run_id])
+        except Exception as e:
+            logger.warning(f"Could not record source fingerprints, the tables are rebuilt next run: {str(e)}")
+            return False
+        logger.info(f"Recorded source fingerprints of {', '.join(tables)}")
+        return True
@@ -0,0 +1,249 @@
+"""
+Physical layout of the warehouse tables
+
+Keeps fact tables clustered by their access keys so DuckDB's per-row-group min/max
+statistics (zonemaps) can skip row groups, keeps the dimension primary-key (ART) indexes
+in place, and reports how well the current layout prunes.
+
+The number of leading rows known to be in order is kept in etl_layout, so only the rows
+appended since the last layout are checked. When they all sort after the rows before them
+nothing is rewritten; otherwise only the rows from their smallest key onward are re-sorted.
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional
+
+from src.config import config
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class LayoutOptimizer:
+    """
+    Class for clustering fact tables, rebuilding dimension key indexes and reporting zonemap pruning
+    """
+
+    # Integer columns whose row-group statistics are reported for each fact table
+    PRUNING_COLUMNS = {
+        "fact_transactions": ["date_key", "store_id"],
+    }
+
+    STATS_PATTERN = re.compile(r"\[Min: (-?\d+), Max: (-?\d+)\]")
+
+    def __init__(self, loader):
+        """
+        Args:
+            loader: DataLoader whose warehouse connection is used
+        """
+        self.config = config()
+        self.loader = loader
+        if not loader.connection:
+            loader.connect()
+        self.connection = loader.connection
+
+    def cluster_keys(self, table_name: str) -> List[str]:
+        return self.loader.FACT_TABLES[table_name].get("cluster_by", [])
+
+    def clustered_rows(self, table_name: str) -> int:
+        """Leading rows of a fact table recorded in order by the last layout or replace load"""
+        if not self.loader.table_exists("etl_layout"):
+            return 0
+        row = self.connection.execute(
+            "SELECT clustered_rows FROM etl_layout WHERE table_name = ?", [table_name]).fetchone()
+        return row[0] if row else 0
+
+    def is_clustered(self, table_name: str, from_row: int = 0) -> bool:
+        """
+        Check that the rows from from_row on are stored in cluster-key order after row from_row - 1
+        (the rows before it are known to be in order)
+        """
+        keys = self.cluster_keys(table_name)
+        if not keys:
+            return True
+        key_list = ", ".join(map(self.loader.quote, keys))
+        out_of_order = self.connection.execute(f"""
+            SELECT count(*) FROM (
+                SELECT ({key_list}) < lag(({key_list})) OVER (ORDER BY rowid) AS unordered
+                FROM {table_name}
+                WHERE rowid >= ?
+            ) WHERE unordered
+        """, [max(from_row - 1, 0)]).fetchone()[0]
+        return out_of_order == 0
+
+    def cluster_table(self, table_name: str, from_row: int = 0) -> int:
+        """
+        Put the rows from from_row on into cluster-key order
+
+        With from_row = 0 the whole table is rewritten into its declared schema. Otherwise only
+        those rows and the ordered rows sorting after the smallest of them are deleted and
+        inserted again in order (e.g. the last day when an incremental load re-sends it).
+
+        Returns:
+            Number of rows written
+        """
+        keys = list(map(self.loader.quote, self.cluster_keys(table_name)))
+        key_list = ", ".join(keys)
+        layout = f"layout_{table_name}"
+        if from_row == 0:
+            self.connection.execute(f"CREATE OR REPLACE TEMP TABLE {layout} AS SELECT * FROM {table_name}")
+            self.loader.create_table(table_name, replace=True)
+            rows = self.connection.execute(
+                f"INSERT INTO {table_name} SELECT * FROM {layout} ORDER BY {key_list}").fetchone()[0]
+            self.connection.execute(f"DROP TABLE {layout}")
+            logger.info(f"Clustered {rows} rows of {table_name} by ({key_list})")
+            return rows
+
+        smallest = self.connection.execute(
+            f"SELECT {key_list} FROM {table_name} WHERE rowid >= ? ORDER BY {key_list} LIMIT 1", [from_row]).fetchone()
+        # the ordered rows after `smallest` are the tail of the ordered part (the first key prunes by zonemap)
+        self.connection.execute(f"""
+            CREATE OR REPLACE TEMP TABLE {layout} AS
+            SELECT rowid AS layout_rowid, * FROM {table_name}
+            WHERE rowid >= ? OR ({keys[0]} >= ? AND ({key_list}) > ({", ".join("?" for _ in keys)}))
+        """, [from_row, smallest[0], *smallest])
+        self.connection.execute(f"DELETE FROM {table_name} WHERE rowid IN (SELECT layout_rowid FROM {layout})")
+        rows = self.connection.execute(
+            f"INSERT INTO {table_name} SELECT * EXCLUDE (layout_rowid) FROM {layout} ORDER BY {key_list}").fetchone()[0]
+        self.connection.execute(f"DROP TABLE {layout}")
+        logger.info(f"Re-sorted the last {rows} rows of {table_name} by ({key_list})")
+        return rows
+
+    def has_primary_key(self, table_name: str) -> bool:
+        return self.connection.execute(
+            "SELECT count(*) FROM duckdb_constraints() WHERE table_name = ? AND constraint_type = 'PRIMARY KEY'",
+            [table_name]).fetchone()[0] > 0
+
+    def rebuild_dimension_indexes(self) -> List[str]:
+        """
+        Rebuild dimension tables whose declared primary key (ART index) is missing
+
+        Tables created by earlier versions of the pipeline with CTAS have no constraints; they are
+        rewritten into the declared schema in key order, which recreates the index.
+
+        Returns:
+            Names of the rebuilt tables
+        """
+        rebuilt = []
+        for table_name in self.loader.TABLE_SCHEMAS:
+            if not table_name.startswith("dim_") or not self.loader.table_exists(table_name):
+                continue
+            primary_key = self.loader.table_schema(table_name).get("primary_key")
+            if not primary_key or self.has_primary_key(table_name):
+                continue
+            key_list = ", ".join(map(self.loader.quote, primary_key))
+            # declared columns the old table has (e.g. row_hash was added after the first release)
+            columns = ", ".join(self.loader.quote(col) for col in self.loader.table_schema(table_name)["columns"]
+                                if self.loader.column_type(table_name, col) is not None)
+            self.connection.execute(f"CREATE OR REPLACE TEMP TABLE layout_{table_name} AS SELECT * FROM {table_name}")
+            self.loader.create_table(table_name, replace=True)
+            self.connection.execute(f"""
+                INSERT INTO {table_name} ({columns})
+                SELECT {columns} FROM layout_{table_name} ORDER BY {key_list}
+            """)
+            self.connection.execute(f"DROP TABLE layout_{table_name}")
+            logger.info(f"Rebuilt {table_name} with its primary key index on ({key_list})")
+            rebuilt.append(table_name)
+        return rebuilt
+
+    def row_group_ranges(self, table_name: str, column: str) -> Dict[int, tuple]:
+        """Min/max of an integer column per row group, from pragma_storage_info (persisted data only)"""
+        ranges = {}
+        for row_group, stats in self.connection.execute(
+                "SELECT row_group_id, stats FROM pragma_storage_info(?) WHERE column_name = ? AND segment_type <> 'VALIDITY'",
+                [table_name, column]).fetchall():
+            match = self.STATS_PATTERN.search(stats or "")
+            if not match:
+                continue
+            low, high = int(match.group(1)), int(match.group(2))
+            if row_group in ranges:
+                low, high = min(low, ranges[row_group][0]), max(high, ranges[row_group][1])
+            ranges[row_group] = (low, high)
+        return ranges
+
+    def pruning_report(self, table_name: str) -> dict:
+        """
+        Estimate zonemap pruning for single-value filters on each reported column
+
+        For every distinct value, count the row groups whose [min, max] contains it; the average
+        fraction is what an equality filter (e.g. one day, one store) has to scan.
+
+        Returns:
+            {"row_groups": n, "<column>": {"avg_row_groups_scanned": x, "avg_fraction_scanned": y}, ...}
+        """
+        report = {"row_groups": 0}
+        for column in self.PRUNING_COLUMNS.get(table_name, []):
+            ranges = self.row_group_ranges(table_name, column)
+            values = [row[0] for row in self.connection.execute(
+                f"SELECT DISTINCT {self.loader.quote(column)} FROM {table_name} WHERE {self.loader.quote(column)} IS NOT NULL"
+            ).fetchall()]
+            if not ranges or not values:
+                continue
+            scanned = [sum(1 for low, high in ranges.values() if low <= value <= high) for value in values]
+            average = sum(scanned) / len(scanned)
+            report["row_groups"] = len(ranges)
+            report[column] = {
+                "avg_row_groups_scanned": round(average, 2),
+                "avg_fraction_scanned": round(average / len(ranges), 4),
+            }
+        return report
+
+    def optimize(self, tables: Optional[List[str]] = None) -> Optional[dict]:
+        """
+        Cluster the rows of fact tables that are out of order, restore missing dimension key
+        indexes and report zonemap pruning before and after for the re-sorted tables
+
+        Returns:
+            {"clustered": [...], "rebuilt_indexes": [...], "pruning": {table: {"before": .., "after": ..}}}
+            or None if the layout step failed
+        """
+        fact_tables = [t for t in (tables or self.loader.FACT_TABLES)
+                       if t in self.loader.FACT_TABLES and self.loader.table_exists(t)]
+        result = {"clustered": [], "rebuilt_indexes": [], "pruning": {}}
+        try:
+            # เช็คเฉพาะแถวที่ต่อท้ายมาหลัง layout ครั้งก่อน
+            out_of_order = {}
+            total_rows = {}
+            for table_name in fact_tables:
+                total_rows[table_name] = self.connection.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+                from_row = self.clustered_rows(table_name)
+                if from_row > total_rows[table_name]:
+                    from_row = 0
+                if from_row < total_rows[table_name] and not self.is_clustered(table_name, from_row):
+                    out_of_order[table_name] = from_row
+
+            # Statistics are read from persisted row groups (only reported for tables that are re-sorted)
+            before = {}
+            if out_of_order:
+                self.connection.execute("CHECKPOINT")
+                before = {t: self.pruning_report(t) for t in out_of_order}
+
+            self.connection.begin()
+            try:
+                for table_name, from_row in out_of_order.items():
+                    self.cluster_table(table_name, from_row)
+                    result["clustered"].append(table_name)
+                result["rebuilt_indexes"] = self.rebuild_dimension_indexes()
+                self.connection.commit()
+            except Exception:
+                self.loader.rollback()
+                raise
+
+            # rowid ถูกจัดใหม่ตอน checkpoint หลังการ delete จึงบันทึกจำนวนแถวหลัง checkpoint
+            self.connection.execute("CHECKPOINT")
+            for table_name in fact_tables:
+                self.loader.set_clustered_rows(table_name, total_rows[table_name])
+            for table_name in result["clustered"]:
+                after = self.pruning_report(table_name)
+                result["pruning"][table_name] = {"before": before[table_name], "after": after}
+                logger.info(f"{table_name} zonemap pruning before clustering: {before[table_name]}")
+                logger.info(f"{table_name} zonemap pruning: {after}")
+            return result
+
+        except Exception as e:
+            logger.error(f"Error optimizing table layout: {str(e)}")
+            return None
@@ -1,9 +1,13 @@
 import duckdb as dd
 import polars as pl
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 import logging
+import os
+import time
+from datetime import date
 from pathlib import Path
 from src.config import config
+from src.etl.resources import ResourceGovernor
 
 
 
@@ -17,11 +21,168 @@ logger = logging.getLogger(__name__)
 
 class DataLoader:
    """Class for loading data into DuckDB data warehouse"""
+
+   # Fact tables that support incremental loading: watermark column and natural key
+   FACT_TABLES = {
+       "fact_transactions": {
+           "watermark_column": "date",
+           "key_columns": ["invoice_id", "line_item"],
+           # Physical row order (zonemaps prune date-range and per-store filters), see LayoutOptimizer
+           "cluster_by": ["date", "store_id"],
+       },
+   }
+
+   # Dimensions tracked by row-hash change data capture: business key of each table
+   DIMENSION_KEYS = {
+       "dim_customers": "customer_id",
+       "dim_employees": "employee_id",
+       "dim_products": "product_id",
+       "dim_stores": "store_id",
+   }
+
+   # Declared warehouse schemas (column -> DuckDB type, in the column order of DataTransformer)
+   TABLE_SCHEMAS = {
+       "dim_date": {
+           "columns": {
+               "date_key": "INTEGER",
+               "date": "DATE",
+               "year": "INTEGER",
+               "quarter": "INTEGER",
+               "month": "INTEGER",
+               "month_name": "VARCHAR",
+               "day": "INTEGER",
+               "day_of_week": "INTEGER",
+               "day_name": "VARCHAR",
+               "week_of_year": "INTEGER",
+               "is_weekend": "BOOLEAN",
+               "fiscal_quarter": "INTEGER",
+           },
+           "primary_key": ["date_key"],
+       },
+       "dim_customers": {
+           "columns": {
+               "customer_id": "BIGINT",
+               "customer_name": "VARCHAR",
+               "email": "VARCHAR",
+               "telephone": "VARCHAR",
+               "city": "ENUM",
+               "country": "ENUM",
+               "gender": "ENUM",
+               "date_of_birth": "DATE",
+               "job_title": "VARCHAR",
+               "row_hash": "UBIGINT",
+               "created_at": "TIMESTAMP",
+               "updated_at": "TIMESTAMP",
+           },
+           "primary_key": ["customer_id"],
+       },
+       # A category has one row per discount period, so there is no primary key
+       "dim_discounts": {
+           "columns": {
+               "start": "DATE",
+               "end": "DATE",
+               "discount": "DOUBLE",
+               "description": "VARCHAR",
+               "category": "ENUM",
+               "sub_category": "ENUM",
+               "created_at": "TIMESTAMP",
+               "updated_at": "TIMESTAMP",
+           },
+       },
+       "dim_employees": {
+           "columns": {
+               "employee_id": "BIGINT",
+               "store_id": "BIGINT",
+               "name": "VARCHAR",
+               "position": "ENUM",
+               "row_hash": "UBIGINT",
+               "created_at": "TIMESTAMP",
+               "updated_at": "TIMESTAMP",
+           },
+           "primary_key": ["employee_id"],
+       },
+       "dim_products": {
+           "columns": {
+               "product_id": "BIGINT",
+               "category": "ENUM",
+               "sub_category": "ENUM",
+               "description_pt": "VARCHAR",
+               "description_de": "VARCHAR",
+               "description_fr": "VARCHAR",
+               "description_es": "VARCHAR",
+               "description_en": "VARCHAR",
+               "description_zh": "VARCHAR",
+               "color": "VARCHAR",
+               "sizes": "VARCHAR",
+               "production_cost": "DOUBLE",
+               "row_hash": "UBIGINT",
+               "created_at": "TIMESTAMP",
+               "updated_at": "TIMESTAMP",
+           },
+           "primary_key": ["product_id"],
+       },
+       "dim_stores": {
+           "columns": {
+               "store_id": "BIGINT",
+               "country": "ENUM",
+               "city": "ENUM",
+               "store_name": "VARCHAR",
+               "number_of_employees": "INTEGER",
+               "zip_code": "VARCHAR",
+               "latitude": "DOUBLE",
+               "longitude": "DOUBLE",
+               "row_hash": "UBIGINT",
+               "created_at": "TIMESTAMP",
+               "updated_at": "TIMESTAMP",
+           },
+           "primary_key": ["store_id"],
+       },
+       "fact_transactions": {
+           "columns": {
+               "invoice_id": "VARCHAR",
+               "line_item": "BIGINT",
+               "customer_id": "BIGINT",
+               "product_id": "BIGINT",
+               "quantity": "BIGINT",
+               "date": "TIMESTAMP",
+               "discount": "DOUBLE",
+               "line_total": "DOUBLE",
+               "store_id": "BIGINT",
+               "employee_id": "BIGINT",
+               # low-cardinality but kept VARCHAR: a new value would rewrite the whole fact table
+               # to extend an ENUM, and DuckDB dictionary-compresses these columns on disk anyway
+               "currency": "VARCHAR",
+               "stock_keeping_unit": "VARCHAR",
+               "transaction_type": "VARCHAR",
+               "payment_method": "VARCHAR",
+               "unit_price": "DOUBLE",
+               "created_at": "TIMESTAMP",
+               "updated_at": "TIMESTAMP",
+               "date_key": "INTEGER",
+               "rate_to_usd": "DOUBLE",
+               "unit_price_usd": "DOUBLE",
+               "total_revenue_usd": "DOUBLE",
+               "net_amount_usd": "DOUBLE",
+               "discount_usd": "DOUBLE",
+           },
+       },
+   }
  
+   # Tables that are only ever extended: rows whose key is already loaded are kept as they are
+   EXTENDED_TABLES = {"dim_date": "date_key"}
+
    def __init__(self):
        self.config = config()
        self.db_path = self.config.DATABASE_PATH
        self.connection = None
+       # เวลาที่ใช้โหลดแต่ละตาราง (วินาที) ของ load_all_data ครั้งล่าสุด
+       self.timings = {}
+       # Profiler (src.etl.profiling) saving the EXPLAIN ANALYZE tree of every load statement
+       self.profiler = None
+       # True while loading into a snapshot that is not published yet (src.etl.snapshot)
+       self.defer_generation = False
+       # memory_limit, threads and temp_directory of every connection (MAX_MEMORY_GB, THREAD_COUNT)
+       self.resources = ResourceGovernor()
  
    def connect(self) -> dd.DuckDBPyConnection:
        """
@@ -41,6 +202,9 @@ class DataLoader:
          
            # Create connection
            self.connection =dd.connect(self.db_path)
+           self.resources.configure_duckdb(self.connection)
+           if self.profiler is not None:
+               self.profiler.attach(self.connection)
            logger.info(f"Connected to DuckDB at {self.db_path}")
            return self.connection
          
@@ -48,14 +212,83 @@ class DataLoader:
            logger.error(f"Error connecting to database: {str(e)}")
            raise
  
+   def execute(self, sql: str, parameters: Optional[list] = None, label: str = "statement"):
+       """
+       Execute a load statement; with a profiler attached its EXPLAIN ANALYZE tree is saved as <label>
+
+       Returns:
+           The DuckDB result of the statement
+       """
+       result = self.connection.execute(sql, parameters)
+       if self.profiler is not None:
+           self.profiler.save_statement_profile(self.connection, label)
+       return result
+
+   def generation_path(self) -> str:
+       """File next to the published warehouse (DATABASE_PATH) holding its load generation"""
+       return f"{self.config.DATABASE_PATH}.generation"
+
+   @staticmethod
+   def read_generation(path: str) -> int:
+       """Load generation stored in a generation file (0 when the warehouse was never loaded)"""
+       try:
+           with open(path, encoding="utf-8") as f:
+               return int(f.read().strip() or 0)
+       except (OSError, ValueError):
+           return 0
+
+   def bump_generation(self) -> int:
+       """
+       Increase the load generation after a committed write to the warehouse
+
+       Readers (src.query.WarehouseQuery) compare it with the generation their cached results
+       were computed at. It is kept in a file and not in a table, so checking it never needs the
+       DuckDB file lock the pipeline holds while loading. A failure is logged and never fails the load.
+
+       Returns:
+           The new generation
+       """
+       path = self.generation_path()
+       if self.defer_generation:
+           # readers still see the published snapshot: SnapshotManager.publish bumps it after the swap
+           return self.read_generation(path)
+       generation = self.read_generation(path) + 1
+       try:
+           tmp_path = path + ".tmp"
+           with open(tmp_path, "w", encoding="utf-8") as f:
+               f.write(str(generation))
+           os.replace(tmp_path, path)
+           logger.info(f"Warehouse load generation is now {generation}")
+       except OSError as e:
+           logger.warning(f"Could not write the load generation: {e}")
+       return generation
+
    def disconnect(self):
        """Close database connection"""
        if self.connection:
            self.connection.close()
+           self.connection = None
            logger.info("Database connection closed")
  
-   def create_schema(self):
-       """Create database schema for data warehouse"""
+   def rollback(self):
+       """
+       Roll back the open transaction
+
+       A rollback that fails (e.g. DuckDB is out of its memory_limit) is logged: the transaction
+       is never committed and is discarded when the connection closes.
+       """
+       try:
+           self.connection.rollback()
+       except Exception as e:
+           logger.error(f"Error rolling back, the transaction is discarded on disconnect: {str(e)}")
+
+   def create_schema(self, tables: Optional[List[str]] = None):
+       """
+       Create database schema for data warehouse
+
+       Args:
+           tables: Only (re)create these tables (default every table in TABLE_SCHEMAS)
+       """
        logger.info("Creating database schema")
      
        if not self.connection:
@@ -67,10 +300,13 @@ class DataLoader:
            # self.connection.execute("CREATE SCHEMA IF NOT EXISTS fact")
          
            # Create dimension tables
-           self.create_dimension_tables()
+           self.create_dimension_tables(tables)
+         
+           # Create fact tables
+           self.create_fact_tables(tables)
          
-           # # Create fact tables
-           self.create_fact_tables()
+           # Create ETL metadata tables (watermarks for incremental fact loads)
+           self.create_metadata_tables()
          
            logger.info("Database schema created successfully")
          
@@ -78,138 +314,332 @@ class DataLoader:
            logger.error(f"Error creating schema: {str(e)}")
            raise
  
-   def create_dimension_tables(self):
-       """Create dimension tables"""
-     
-       # Date dimension
-       self.connection.execute("""
-           CREATE OR REPLACE TABLE dim_date (
-               date_key DATE PRIMARY KEY,
-               date DATE,
-               year INTEGER,
-               quarter INTEGER,
-               month INTEGER,
-               month_name VARCHAR,
-               day INTEGER,
-               day_of_week INTEGER,
-               day_name VARCHAR,
-               week_of_year INTEGER,
-               is_weekend BOOLEAN
-           )
-       """)
-     
-       # Customers dimension
+   def create_metadata_tables(self):
+       """Create ETL metadata tables"""
+
+       # High-watermark of each incrementally loaded fact table
        self.connection.execute("""
-           CREATE OR REPLACE TABLE dim_customers (
-               customer_ID INTEGER PRIMARY KEY,
-               name STRING,
-               email STRING,
-               telephone STRING,
-               city STRING,
-               country STRING,
-               gender STRING,
-               date_of_birth STRING,
-               job_title STRING,
-               created_at TIMESTAMP,
+           CREATE TABLE IF NOT EXISTS etl_watermarks (
+               table_name VARCHAR PRIMARY KEY,
+               watermark_column VARCHAR,
+               watermark_value VARCHAR,
+               rows_loaded BIGINT,
                updated_at TIMESTAMP
            )
        """)
-     
-       # Discounts dimension
+
+       # Leading rows of each fact table known to be in cluster_by order (src.etl.layout)
        self.connection.execute("""
-           CREATE OR REPLACE TABLE dim_discounts (
-               start STRING,
-               end_date STRING,
-               discont FLOAT,
-               description STRING,
-               category STRING PRIMARY KEY,
-               created_at TIMESTAMP,
+           CREATE TABLE IF NOT EXISTS etl_layout (
+               table_name VARCHAR PRIMARY KEY,
+               clustered_rows BIGINT,
                updated_at TIMESTAMP
            )
        """)
-             
-     
-       # Employees dimension
-       self.connection.execute("""
-           CREATE OR REPLACE TABLE dim_employees (
-               employee_id INTEGER PRIMARY KEY,
-               store_id INTEGER,
-               name STRING,
-               position STRING,
-               created_at TIMESTAMP,
-               updated_at TIMESTAMP
-        )
-       """)
-     
-       # Products dimension
+
+       # One-time data migrations already applied to this warehouse (see prepare_warehouse)
        self.connection.execute("""
-           CREATE OR REPLACE TABLE dim_products (
-               product_id INTEGER PRIMARY KEY,
-               category STRING,
-               sub_category STRING,
-               description_pt STRING,
-               description_de STRING,
-               description_fr STRING,
-               description_es STRING,              
-               description_en STRING,
-               description_zh STRING,
-               color STRING,
-               size STRING,
-               production_cost INTEGER,
-               created_at TIMESTAMP,
-               updated_at TIMESTAMP
-         
+           CREATE TABLE IF NOT EXISTS etl_migrations (
+               migration VARCHAR PRIMARY KEY,
+               rows_updated BIGINT,
+               applied_at TIMESTAMP
            )
        """)
-       # Store dimension
-       self.connection.execute("""
-           CREATE OR REPLACE TABLE dim_stores (
-               store_id INTEGER PRIMARY KEY,
-               country STRING,
-               city STRING,
-               store_name STRING,
-               number_of_employees INTEGER,
-               zip_code STRING,
-               latitude FLOAT,
-               longitude FLOAT,
-               created_at TIMESTAMP,
-               updated_at TIMESTAMP
+
+   def set_clustered_rows(self, table_name: str, rows: int):
+       """Record that the first `rows` rows of a fact table are in cluster_by order"""
+       self.create_metadata_tables()
+       self.connection.execute("INSERT OR REPLACE INTO etl_layout VALUES (?, ?, current_timestamp)",
+                               [table_name, rows])
+
+   @staticmethod
+   def quote(identifier: str) -> str:
+       """Quote a column name (some, like "end", are SQL keywords)"""
+       return '"' + identifier.replace('"', '""') + '"'
+
+   def prepare_warehouse(self):
+       """Create the metadata tables and migrate tables written by older versions of the pipeline"""
+       self.create_metadata_tables()
+       self.migrate_date_keys()
+       self.migrate_enum_columns()
+       self.migrate_fact_measures()
+
+   def migrate_date_keys(self):
+       """
+       Convert existing date_key columns to integer YYYYMMDD keys
+
+       Older runs stored date_key as a "%d%m%Y" string (or a DATE in the original dim_date DDL).
+       Tables are rewritten once into their declared schema, keeping every row.
+       """
+       for table_name in ("dim_date", "fact_transactions"):
+           if not self.table_exists(table_name):
+               continue
+           data_type = self.column_type(table_name, "date_key")
+           if data_type is None or data_type == "INTEGER":
+               continue
+
+           if data_type == "VARCHAR":
+               key = "strptime(date_key, '%d%m%Y')"
+           else:
+               key = "date_key"
+           converted = f"CAST(year({key}) * 10000 + month({key}) * 100 + day({key}) AS INTEGER)"
+           logger.info(f"Migrating {table_name}.date_key from {data_type} to INTEGER")
+
+           old_columns = [r[0] for r in self.connection.execute(
+               "SELECT column_name FROM information_schema.columns WHERE table_name = ?", [table_name]).fetchall()]
+           columns = [col for col in self.table_schema(table_name)["columns"] if col in old_columns]
+           select_list = ", ".join(converted + " AS date_key" if col == "date_key" else self.quote(col) for col in columns)
+           column_list = ", ".join(map(self.quote, columns))
+
+           self.connection.execute(f"CREATE OR REPLACE TEMP TABLE migrate_{table_name} AS SELECT {select_list} FROM {table_name}")
+           self.connection.execute(f"DROP TABLE {table_name}")
+           self.create_table(table_name, replace=True)
+           self.connection.execute(
+               f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM migrate_{table_name}")
+           self.connection.execute(f"DROP TABLE migrate_{table_name}")
+
+   # USD measures of fact_transactions, from the stored unit price, quantity, rate and discount
+   # (discount is a fraction, e.g. 0.2 = 20% off)
+   FACT_MEASURES = {
+       "unit_price_usd": "unit_price * rate_to_usd",
+       "total_revenue_usd": "quantity * unit_price * rate_to_usd",
+       "net_amount_usd": "quantity * unit_price * rate_to_usd * (1 - discount)",
+       "discount_usd": "quantity * unit_price * rate_to_usd * discount",
+   }
+
+   def migrate_fact_measures(self):
+       """
+       Recompute the USD measures of fact rows loaded by older versions of the pipeline
+
+       Older runs applied rate_to_usd twice to total_revenue_usd (and so to net_amount_usd and
+       discount_usd) and divided the fractional discount by 100 again. Rows kept by incremental
+       loads are corrected once from their own columns; the aggregates built from them are
+       rebuilt at their next refresh.
+       """
+       migration = "fact_measures_v2"
+       if self.connection.execute("SELECT count(*) FROM etl_migrations WHERE migration = ?",
+                                  [migration]).fetchone()[0]:
+           return
+       rows = 0
+       columns = ["unit_price", "quantity", "rate_to_usd", "discount", *self.FACT_MEASURES]
+       if self.table_exists("fact_transactions") and all(
+               self.column_type("fact_transactions", col) for col in columns):
+           assignments = ", ".join(f"{col} = {expr}" for col, expr in self.FACT_MEASURES.items())
+           rows = self.connection.execute(f"UPDATE fact_transactions SET {assignments}").fetchone()[0]
+           logger.warning(f"Recomputed the USD measures of {rows} fact_transactions rows (one-time migration)")
+           if rows and self.table_exists("etl_aggregates"):
+               self.connection.execute("DELETE FROM etl_aggregates")
+       self.connection.execute("INSERT INTO etl_migrations VALUES (?, ?, current_timestamp)", [migration, rows])
+
+   def migrate_enum_columns(self):
+       """
+       Convert declared ENUM columns that older runs stored as VARCHAR, and ENUM columns that are
+       no longer declared ENUM (the fact table columns) back to VARCHAR
+
+       The dictionary is built from the values already loaded in every table sharing the column.
+       """
+       for table_name in self.TABLE_SCHEMAS:
+           if not self.table_exists(table_name):
+               continue
+           declared = self.enum_columns(table_name)
+           stored = self.connection.execute(
+               "SELECT column_name FROM information_schema.columns WHERE table_name = ? AND data_type LIKE 'ENUM%'",
+               [table_name]).fetchall()
+           for (column,) in stored:
+               if column in declared or column not in self.TABLE_SCHEMAS[table_name]["columns"]:
+                   continue
+               if table_name in self.FACT_TABLES:
+                   logger.warning(f"Rewriting {table_name}.{column} from ENUM to VARCHAR (one-time migration)")
+               self.connection.execute(f"ALTER TABLE {table_name} ALTER {self.quote(column)} TYPE VARCHAR")
+
+       tables_by_column = {}
+       for table_name in self.TABLE_SCHEMAS:
+           for column in self.enum_columns(table_name):
+               tables_by_column.setdefault(column, []).append(table_name)
+
+       for column, tables in tables_by_column.items():
+           plain = [t for t in tables if self.table_exists(t)
+                    and not (self.column_type(t, column) or "ENUM").startswith("ENUM")]
+           if not plain:
+               continue
+           logger.info(f"Migrating {column} in {', '.join(plain)} to {self.enum_type(column)}")
+           union = " UNION ".join(
+               f"SELECT CAST({self.quote(column)} AS VARCHAR) FROM {t} WHERE {self.quote(column)} IS NOT NULL"
+               for t in plain)
+           values = [row[0] for row in self.connection.execute(union).fetchall()]
+           self.extend_enum(column, values, rebuild=True)
+
+   def column_type(self, table_name: str, column: str) -> Optional[str]:
+       """Data type of a column of an existing table, or None when the column does not exist"""
+       row = self.connection.execute(
+           "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = ?",
+           [table_name, column]).fetchone()
+       return row[0] if row else None
+
+   def enum_columns(self, table_name: str) -> List[str]:
+       """Columns of a table declared "ENUM" in TABLE_SCHEMAS (low-cardinality strings)"""
+       return [col for col, col_type in self.TABLE_SCHEMAS[table_name]["columns"].items() if col_type == "ENUM"]
+
+   @staticmethod
+   def enum_type(column: str) -> str:
+       """ENUM type shared by every table with this column (e.g. country in dim_customers and dim_stores)"""
+       return f"enum_{column}"
+
+   def enum_values(self, column: str) -> List[str]:
+       """Dictionary of an ENUM type in code order (empty when the type does not exist yet)"""
+       exists = self.connection.execute(
+           "SELECT COUNT(*) FROM duckdb_types() WHERE type_name = ?", [self.enum_type(column)]).fetchone()[0]
+       if not exists:
+           return []
+       return self.connection.execute(f"SELECT enum_range(NULL::{self.enum_type(column)})").fetchone()[0] or []
+
+   def enum_dictionaries(self) -> Dict[str, List[str]]:
+       """Dictionary of every declared ENUM column, as persisted in the warehouse (empty before its type exists)"""
+       if not self.connection:
+           self.connect()
+       columns = {column for table_name in self.TABLE_SCHEMAS for column in self.enum_columns(table_name)}
+       return {column: self.enum_values(column) for column in sorted(columns)}
+
+   def extend_enum(self, column: str, values: Iterable[str], rebuild: bool = False):
+       """
+       Add new values to the ENUM type of a column
+
+
+       Dictionaries are append-only: loaded values keep their codes and new values are added at the end,
+       so they stay stable across incremental runs. DuckDB cannot alter an ENUM in place, so the columns
+       using it are switched to VARCHAR, the type is recreated and the columns are switched back.
+       That rewrites every table using the type, so only dimension columns are declared ENUM.
+
+
+       Args:
+           column: Column name (see enum_type)
+           values: Values the column is about to receive
+           rebuild: Recreate the type even without new values (e.g. to convert VARCHAR columns)
+       """
+       dictionary = self.enum_values(column)
+       new_values = sorted({value for value in values if value is not None} - set(dictionary))
+       if not new_values and not rebuild:
+           return
+
+       type_name = self.enum_type(column)
+       tables = [t for t in self.TABLE_SCHEMAS
+                 if column in self.enum_columns(t) and self.table_exists(t) and self.column_type(t, column)]
+       for table_name in tables:
+           if table_name in self.FACT_TABLES:
+               logger.warning(f"Extending {type_name} rewrites the {table_name} fact table twice")
+       for table_name in tables:
+           self.connection.execute(f"ALTER TABLE {table_name} ALTER {self.quote(column)} TYPE VARCHAR")
+       self.connection.execute(f"DROP TYPE IF EXISTS {type_name}")
+       literals = ", ".join("'" + value.replace("'", "''") + "'" for value in dictionary + new_values)
+       self.connection.execute(f"CREATE TYPE {type_name} AS ENUM ({literals})")
+       for table_name in tables:
+           self.connection.execute(f"ALTER TABLE {table_name} ALTER {self.quote(column)} TYPE {type_name}")
+       logger.info(f"{type_name}: added {len(new_values)} values ({len(dictionary) + len(new_values)} in total)")
+
+   def extend_enums(self, source: str, table_name: str):
+       """Add the values of the ENUM columns of a source relation to their dictionaries (one scan)"""
+       columns = self.enum_columns(table_name)
+       if not columns:
+           return
+       lists = ", ".join(
+           f"list(DISTINCT CAST(s.{self.quote(col)} AS VARCHAR)) FILTER (WHERE s.{self.quote(col)} IS NOT NULL)"
+           for col in columns)
+       row = self.connection.execute(f"SELECT {lists} FROM {source} s").fetchone()
+       for column, values in zip(columns, row):
+           self.extend_enum(column, values or [])
+
+   def create_table(self, table_name: str, replace: bool = True):
+       """
+       Create a warehouse table from its declared schema in TABLE_SCHEMAS
+
+       Columns declared "ENUM" use the shared enum_<column> type (created empty if needed).
+
+       Args:
+           table_name: Name of the table
+           replace: CREATE OR REPLACE (full reload) instead of CREATE IF NOT EXISTS (incremental)
+       """
+       schema = self.table_schema(table_name)
+       for column in self.enum_columns(table_name):
+           self.connection.execute(f"CREATE TYPE IF NOT EXISTS {self.enum_type(column)} AS ENUM ()")
+       definitions = [f"{self.quote(column)} {self.enum_type(column) if column_type == 'ENUM' else column_type}"
+                      for column, column_type in schema["columns"].items()]
+       if schema.get("primary_key"):
+           definitions.append(f"PRIMARY KEY ({', '.join(map(self.quote, schema['primary_key']))})")
+       create = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+       body = ",\n               ".join(definitions)
+       self.connection.execute(f"""
+           {create} {table_name} (
+               {body}
            )
        """)
+       if replace and table_name in self.FACT_TABLES and self.table_exists("etl_layout"):
+           # ตารางใหม่ยังว่าง ลำดับที่บันทึกไว้ของตารางเดิมใช้ไม่ได้แล้ว
+           self.connection.execute("DELETE FROM etl_layout WHERE table_name = ?", [table_name])
 
+   def _replaces_table(self, table_name: str) -> bool:
+       """Fact tables in incremental mode, dimensions in upsert/scd2 mode and extended tables keep their rows"""
+       if table_name in self.EXTENDED_TABLES:
+           return False
+       if table_name in self.FACT_TABLES:
+           return self.config.FACT_LOAD_MODE != "incremental"
+       if table_name in self.DIMENSION_KEYS:
+           return self.config.DIM_LOAD_MODE == "replace"
+       return True
 
+   def table_schema(self, table_name: str) -> dict:
+       """
+       Effective schema of a table for the configured load modes
 
+       In scd2 mode the change-tracked dimensions get validity columns and a (key, valid_from) primary key.
+       """
+       schema = self.TABLE_SCHEMAS[table_name]
+       if table_name in self.DIMENSION_KEYS and self.config.DIM_LOAD_MODE == "scd2":
+           columns = dict(schema["columns"])
+           columns.update({"valid_from": "TIMESTAMP", "valid_to": "TIMESTAMP", "is_current": "BOOLEAN"})
+           return {"columns": columns, "primary_key": [self.DIMENSION_KEYS[table_name], "valid_from"]}
+       return schema
 
- 
-#    def create_fact_tables(self):
-#        """Create fact tables"""
-     
-       # Sales fact table
-    #    self.connection.execute("""
-    #        CREATE OR REPLACE TABLE transactions_fact (
-    #            invoice_id STRING PRIMARY KEY,
-    #            line INTEGER,
-    #            customer_id INTEGER,
-    #            product_id INTEGER,
-    #            quantity INTEGER,
-    #            date STRING,
-    #            discount FLOAT,
-    #            line_total FLOAT,
-    #            store_id INTEGER,
-    #            employee_id INTEGER,
-    #            currency STRING,
-    #            sku STRING,
-    #            stransaction_type STRING,
-    #            payment_method STRING,
-    #            unit_price FLOAT,
-    #            created_at TIMESTAMP,
-    #            updated_at TIMESTAMP
-
-
-
-
-    #        )
-    #    """)
+   def hashed_columns(self, table_name: str) -> List[str]:
+       """Columns that make up the row hash (audit columns are ignored)"""
+       return [col for col in self.TABLE_SCHEMAS[table_name]["columns"]
+               if col not in ("row_hash", "created_at", "updated_at")]
+
+   def select_list(self, table_name: str, alias: Optional[str] = None) -> str:
+       """
+       SELECT list producing the declared columns of a table from a transformed source
+
+       row_hash and the SCD2 validity columns are computed here, so both engines share one definition.
+       """
+       prefix = f"{alias}." if alias else ""
+       expressions = []
+       for col in self.table_schema(table_name)["columns"]:
+           if col == "row_hash":
+               # ENUM values hash as their codes, so they are hashed as strings to match any source
+               enums = self.enum_columns(table_name)
+               hashed = ", ".join(f"CAST({prefix}{self.quote(c)} AS VARCHAR)" if c in enums else prefix + self.quote(c)
+                                  for c in self.hashed_columns(table_name))
+               expressions.append(f"hash({hashed}) AS row_hash")
+           elif col == "valid_from":
+               expressions.append("current_localtimestamp() AS valid_from")
+           elif col == "valid_to":
+               expressions.append("CAST(NULL AS TIMESTAMP) AS valid_to")
+           elif col == "is_current":
+               expressions.append("true AS is_current")
+           else:
+               expressions.append(prefix + self.quote(col))
+       return ", ".join(expressions)
+
+   def create_dimension_tables(self, tables: Optional[List[str]] = None):
+       """Create dimension tables"""
+       for table_name in self.TABLE_SCHEMAS:
+           if table_name.startswith("dim_") and (tables is None or table_name in tables):
+               self.create_table(table_name, replace=self._replaces_table(table_name))
+
+   def create_fact_tables(self, tables: Optional[List[str]] = None):
+       """Create fact tables"""
+       for table_name in self.TABLE_SCHEMAS:
+           if table_name.startswith("fact_") and (tables is None or table_name in tables):
+               self.create_table(table_name, replace=self._replaces_table(table_name))
        # FOREIGN KEY (customer_key) REFERENCES dim_customers(customer_id),
        # FOREIGN KEY (employee_key) REFERENCES dim_employees(employ{ee_key),
        # FOREIGN KEY (product_key) REFERENCES dim_products(product_key),
@@ -237,35 +667,91 @@ class DataLoader:
        #         FOREIGN KEY (order_date_key) REFERENCES dimension.dim_date(date_key)
        #     )
        # """)
- 
-   def load_dataframe(self, df: pl.DataFrame, table_name: str) -> bool:
+
+   def insert_from(self, source: str, table_name: str) -> int:
+       """
+       Insert rows from a relation visible to DuckDB into a declared table
+
+       Only the declared columns are selected (in declared order), so the table keeps its schema.
+       New values of ENUM columns are added to their dictionaries first.
+
+       Args:
+           source: Table/view name or parenthesized subquery
+           table_name: Name of the target table
+
+       Returns:
+           Number of inserted rows
+       """
+       self.extend_enums(source, table_name)
+       columns = ", ".join(map(self.quote, self.table_schema(table_name)["columns"]))
+       return self.execute(
+           f"INSERT INTO {table_name} ({columns}) SELECT {self.select_list(table_name)} FROM {source}"
+           f"{self.cluster_order(table_name)}", label=f"{table_name}_insert").fetchone()[0]
+
+   def cluster_order(self, table_name: str) -> str:
+       """ORDER BY clause writing new rows of a fact table in its cluster_by order ("" for other tables)"""
+       keys = self.FACT_TABLES.get(table_name, {}).get("cluster_by")
+       if not keys:
+           return ""
+       return " ORDER BY " + ", ".join(map(self.quote, keys))
+
+   def _insert_frame(self, df: pl.DataFrame, table_name: str) -> int:
+       """
+       Insert a Polars DataFrame through DuckDB's Arrow scan (no intermediate copy)
+
+       Each table gets its own stage_<table> view name instead of a shared temp table.
+       """
+       stage_name = f"stage_{table_name}"
+       self.connection.register(stage_name, df)
+       try:
+           return self.insert_from(stage_name, table_name)
+       finally:
+           self.connection.unregister(stage_name)
+
+   def load_dataframe(self, df: pl.DataFrame, table_name: str, mode: Optional[str] = None) -> bool:
        """
        Load Polars DataFrame into DuckDB table
      
        Args:
            df: Polars DataFrame to load
            table_name: Name of the target table
-           schema: Database schema (dimension or fact)
+           mode: "replace", "append", "incremental" (fact tables, default config.FACT_LOAD_MODE),
+               "upsert"/"scd2" (DIMENSION_KEYS tables, default config.DIM_LOAD_MODE)
+               or "extend" (EXTENDED_TABLES, the default for them)
          
        Returns:
            True if successful, False otherwise
        """
+       if mode is None:
+           if table_name in self.FACT_TABLES:
+               mode = self.config.FACT_LOAD_MODE
+           elif table_name in self.DIMENSION_KEYS:
+               mode = self.config.DIM_LOAD_MODE
+           elif table_name in self.EXTENDED_TABLES:
+               mode = "extend"
+           else:
+               mode = "replace"
+       if mode in ("upsert", "scd2"):
+           return self.load_dimension_changes(df, table_name)
+       if mode == "incremental":
+           return self.load_incremental(df, table_name)
+       if mode == "append":
+           return self.append_dataframe(df, table_name)
+       if mode == "extend":
+           return self.extend_dataframe(df, table_name)
+
        try:
            if not self.connection:
                self.connect()
          
-           # Convert Polars DataFrame to Arrow Table for better DuckDB integration
-           arrow_table = df.to_arrow()
-         
-           # Register the Arrow table with DuckDB
-           self.connection.register("temp_table", arrow_table)
-         
-           # Insert data into target table
+           # Recreate the declared (empty) table and write the frame into it once
            full_table_name = f"{table_name}"
-           self.connection.execute(f"CREATE OR REPLACE TABLE  {full_table_name} AS SELECT * FROM temp_table")
-         
-           # Clean up temporary table
-           self.connection.unregister("temp_table")
+           self.reset_table(full_table_name)
+           inserted = self._insert_frame(df, full_table_name)
+
+           if table_name in self.FACT_TABLES:
+               # written in one ORDER BY cluster_by insert
+               self.set_clustered_rows(table_name, inserted)
          
            logger.info(f"Successfully loaded {len(df)} rows into {full_table_name}")
            return True
@@ -274,12 +760,383 @@ class DataLoader:
            logger.error(f"Error loading data into {table_name}: {str(e)}")
            return False
  
-   def load_all_data(self, transformed_data: Dict[str, pl.DataFrame]) -> bool:
+   def reset_table(self, table_name: str):
+       """Recreate a table empty from its declared schema (a full rebuild invalidates any recorded watermark)"""
+       self.create_table(table_name, replace=True)
+       if table_name in self.FACT_TABLES:
+           self.create_metadata_tables()
+           self.connection.execute("DELETE FROM etl_watermarks WHERE table_name = ?", [table_name])
+
+   def append_dataframe(self, df: pl.DataFrame, table_name: str) -> bool:
+       """
+       Append Polars DataFrame to an existing DuckDB table (declared columns only)
+
+       Returns:
+           True if successful, False otherwise
+       """
+       try:
+           if not self.connection:
+               self.connect()
+
+           self._insert_frame(df, table_name)
+
+           logger.info(f"Successfully appended {len(df)} rows into {table_name}")
+           return True
+
+       except Exception as e:
+           logger.error(f"Error appending data into {table_name}: {str(e)}")
+           return False
+
+   def extend_dataframe(self, df: pl.DataFrame, table_name: str) -> bool:
+       """
+       Insert only the rows of a Polars DataFrame whose key is not loaded yet
+
+       Returns:
+           True if successful, False otherwise
+       """
+       try:
+           if not self.connection:
+               self.connect()
+
+           stage_name = f"stage_{table_name}"
+           self.connection.register(stage_name, df)
+           try:
+               inserted = self.insert_missing(stage_name, table_name)
+           finally:
+               self.connection.unregister(stage_name)
+
+           logger.info(f"Successfully added {inserted} new rows into {table_name}")
+           return True
+
+       except Exception as e:
+           logger.error(f"Error extending {table_name}: {str(e)}")
+           return False
+
+   def insert_missing(self, source: str, table_name: str) -> int:
+       """
+       Insert rows from a relation visible to DuckDB whose key is not in the table yet
+
+       The table is created when it does not exist; loaded rows are never rewritten.
+
+       Args:
+           source: Table/view name or parenthesized subquery
+           table_name: Name of the target table (must be in EXTENDED_TABLES)
+
+       Returns:
+           Number of inserted rows
+       """
+       key = self.quote(self.EXTENDED_TABLES[table_name])
+       self.create_table(table_name, replace=False)
+       self.extend_enums(source, table_name)
+       columns = ", ".join(map(self.quote, self.table_schema(table_name)["columns"]))
+       return self.execute(f"""
+           INSERT INTO {table_name} ({columns})
+           SELECT {self.select_list(table_name, alias="s")} FROM {source} s
+           WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE t.{key} = s.{key})
+       """, label=f"{table_name}_insert_missing").fetchone()[0]
+
+   def get_date_range(self) -> Optional[Tuple[date, date]]:
+       """
+       First and last date of the persisted date dimension
+
+       Returns:
+           (min date, max date), or None when dim_date does not exist or is empty
+       """
+       if not self.connection:
+           self.connect()
+       if not self.table_exists("dim_date"):
+           return None
+       row = self.connection.execute("SELECT MIN(date), MAX(date) FROM dim_date").fetchone()
+       if row[0] is None:
+           return None
+       return row[0], row[1]
+
+   def load_batches(self, batches: Iterable[pl.DataFrame], table_name: str,
+                    tables: Optional[Dict[str, pl.DataFrame]] = None) -> bool:
+       """
+       Load a stream of DataFrames into one table inside a single transaction (see load_all_data)
+
+
+       Args:
+           batches: Iterable of Polars DataFrames (e.g. a generator over the CSV)
+           table_name: Name of the target table
+           tables: Other tables loaded in the same transaction before the first batch (e.g. dim_date)
+
+
+       Returns:
+           True if successful, False otherwise
+       """
+       return self.load_all_data(tables or {}, batches={table_name: batches})
+
+   def _load_batch_stream(self, batches: Iterable[pl.DataFrame], table_name: str) -> int:
+       """
+       Write a stream of DataFrames into one table (inside the caller's transaction)
+
+
+       The table is emptied first and every batch is appended (in incremental mode each batch goes
+       through the watermark instead), so no batches leave an empty table rather than the old rows.
+       Only one batch is held in memory at a time. A failed batch raises, so the caller rolls back.
+
+
+       Returns:
+           Number of rows in the batches
+       """
+       incremental = table_name in self.FACT_TABLES and self.config.FACT_LOAD_MODE == "incremental"
+       watermark = None
+       if incremental:
+           if self.table_exists(table_name):
+               watermark = self.get_watermark(table_name)
+       else:
+           self.reset_table(table_name)
+       total_rows = 0
+       for i, batch in enumerate(batches):
+           if incremental:
+               # ไฟล์อาจไม่เรียงตามวันที่ ทุก batch ต้องเทียบกับ watermark ก่อนเริ่มโหลด
+               success = self.load_incremental(batch, table_name, watermark=watermark, fixed_watermark=True)
+           else:
+               success = self.load_dataframe(batch, table_name, mode="append")
+               if success and i == 0 and table_name in self.FACT_TABLES:
+                   # the first batch lands in an empty table in one ORDER BY cluster_by insert
+                   self.set_clustered_rows(table_name, len(batch))
+           if not success:
+               raise RuntimeError(f"batch {i} of {table_name} could not be loaded")
+           total_rows += len(batch)
+       logger.info(f"Successfully loaded {total_rows} rows into {table_name} in batches")
+       return total_rows
+
+   def load_dimension_changes(self, df: pl.DataFrame, table_name: str) -> bool:
+       """
+       Apply only inserted, changed and deleted rows of a Polars DataFrame to a dimension table
+
+       Returns:
+           True if successful, False otherwise
+       """
+       try:
+           if not self.connection:
+               self.connect()
+
+           stage_name = f"stage_{table_name}"
+           self.connection.register(stage_name, df)
+           try:
+               self.merge_dimension(stage_name, table_name)
+           finally:
+               self.connection.unregister(stage_name)
+           return True
+
+       except Exception as e:
+           logger.error(f"Error applying changes to {table_name}: {str(e)}")
+           return False
+
+   def merge_dimension(self, source: str, table_name: str) -> Dict[str, int]:
+       """
+       Row-hash change data capture for a dimension table
+
+
+       The row hash of every incoming row is compared with the hash stored for its business key:
+       - upsert: new keys are inserted, changed rows updated in place (created_at is kept),
+         keys missing from the source are deleted
+       - scd2: changed and deleted keys get their current version closed (valid_to, is_current),
+         new and changed keys get a new current version
+       Unchanged rows are not touched.
+
+
+       Args:
+           source: Name of the relation (or parenthesized subquery) holding the full dimension
+           table_name: Name of the dimension table (must be in DIMENSION_KEYS)
+
+
+       Returns:
+           Dictionary with the number of inserted, changed and deleted rows
+       """
+       key = self.quote(self.DIMENSION_KEYS[table_name])
+       scd2 = self.config.DIM_LOAD_MODE == "scd2"
+       columns = list(self.table_schema(table_name)["columns"])
+
+       if not self.table_exists(table_name):
+           self.create_table(table_name, replace=False)
+       existing = [row[0] for row in self.connection.execute(
+           "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+           [table_name]).fetchall()]
+       if existing != columns:
+           # e.g. first run after switching modes: rebuild once with the declared schema
+           logger.warning(f"{table_name} does not match its declared schema, rebuilding it")
+           self.create_table(table_name, replace=True)
+       self.extend_enums(source, table_name)
+
+       # Hash every incoming row once
+       changes = f"cdc_{table_name}"
+       self.execute(f"""
+           CREATE OR REPLACE TEMP TABLE {changes} AS
+           SELECT {self.select_list(table_name, alias="s")} FROM {source} s
+       """, label=f"{table_name}_hash")
+       column_list = ", ".join(map(self.quote, columns))
+
+       if scd2:
+           deleted = self.execute(f"""
+               UPDATE {table_name} SET valid_to = current_localtimestamp(), is_current = false
+               WHERE is_current AND NOT EXISTS (SELECT 1 FROM {changes} c WHERE c.{key} = {table_name}.{key})
+           """, label=f"{table_name}_close_deleted").fetchone()[0]
+           changed = self.execute(f"""
+               UPDATE {table_name} SET valid_to = current_localtimestamp(), is_current = false
+               FROM {changes} c
+               WHERE {table_name}.is_current AND c.{key} = {table_name}.{key} AND c.row_hash <> {table_name}.row_hash
+           """, label=f"{table_name}_close_changed").fetchone()[0]
+           inserted = self.execute(f"""
+               INSERT INTO {table_name} ({column_list})
+               SELECT {column_list} FROM {changes} c
+               WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE t.{key} = c.{key} AND t.is_current)
+           """, label=f"{table_name}_insert_versions").fetchone()[0] - changed
+       else:
+           deleted = self.execute(f"""
+               DELETE FROM {table_name}
+               WHERE NOT EXISTS (SELECT 1 FROM {changes} c WHERE c.{key} = {table_name}.{key})
+           """, label=f"{table_name}_delete").fetchone()[0]
+           updates = ", ".join(f"{self.quote(col)} = c.{self.quote(col)}" for col in columns
+                               if col not in (self.DIMENSION_KEYS[table_name], "created_at"))
+           changed = self.execute(f"""
+               UPDATE {table_name} SET {updates}
+               FROM {changes} c
+               WHERE c.{key} = {table_name}.{key} AND c.row_hash <> {table_name}.row_hash
+           """, label=f"{table_name}_update").fetchone()[0]
+           inserted = self.execute(f"""
+               INSERT INTO {table_name} ({column_list})
+               SELECT {column_list} FROM {changes} c
+               WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE t.{key} = c.{key})
+           """, label=f"{table_name}_insert").fetchone()[0]
+
+       self.connection.execute(f"DROP TABLE {changes}")
+       stats = {"inserted": inserted, "changed": changed, "deleted": deleted}
+       logger.info(f"Applied changes to {table_name}: {inserted} inserted, {changed} changed, {deleted} deleted")
+       return stats
+
+   def table_exists(self, table_name: str) -> bool:
+       """Check if a table exists in the main schema"""
+       result = self.connection.execute(
+           "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'main' AND table_name = ?",
+           [table_name]).fetchone()
+       return result[0] > 0
+
+   def get_watermark(self, table_name: str) -> Optional[str]:
+       """
+       Get the high-watermark of a fact table
+
+       Falls back to MAX(watermark_column) when the table was loaded before watermarks were recorded.
+       """
+       watermark_column = self.FACT_TABLES[table_name]["watermark_column"]
+       row = self.connection.execute(
+           "SELECT watermark_value FROM etl_watermarks WHERE table_name = ?", [table_name]).fetchone()
+       if row is not None:
+           return row[0]
+       row = self.connection.execute(f"SELECT CAST(MAX({watermark_column}) AS VARCHAR) FROM {table_name}").fetchone()
+       return row[0]
+
+   def load_incremental(self, df: pl.DataFrame, table_name: str,
+                        watermark: Optional[str] = None, fixed_watermark: bool = False) -> bool:
+       """
+       Append only new rows of a Polars DataFrame into a fact table and advance its watermark
+
+
+       Args:
+           df: Polars DataFrame to load
+           table_name: Name of the fact table (must be in FACT_TABLES)
+           watermark: Watermark to filter against when fixed_watermark is True
+           fixed_watermark: Use the given watermark instead of the recorded one
+               (batched loads pin the watermark from before the first batch)
+
+
+       Returns:
+           True if successful, False otherwise
+       """
+       try:
+           if not self.connection:
+               self.connect()
+
+           stage_name = f"stage_{table_name}"
+           self.connection.register(stage_name, df)
+           try:
+               inserted = self.insert_incremental(stage_name, table_name, watermark, fixed_watermark)
+           finally:
+               self.connection.unregister(stage_name)
+
+           logger.info(f"{table_name}: skipped {len(df) - inserted} already loaded rows")
+           return True
+
+       except Exception as e:
+           logger.error(f"Error loading data incrementally into {table_name}: {str(e)}")
+           return False
+
+   def insert_incremental(self, source: str, table_name: str,
+                          watermark: Optional[str] = None, fixed_watermark: bool = False) -> int:
+       """
+       Insert new rows from a table or view already visible to DuckDB into a fact table
+
+
+       Rows at or after the watermark are inserted unless their key columns are already loaded,
+       so re-running the same file (or a file that re-sends the last day) adds nothing twice.
+       Rows older than the watermark are treated as already loaded.
+
+
+       Args:
+           source: Name of the relation holding the new rows
+           table_name: Name of the fact table (must be in FACT_TABLES)
+           watermark: Watermark to filter against when fixed_watermark is True
+           fixed_watermark: Use the given watermark instead of the recorded one
+
+
+       Returns:
+           Number of inserted rows
+       """
+       self.create_metadata_tables()
+
+       fact = self.FACT_TABLES[table_name]
+       watermark_column = fact["watermark_column"]
+       key_columns = fact["key_columns"]
+
+       if not self.table_exists(table_name):
+           self.create_table(table_name, replace=False)
+           inserted = self.insert_from(source, table_name)
+       else:
+           self.extend_enums(source, table_name)
+           if not fixed_watermark:
+               watermark = self.get_watermark(table_name)
+           column_type = self.connection.execute(
+               "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = ?",
+               [table_name, watermark_column]).fetchone()[0]
+           key_match = " AND ".join(f"t.{col} = s.{col}" for col in key_columns)
+           columns = ", ".join(map(self.quote, self.table_schema(table_name)["columns"]))
+           select_list = self.select_list(table_name, alias="s")
+
+           inserted = self.execute(f"""
+               INSERT INTO {table_name} ({columns})
+               SELECT {select_list} FROM {source} s
+               WHERE ? IS NULL
+                  OR (s.{watermark_column} >= CAST(? AS {column_type})
+                      AND NOT EXISTS (
+                          SELECT 1 FROM {table_name} t
+                          WHERE t.{watermark_column} >= CAST(? AS {column_type}) AND {key_match}))
+               {self.cluster_order(table_name)}
+           """, [watermark, watermark, watermark], label=f"{table_name}_insert_incremental").fetchone()[0]
+
+       new_watermark = self.connection.execute(
+           f"SELECT CAST(MAX({watermark_column}) AS VARCHAR) FROM {table_name}").fetchone()[0]
+       self.connection.execute("""
+           INSERT OR REPLACE INTO etl_watermarks VALUES (?, ?, ?, ?, current_timestamp)
+       """, [table_name, watermark_column, new_watermark, inserted])
+
+       logger.info(f"Successfully appended {inserted} rows into {table_name} (watermark {new_watermark})")
+       return inserted
+
+   def load_all_data(self, transformed_data: Dict[str, pl.DataFrame] | Iterable[Tuple[str, pl.DataFrame]],
+                     batches: Optional[Dict[str, Iterable[pl.DataFrame]]] = None) -> bool:
        """
        Load all transformed data into the data warehouse
      
        Args:
-           transformed_data: Dictionary of transformed DataFrames
+           transformed_data: Dictionary of transformed DataFrames, or (table name, DataFrame) pairs
+                             as the transforms finish (DataTransformer.iter_transform_data): the
+                             dimensions are then loaded while the fact table is still being built
+           batches: Tables streamed batch by batch (fact_transactions in batched mode), written
+                    after every other table in the same transaction
          
        Returns:
            True if all data loaded successfully, False otherwise
@@ -289,38 +1146,63 @@ class DataLoader:
        if not self.connection:
            self.connect()
      
-       # Create schema first
-       self.create_schema()
-     
-       # ตรวจสอบว่าตารางถูกสร้างใน schema จริงหรือไม่
-       tables_in_schema = self.connection.sql("SELECT table_name FROM information_schema.tables WHERE table_schema = 'main';")
-       tables_in_schema.show()
-     
-     
+       tables = transformed_data.items() if isinstance(transformed_data, dict) else transformed_data
        success_count = 0
-       total_tables = len(transformed_data)
-     
-       # Load dimension tables first
-       dimension_tables = {k: v for k, v in transformed_data.items() if k.startswith("dim_")}
-     
-       for table_name, df in dimension_tables.items():
-           success = self.load_dataframe(df, table_name)
-           if success:
-               success_count += 1
-     
-       # Load fact tables
-       fact_tables = {k: v for k, v in transformed_data.items() if k.startswith("fact_")}
-     
-       for table_name, df in fact_tables.items():
-           if self.load_dataframe(df, table_name):
-               success_count += 1
-     
-       logger.info(f"Data loading complete: {success_count}/{total_tables} tables loaded successfully")
-       return success_count == total_tables
-
-
-
+       total_tables = 0
 
+       # Everything is written in one transaction: one commit and one checkpoint per run
+       self.connection.begin()
+       try:
+           # Create metadata tables and migrate old tables first (each data table is created right before it is written)
+           self.prepare_warehouse()
+         
+           # Load dimension tables first (as they arrive), fact tables are kept until every dimension is loaded
+           fact_tables = {}
+         
+           self.timings = {}
+           for table_name, df in tables:
+               total_tables += 1
+               if table_name.startswith("fact_"):
+                   fact_tables[table_name] = df
+               if not table_name.startswith("dim_"):
+                   continue
+               start = time.perf_counter()
+               success = self.load_dataframe(df, table_name)
+               self.timings[table_name] = time.perf_counter() - start
+               if success:
+                   success_count += 1
+               else:
+                   break
+         
+           # Load fact tables
+           if success_count == total_tables - len(fact_tables):
+               for table_name, df in fact_tables.items():
+                   start = time.perf_counter()
+                   success = self.load_dataframe(df, table_name)
+                   self.timings[table_name] = time.perf_counter() - start
+                   if success:
+                       success_count += 1
+                   else:
+                       break
 
+           # Load streamed tables last, one batch in memory at a time
+           if success_count == total_tables:
+               for table_name, stream in (batches or {}).items():
+                   start = time.perf_counter()
+                   self._load_batch_stream(stream, table_name)
+                   self.timings[table_name] = time.perf_counter() - start
+                   success_count += 1
+           total_tables += len(batches or {})
 
+           if success_count != total_tables:
+               raise RuntimeError(f"only {success_count}/{total_tables} tables could be loaded")
+           self.connection.commit()
+       except Exception as e:
+           self.rollback()
+           logger.error(f"Error loading data, rolled back: {str(e)}")
+           return False
 
+       self.bump_generation()
+       self.connection.execute("CHECKPOINT")
+       logger.info(f"Data loading complete: {success_count}/{total_tables} tables loaded successfully")
+       return True
@@ -0,0 +1,136 @@
+"""
+Opt-in profiling of a pipeline run
+
+Everything is written under <PROFILE_DIR>/<run_id>/:
+
+- polars/<table>.plan.txt   optimized Polars query plan of each transform
+- polars/<table>.dot        physical plan graph (render with graphviz: dot -Tsvg)
+- polars/timings.json       plan build and collect seconds per transform
+- duckdb/<n>_<label>.txt    EXPLAIN ANALYZE tree of each load statement (.json: full metrics)
+- cprofile/<stage>.prof     cProfile stats per stage (PROFILE_CPROFILE); open with pstats,
+                            snakeviz or turn into a flame graph with flameprof
+"""
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import re
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import polars as pl
+
+from src.config import config
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    """
+    Class for saving query plans, DuckDB statement profiles and cProfile stats of one run
+    """
+
+    def __init__(self, run_id: str, profile_dir: Optional[str] = None, cprofile: Optional[bool] = None):
+        """
+        Args:
+            run_id: Id of the run (RunReport.run_id); names the run directory
+            profile_dir: Root of the run directories (default config.PROFILE_DIR)
+            cprofile: Write cProfile stats per stage (default config.PROFILE_CPROFILE)
+        """
+        self.config = config()
+        self.run_dir = os.path.join(profile_dir or self.config.PROFILE_DIR, run_id)
+        self.cprofile = self.config.PROFILE_CPROFILE if cprofile is None else cprofile
+        self.statements = 0
+        os.makedirs(self.run_dir, exist_ok=True)
+        logger.info(f"Profiling this run into {self.run_dir}")
+
+    def _path(self, section: str, file_name: str) -> str:
+        directory = os.path.join(self.run_dir, section)
+        os.makedirs(directory, exist_ok=True)
+        # label มาจากชื่อตาราง/stage: ตัดอักขระที่ใช้เป็นชื่อไฟล์ไม่ได้
+        return os.path.join(directory, re.sub(r"[^\w.-]+", "_", file_name))
+
+    def _write(self, section: str, file_name: str, text: str):
+        with open(self._path(section, file_name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def attach(self, connection):
+        """Turn on DuckDB query profiling for a connection (the profile is read after each statement)"""
+        connection.execute("PRAGMA enable_profiling = 'no_output'")
+
+    def save_statement_profile(self, connection, label: str):
+        """
+        Save the profile of the statement the connection just ran (EXPLAIN ANALYZE tree and JSON)
+
+        A failure is logged and never fails the load.
+        """
+        self.statements += 1
+        name = f"{self.statements:04d}_{label}"
+        try:
+            self._write("duckdb", f"{name}.txt", connection.get_profiling_information(format="query_tree"))
+            self._write("duckdb", f"{name}.json", connection.get_profiling_information(format="json"))
+        except Exception as e:
+            logger.warning(f"Could not save the DuckDB profile of {label}: {e}")
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Run a stage under cProfile when enabled and save <name>.prof and a cumulative-time summary"""
+        if not self.cprofile:
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(self._path("cprofile", f"{name}.prof"))
+            with open(self._path("cprofile", f"{name}.txt"), "w", encoding="utf-8") as f:
+                pstats.Stats(profile, stream=f).sort_stats("cumulative").print_stats(50)
+
+    def profile_transforms(self, transformer, raw_data: Dict[str, pl.DataFrame | pl.LazyFrame]) -> dict:
+        """
+        Rebuild every transform lazily and save its optimized plan, physical plan graph and timings
+
+        Each plan is collected on its own (the pipeline collects them together), so collect_seconds
+        is the cost of that table alone. Polars 2.0 no longer reports per-node timings in-process
+        (LazyFrame.profile was removed), so the plan plus per-transform timing is what is kept.
+
+        Returns:
+            Dictionary of table name to {"build_seconds", "collect_seconds", "rows"}
+        """
+        engine = "streaming" if self.config.STREAMING_ENGINE else "auto"
+        timings = {}
+        for table_name, sources in transformer.TABLE_SOURCES.items():
+            if not all(source in raw_data for source in sources):
+                continue
+            try:
+                lazy_sources = {source: raw_data[source].lazy() for source in sources}
+                start = time.perf_counter()
+                plan = transformer.transform_table(table_name, lazy_sources)
+                build_seconds = time.perf_counter() - start
+                if isinstance(plan, pl.DataFrame):  # e.g. an empty dim_date
+                    plan = plan.lazy()
+
+                self._write("polars", f"{table_name}.plan.txt", plan.explain(optimized=True, engine=engine))
+                self._write("polars", f"{table_name}.dot",
+                            plan.show_graph(raw_output=True, show=False, plan_stage="physical", engine=engine))
+                start = time.perf_counter()
+                rows = len(plan.collect(engine=engine))
+                timings[table_name] = {
+                    "build_seconds": round(build_seconds, 4),
+                    "collect_seconds": round(time.perf_counter() - start, 4),
+                    "rows": rows,
+                }
+            except Exception as e:
+                logger.warning(f"Could not profile the transform of {table_name}: {e}")
+
+        self._write("polars", "timings.json", json.dumps(timings, indent=2))
+        return timings
@@ -0,0 +1,265 @@
+"""
+Run report of the ETL pipeline
+
+Records, per stage and per table, wall and CPU time, input and output row counts, bytes read
+and written and peak RSS. Each run is written as a JSON file and appended to the etl_runs
+table, so slowdowns can be followed across runs as the data grows.
+"""
+
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from src.config import config
+
+try:
+    import psutil
+except ImportError:  # /proc/self/statm is read instead
+    psutil = None
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (None when it cannot be read)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def file_size(*paths) -> Optional[int]:
+    """Total size in bytes of the paths that exist (None when none does)"""
+    sizes = [os.path.getsize(path) for path in paths if path and os.path.exists(path)]
+    return sum(sizes) if sizes else None
+
+
+class PeakMemorySampler:
+    """
+    Context manager sampling the RSS in a background thread; peak is the highest value seen
+
+    Polars and DuckDB allocate outside the Python heap, so tracemalloc would miss most of it.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class RunReport:
+    """
+    Class for collecting the metrics of one pipeline run
+
+    Every record has the same fields: stage, table_name (None for the whole stage), status,
+    wall_seconds, cpu_seconds, rows_in, rows_out, bytes_read, bytes_written, peak_rss_bytes.
+    Stage records are measured with stage(); table records are added with add_table() from the
+    per-table timings the extractor, transformer and loaders keep.
+
+    bytes_read is the CSV size for extract and the in-memory frame size for load; bytes_written
+    is the growth of the warehouse file for load stages and the Parquet bytes for export.
+    """
+
+    FIELDS = ["stage", "table_name", "status", "wall_seconds", "cpu_seconds", "rows_in", "rows_out",
+              "bytes_read", "bytes_written", "peak_rss_bytes"]
+
+    def __init__(self, engine: Optional[str] = None, settings: Optional[dict] = None):
+        """
+        Args:
+            engine: Transform engine of the run
+            settings: Configuration worth keeping with the report (load modes, batching, ...)
+        """
+        self.config = config()
+        self.started_at = datetime.now()
+        self.run_id = f"{self.started_at:%Y%m%d_%H%M%S_%f}_{uuid.uuid4().hex[:8]}"
+        self.engine = engine
+        self.settings = settings or {}
+        self.records: List[dict] = []
+        # Profiler (src.etl.profiling) running every stage under cProfile when enabled
+        self.profiler = None
+        # Per-table timing of the transform task graph (DataTransformer.task_timings), JSON only
+        self.tasks = {}
+        self.finished_at = None
+        self.status = None
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def _record(self, stage: str, table_name: Optional[str] = None, **metrics) -> dict:
+        record = {field: None for field in self.FIELDS}
+        record.update(stage=stage, table_name=table_name, status="ok")
+        record.update(metrics)
+        for field in ("wall_seconds", "cpu_seconds"):
+            if record[field] is not None:
+                record[field] = round(record[field], 4)
+        self.records.append(record)
+        return record
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[dict]:
+        """
+        Measure a stage; the caller fills rows/bytes in the yielded record and sets
+        record["status"] = "failed" when the stage returned a failure
+
+        An exception marks the stage failed and is re-raised.
+        """
+        record = self._record(name)
+        sampler = PeakMemorySampler()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            with sampler, (self.profiler.stage(name) if self.profiler else nullcontext()):
+                yield record
+        except Exception:
+            record["status"] = "failed"
+            raise
+        finally:
+            record["wall_seconds"] = round(time.perf_counter() - wall_start, 4)
+            record["cpu_seconds"] = round(time.process_time() - cpu_start, 4)
+            record["peak_rss_bytes"] = sampler.peak
+            logger.info(f"⏱️ {name}: {record['wall_seconds']:.3f}s wall, {record['cpu_seconds']:.3f}s cpu, "
+                        f"peak RSS {(sampler.peak or 0) / 2**20:.0f} MiB")
+
+    def add_table(self, stage: str, table_name: str, **metrics) -> dict:
+        """Add the metrics of one table in a stage (wall_seconds, rows_in, rows_out, bytes_read, ...)"""
+        return self._record(stage, table_name, **metrics)
+
+    def add_tables(self, stage: dict, tables: Dict[str, dict]):
+        """
+        Add one record per table to a stage and total their rows and bytes into the stage record
+
+        Args:
+            stage: Record yielded by stage()
+            tables: Dictionary of table name to metrics
+        """
+        for table_name, metrics in tables.items():
+            self.add_table(stage["stage"], table_name, **metrics)
+        for field in ("rows_in", "rows_out", "bytes_read", "bytes_written"):
+            values = [metrics[field] for metrics in tables.values() if metrics.get(field) is not None]
+            if values and stage[field] is None:
+                stage[field] = sum(values)
+
+    def finish(self, success: bool):
+        """Close the run: status and the whole-run record"""
+        self.finished_at = datetime.now()
+        self.status = "ok" if success else "failed"
+        # ru_maxrss เป็น kB บน Linux
+        self._record("pipeline", status=self.status,
+                     wall_seconds=round(time.perf_counter() - self._wall_start, 4),
+                     cpu_seconds=round(time.process_time() - self._cpu_start, 4),
+                     peak_rss_bytes=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+            "status": self.status,
+            "engine": self.engine,
+            "settings": self.settings,
+            "records": self.records,
+            "tasks": self.tasks,
+        }
+
+    def save_json(self, report_dir: Optional[str] = None) -> str:
+        """
+        Write the report as <report_dir>/<run_id>.json (default config.RUN_REPORT_DIR)
+
+        Returns:
+            Path of the file
+        """
+        report_dir = report_dir or self.config.RUN_REPORT_DIR
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"{self.run_id}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def create_runs_table(connection):
+        """Create the table holding the records of every run"""
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS etl_runs (
+                run_id VARCHAR,
+                started_at TIMESTAMP,
+                engine VARCHAR,
+                seq INTEGER,
+                stage VARCHAR,
+                table_name VARCHAR,
+                status VARCHAR,
+                wall_seconds DOUBLE,
+                cpu_seconds DOUBLE,
+                rows_in BIGINT,
+                rows_out BIGINT,
+                bytes_read BIGINT,
+                bytes_written BIGINT,
+                peak_rss_bytes BIGINT
+            )
+        """)
+
+    def save_table(self, connection):
+        """Append the records of this run to etl_runs"""
+        self.create_runs_table(connection)
+        connection.executemany(
+            f"INSERT INTO etl_runs VALUES (?, ?, ?, ?, {', '.join('?' for _ in self.FIELDS)})",
+            [[self.run_id, self.started_at, self.engine, seq] + [record[field] for field in self.FIELDS]
+             for seq, record in enumerate(self.records)])
+
+    def save(self, loader=None) -> Optional[str]:
+        """
+        Write the JSON file and, when a loader is given, the etl_runs rows
+
+        A failure here is logged and does not fail the pipeline.
+
+        Returns:
+            Path of the JSON file, or None if it could not be written
+        """
+        path = None
+        try:
+            path = self.save_json()
+            logger.info(f"Run report written to {path}")
+        except Exception as e:
+            logger.error(f"Error writing run report: {str(e)}")
+        if loader is not None:
+            try:
+                if not loader.connection:
+                    loader.connect()
+                self.save_table(loader.connection)
+                logger.info(f"Run {self.run_id} recorded in etl_runs ({len(self.records)} rows)")
+            except Exception as e:
+                logger.error(f"Error recording run in etl_runs: {str(e)}")
+        return path
@@ -0,0 +1,141 @@
+"""
+Memory and thread limits of the pipeline
+
+MAX_MEMORY_GB is split between DuckDB and Polars: DuckDB gets memory_limit, threads and a
+temp_directory (SPILL_DIR), so sorts, joins and the clustering rewrite spill to disk instead
+of growing past its share. Polars gets the rest for the frames it holds. Polars has no memory
+limit of its own, so its share is enforced through how much it reads at once: lazy plans are
+collected with the streaming engine in chunks sized to the budget, its thread pool is sized from
+THREAD_COUNT when it is imported (see src.config), and when the source files would not fit,
+transactions.csv is read, transformed and loaded in batches (BATCHED_TRANSACTIONS) sized to
+the budget.
+"""
+
+import logging
+import os
+from typing import List, Optional
+
+import polars as pl
+
+from src.config import config
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class ResourceGovernor:
+    """
+    Class for applying the memory budget and thread count to DuckDB connections and Polars work
+    """
+
+    # Share of the budget DuckDB may use; the rest is left to the Polars frames it loads from
+    DUCKDB_SHARE = 0.5
+    # Peak memory of reading and transforming a CSV eagerly, as a multiple of the file size
+    # (about 4x for extract and 5x with the fact transform at 1M transactions)
+    MEMORY_EXPANSION = 5
+    # Share of the Polars budget one batch may use in chunked mode
+    BATCH_SHARE = 0.25
+    # Bytes read from the start of a CSV to estimate its row size
+    SAMPLE_BYTES = 1 << 20
+    # Fewest rows per batch or streaming chunk, however small the budget
+    MIN_BATCH_ROWS = 100
+
+    def __init__(self, max_memory_gb: Optional[float] = None, threads: Optional[int] = None):
+        """
+        Args:
+            max_memory_gb: Memory budget (default config.MAX_MEMORY_GB, None = no limit)
+            threads: Threads for DuckDB and Polars (default config.THREAD_COUNT, None = all cores)
+        """
+        self.config = config()
+        max_memory_gb = max_memory_gb or self.config.MAX_MEMORY_GB
+        self.memory_budget = int(max_memory_gb * 2**30) if max_memory_gb else None
+        self.threads = threads or self.config.THREAD_COUNT
+        self.spill_dir = self.config.SPILL_DIR
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory_budget is not None
+
+    @property
+    def duckdb_memory(self) -> Optional[int]:
+        return int(self.memory_budget * self.DUCKDB_SHARE) if self.enabled else None
+
+    @property
+    def polars_memory(self) -> Optional[int]:
+        return self.memory_budget - self.duckdb_memory if self.enabled else None
+
+    def configure_duckdb(self, connection):
+        """Set memory_limit, threads and temp_directory on a DuckDB connection"""
+        settings = {}
+        if self.enabled:
+            settings["memory_limit"] = f"{self.duckdb_memory // 2**20}MB"
+            # in-memory connections only spill once a temp_directory is set
+            settings["temp_directory"] = self.spill_dir
+        if self.threads:
+            settings["threads"] = self.threads
+        for name, value in settings.items():
+            connection.execute(f"SET {name} = '{value}'")
+        if settings:
+            logger.debug(f"DuckDB limits: {settings}")
+
+    def estimated_memory(self, table_name: str) -> int:
+        """Peak memory of extracting and transforming a source eagerly (0 when the file is missing)"""
+        path = self.config.get_csv_path(table_name)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) * self.MEMORY_EXPANSION
+
+    def exceeds_budget(self, tables: Optional[List[str]] = None) -> bool:
+        """
+        True when the sources would not fit in the Polars share of the budget if read at once
+
+        Args:
+            tables: Sources that are read together (default every table in config.CSV_FILES)
+        """
+        if not self.enabled:
+            return False
+        needed = sum(self.estimated_memory(name) for name in tables or self.config.CSV_FILES)
+        if needed > self.polars_memory:
+            logger.warning(f"Sources need about {needed / 2**30:.2f} GB in memory, more than the "
+                           f"{self.polars_memory / 2**30:.2f} GB left to Polars by MAX_MEMORY_GB")
+            return True
+        return False
+
+    def row_bytes(self, table_name: str) -> float:
+        """Average bytes per row of a source CSV, from its first SAMPLE_BYTES (0 when the file is missing)"""
+        path = self.config.get_csv_path(table_name)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            sample = f.read(self.SAMPLE_BYTES)
+        return len(sample) / max(sample.count(b"\n"), 1)
+
+    def batch_rows(self, table_name: str) -> int:
+        """
+        Rows per batch so that one batch stays within BATCH_SHARE of the Polars budget, but at least
+        MIN_BATCH_ROWS (config.BATCH_SIZE without a budget)
+        """
+        row_bytes = self.row_bytes(table_name)
+        if not self.enabled or not row_bytes:
+            return self.config.BATCH_SIZE
+        rows = int(self.polars_memory * self.BATCH_SHARE / (row_bytes * self.MEMORY_EXPANSION))
+        return max(rows, self.MIN_BATCH_ROWS)
+
+    def configure_polars(self) -> Optional[int]:
+        """
+        Size the chunks of the Polars streaming engine so that the chunks all threads hold at once
+        stay within a batch of transactions.csv (nothing is changed without a budget)
+
+        Returns:
+            Rows per streaming chunk, or None without a budget
+        """
+        if not self.enabled:
+            return None
+        threads = self.threads or os.cpu_count() or 1
+        rows = max(self.batch_rows("transactions") // threads, self.MIN_BATCH_ROWS)
+        pl.Config.set_streaming_chunk_size(rows)
+        logger.debug(f"Polars streaming chunks: {rows} rows")
+        return rows
@@ -0,0 +1,138 @@
+"""
+Dependency-aware task scheduling
+
+A TaskGraph runs named tasks on a thread pool as soon as everything they depend on has
+finished, so independent steps (e.g. the dimension transforms) use the cores that a single
+long step (the fact transform) leaves idle. Polars and DuckDB release the GIL while they work,
+so threads give real parallelism here.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.config import config
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class TaskGraph:
+    """
+    Class for running tasks in dependency order, independent ones concurrently
+
+    A task is a callable taking one argument: a dictionary of the results of its dependencies.
+    Dependencies are other tasks or inputs given to run(). After a run, timings holds per task:
+    - ready_at:    seconds from the start of the run until its dependencies were done
+    - started_at:  seconds from the start of the run until a worker picked it up
+    - seconds:     how long it ran
+    - thread:      worker thread it ran on
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Args:
+            max_workers: Tasks running at the same time (1 = one after another in the order added)
+        """
+        self.max_workers = max_workers or 1
+        # name -> (callable, dependencies), in the order added
+        self.tasks: Dict[str, Tuple[Callable[[Dict[str, Any]], Any], List[str]]] = {}
+        self.timings: Dict[str, dict] = {}
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Any], depends_on: Iterable[str] = ()):
+        if name in self.tasks:
+            raise ValueError(f"Task {name} is already in the graph")
+        self.tasks[name] = (func, list(depends_on))
+
+    def order(self, inputs: Iterable[str] = ()) -> List[str]:
+        """
+        Tasks in an order that respects every dependency (stable for independent tasks)
+
+        Raises:
+            ValueError: A dependency is neither a task nor an input, or the tasks form a cycle
+        """
+        available = set(inputs)
+        for name, (_, depends_on) in self.tasks.items():
+            missing = [dep for dep in depends_on if dep not in self.tasks and dep not in available]
+            if missing:
+                raise ValueError(f"Task {name} depends on unknown {missing}")
+
+        ordered = []
+        remaining = list(self.tasks)
+        while remaining:
+            ready = [name for name in remaining
+                     if all(dep in available for dep in self.tasks[name][1])]
+            if not ready:
+                raise ValueError(f"Tasks {remaining} form a dependency cycle")
+            ordered.extend(ready)
+            available.update(ready)
+            remaining = [name for name in remaining if name not in ready]
+        return ordered
+
+    def _run_task(self, name: str, arguments: Dict[str, Any], run_start: float, ready_at: float):
+        started = time.perf_counter()
+        try:
+            return self.tasks[name][0](arguments)
+        finally:
+            self.timings[name] = {
+                "ready_at": round(ready_at - run_start, 4),
+                "started_at": round(started - run_start, 4),
+                "seconds": round(time.perf_counter() - started, 4),
+                "thread": threading.current_thread().name,
+            }
+
+    def run(self, inputs: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Run every task; results are yielded as (name, result) in the order the tasks finish
+
+        Tasks waiting on a result are started before it is yielded, so the consumer can work on
+        it (e.g. load it) while the remaining tasks keep running. A failed task does not stop the
+        tasks that do not depend on it: they still run and are yielded, then its exception is raised.
+
+        Args:
+            inputs: Results that are available from the start (e.g. the raw sources)
+        """
+        results = dict(inputs or {})
+        pending = self.order(results)
+        self.timings = {}
+        run_start = time.perf_counter()
+
+        errors = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="task") as executor:
+            running = {}
+
+            def submit_ready():
+                for name in [n for n in pending if all(dep in results for dep in self.tasks[n][1])]:
+                    pending.remove(name)
+                    arguments = {dep: results[dep] for dep in self.tasks[name][1]}
+                    running[executor.submit(self._run_task, name, arguments, run_start, time.perf_counter())] = name
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                finished = []
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        # งานที่ขึ้นกับ task นี้จะไม่ถูกเริ่ม
+                        logger.error(f"Task {name} failed: {e}")
+                        errors[name] = e
+                        continue
+                    finished.append(name)
+                    logger.debug(f"Task {name} finished in {self.timings[name]['seconds']:.3f}s")
+                # งานที่รอผลนี้เริ่มได้ก่อนส่งผลให้ผู้เรียก
+                submit_ready()
+                for name in finished:
+                    yield name, results[name]
+
+        if errors:
+            if pending:
+                logger.error(f"Not run because a dependency failed: {', '.join(pending)}")
+            raise next(iter(errors.values()))
@@ -0,0 +1,202 @@
+"""
+Blue/green snapshots of the warehouse
+
+In snapshot mode the pipeline never writes the database readers have open. Each load starts
+from a copy of the published snapshot in SNAPSHOT_DIR (so incremental, upsert and scd2 loads
+see the previous state), is checkpointed, and is then published by atomically replacing the
+DATABASE_PATH symlink. Readers opening DATABASE_PATH read-only keep working during the load and
+switch to the new snapshot on their next connection. A failed load deletes its snapshot and
+leaves the published one untouched.
+"""
+
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import List, Optional
+
+import duckdb as dd
+
+from src.config import config
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class SnapshotManager:
+    """
+    Class for loading into a new snapshot file, publishing it and keeping the last snapshots
+    """
+
+    EXTENSION = ".duckdb"
+
+    def __init__(self, loader, snapshot_dir: Optional[str] = None, retention: Optional[int] = None):
+        """
+        Args:
+            loader: DataLoader that is pointed at the snapshot being loaded
+            snapshot_dir: Directory of the snapshot files (default config.SNAPSHOT_DIR, or
+                          <directory of DATABASE_PATH>/snapshots)
+            retention: Snapshots kept besides the published one (default config.SNAPSHOT_RETENTION)
+        """
+        self.config = config()
+        self.loader = loader
+        self.live_path = str(self.config.DATABASE_PATH)
+        self.snapshot_dir = snapshot_dir or self.config.SNAPSHOT_DIR or os.path.join(
+            os.path.dirname(os.path.abspath(self.live_path)), "snapshots")
+        self.retention = self.config.SNAPSHOT_RETENTION if retention is None else retention
+        # Snapshot being loaded (None outside begin() .. publish()/discard())
+        self.path = None
+
+    def current(self) -> Optional[str]:
+        """File readers currently resolve DATABASE_PATH to (None before the first load)"""
+        if not os.path.lexists(self.live_path):
+            return None
+        return os.path.realpath(self.live_path)
+
+    def snapshots(self) -> List[str]:
+        """Snapshot files, oldest first (names start with a timestamp)"""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return [os.path.join(self.snapshot_dir, name) for name in sorted(os.listdir(self.snapshot_dir))
+                if name.endswith(self.EXTENSION)]
+
+    @staticmethod
+    def _remove(path: str):
+        for file_path in (path, f"{path}.wal"):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def _adopt(self) -> str:
+        """
+        Move a warehouse written before snapshot mode (a regular file at DATABASE_PATH) into the
+        snapshot directory as a copy; the file itself is replaced by the symlink on publish
+        """
+        if os.path.exists(f"{self.live_path}.wal"):
+            # เขียน WAL ที่ค้างอยู่ลงไฟล์ก่อน copy
+            connection = dd.connect(self.live_path)
+            connection.execute("CHECKPOINT")
+            connection.close()
+        modified = datetime.fromtimestamp(os.path.getmtime(self.live_path))
+        path = os.path.join(self.snapshot_dir, f"{modified:%Y%m%d_%H%M%S}_adopted{self.EXTENSION}")
+        shutil.copyfile(self.live_path, path)
+        logger.info(f"Kept the existing warehouse as snapshot {path}")
+        return path
+
+    def begin(self, snapshot_id: str) -> str:
+        """
+        Create the snapshot of this load from the published one and point the loader at it
+
+        Args:
+            snapshot_id: Name of the snapshot (the run id, so names sort by time)
+
+        Returns:
+            Path of the new snapshot file
+        """
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        self.loader.disconnect()
+        source = self.current()
+        if source is not None and not os.path.islink(self.live_path):
+            source = self._adopt()
+
+        path = os.path.join(self.snapshot_dir, f"{snapshot_id}{self.EXTENSION}")
+        self._remove(path)
+        if source is not None:
+            # snapshot ที่ publish แล้วถูก checkpoint ไว้ ไม่มี WAL
+            shutil.copyfile(source, path)
+        self.path = path
+        self.loader.db_path = path
+        self.loader.defer_generation = True
+        logger.info(f"Loading into snapshot {path}" + (f" (copy of {source})" if source else ""))
+        return path
+
+    def _swap(self, path: str):
+        """Atomically point DATABASE_PATH at a snapshot file"""
+        live_dir = os.path.dirname(os.path.abspath(self.live_path))
+        tmp_link = f"{self.live_path}.swap"
+        if os.path.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(os.path.relpath(path, live_dir), tmp_link)
+        os.replace(tmp_link, self.live_path)
+
+    def _release(self):
+        self.loader.disconnect()
+        self.loader.db_path = self.live_path
+        self.loader.defer_generation = False
+        self.path = None
+
+    def publish(self) -> bool:
+        """
+        Checkpoint the loaded snapshot, make it the one readers open and drop old snapshots
+
+        Returns:
+            True if the snapshot was published (on failure it is discarded)
+        """
+        if self.path is None:
+            logger.error("No snapshot is being loaded")
+            return False
+        path = self.path
+        try:
+            if not self.loader.connection:
+                self.loader.connect()
+            self.loader.connection.execute("CHECKPOINT")
+            self.loader.disconnect()
+            self._swap(path)
+        except Exception as e:
+            logger.error(f"Error publishing snapshot {path}: {str(e)}")
+            self.discard()
+            return False
+
+        self._release()
+        self.loader.bump_generation()
+        logger.info(f"Published snapshot {path}")
+        self.prune()
+        return True
+
+    def discard(self):
+        """Delete the snapshot of a failed load; readers keep the published one"""
+        path = self.path
+        self._release()
+        if path is not None and path != self.current():
+            self._remove(path)
+            logger.info(f"Discarded snapshot {path}, {self.current()} stays published")
+
+    def prune(self) -> List[str]:
+        """
+        Delete all but the last `retention` snapshots before the published one
+
+        Returns:
+            Paths of the deleted snapshots
+        """
+        current = self.current()
+        older = [path for path in self.snapshots() if os.path.realpath(path) != current]
+        removed = older[:max(len(older) - self.retention, 0)]
+        for path in removed:
+            # reader ที่เปิดไฟล์ค้างไว้ยังอ่านต่อได้ (unlink บน POSIX)
+            self._remove(path)
+            logger.info(f"Removed old snapshot {path}")
+        return removed
+
+    def rollback(self) -> Optional[str]:
+        """
+        Publish the snapshot before the current one again (e.g. after a bad load)
+
+        Returns:
+            Path of the snapshot now published, or None if there is none to go back to
+        """
+        current = self.current()
+        snapshots = [os.path.realpath(path) for path in self.snapshots()]
+        previous = [path for path in snapshots if path < (current or "")]
+        if not previous:
+            logger.error("No earlier snapshot to roll back to")
+            return None
+        try:
+            self._swap(previous[-1])
+        except Exception as e:
+            logger.error(f"Error rolling back to {previous[-1]}: {str(e)}")
+            return None
+        self.loader.bump_generation()
+        logger.info(f"Rolled back from {current} to {previous[-1]}")
+        return previous[-1]
@@ -5,10 +5,14 @@ Data transformation module for creating dimensional model
 
 from duckdb import df
 import polars as pl
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+import functools
+import hashlib
+import inspect
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from src.config import config
+from src.etl.scheduler import TaskGraph
 import polars as pl
 
 
@@ -19,14 +23,58 @@ logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
                    )
 logger = logging.getLogger(__name__)
 
+# ทุก transform_* รับได้ทั้ง DataFrame (eager) และ LazyFrame (lazy mode)
+Frame = pl.DataFrame | pl.LazyFrame
+
 
 class DataTransformer:
+   # Raw sources (keys of config.CSV_FILES) each warehouse table is built from
+   TABLE_SOURCES = {
+       "dim_customers": ["customers"],
+       "dim_discounts": ["discounts"],
+       "dim_employees": ["employees"],
+       "dim_products": ["products"],
+       "dim_stores": ["stores"],
+       "dim_date": ["transactions"],
+       "fact_transactions": ["transactions", "exchange_rates"],
+   }
+   # Intermediate tasks of the task graph: name -> (method, raw source). Their results are shared
+   # inputs of the table tasks (see task_graph), e.g. the rates are prepared once for the fact table
+   PREPARE_TASKS = {
+       "exchange_rates_usd": ("prepare_exchange_rates", "exchange_rates"),
+       "transaction_dates": ("date_bounds", "transactions"),
+   }
+   # Inputs of the table tasks that differ from TABLE_SOURCES (eager mode; in lazy mode dim_date
+   # is planned over the transactions scan itself, see plan_date_dimension)
+   TABLE_INPUTS = {
+       "dim_date": ["transaction_dates"],
+       "fact_transactions": ["transactions", "exchange_rates_usd"],
+   }
+   # Methods whose code builds each warehouse table (the table's code version, see code_version)
+   TABLE_TRANSFORMS = {
+       "dim_customers": ["standardize_column_names", "transform_customers"],
+       "dim_discounts": ["standardize_column_names", "transform_discounts"],
+       "dim_employees": ["standardize_column_names", "transform_employees"],
+       "dim_products": ["standardize_column_names", "transform_products"],
+       "dim_stores": ["standardize_column_names", "transform_stores"],
+       "dim_date": ["standardize_column_names", "date_bounds", "create_date_dimension", "plan_date_dimension",
+                    "date_attributes", "date_key", "get_fiscal_quarter", "calendar_names"],
+       "fact_transactions": ["standardize_column_names", "transform_transactions_fact",
+                             "prepare_exchange_rates", "date_key"],
+   }
+
    def __init__(self):
        self.config = config()
+       # (first, last) date of the persisted dim_date, set by the pipeline before transforming
+       self.loaded_dates = None
+       # เวลาที่ใช้ build แต่ละตาราง (วินาที) ของ transform_all_data ครั้งล่าสุด
+       self.timings = {}
+       # ready/start/duration/thread ของแต่ละตารางใน task graph (TaskGraph.timings)
+       self.task_timings = {}
        # self.transformed_data = {}
 
 
-   def standardize_column_names(self, df: pl.DataFrame) -> pl.DataFrame:
+   def standardize_column_names(self, df: Frame) -> Frame:
        """
        Standardize column names by converting to lowercase and replacing spaces and hyphens with underscores.
       
@@ -35,12 +83,14 @@ class DataTransformer:
        Returns:
            DataFrame with standardized column names   
        """
-       new_columns = [col.lower().replace(' ', '_').replace('-', '_') for col in df.columns]
-       return df.rename(dict(zip(df.columns, new_columns)))   
+       # collect_schema() ใช้ได้ทั้ง DataFrame และ LazyFrame โดยไม่ต้องอ่านข้อมูล
+       columns = df.collect_schema().names()
+       new_columns = [col.lower().replace(' ', '_').replace('-', '_') for col in columns]
+       return df.rename(dict(zip(columns, new_columns)))   
           
 
 
-   def transform_customers(self,df: pl.DataFrame) -> pl.DataFrame:
+   def transform_customers(self,df: Frame) -> Frame:
        """Transform customers data into dimension table
            1. select columns `id` (rename to `customer_id`), `company` (rename to `company_name`)
                `first_name`, `last_name`, `email_address`, `job_title`, `business_phone`
@@ -88,7 +138,7 @@ class DataTransformer:
 
    
   
-   def transform_discounts(self,df: pl.DataFrame) -> pl.DataFrame:
+   def transform_discounts(self,df: Frame) -> Frame:
        """
        Transform employees data into dimension table
        1. select columns `id` (rename to `employee_key`), `company`, `first_name`, `last_name`
@@ -123,7 +173,7 @@ class DataTransformer:
       
        return dim_discounts
   
-   def transform_employees(self, df: pl.DataFrame) -> pl.DataFrame:
+   def transform_employees(self, df: Frame) -> Frame:
        """Transform products data into dimension table
            1. select columns `id` (rename to `product_key`), `product_code`, `product_name`,
            `description`, `category`, `standard_cost`, `list_price`, `quantity_per_unit`,
@@ -152,7 +202,7 @@ class DataTransformer:
       
        return dim_employees
   
-   def transform_products(self, df: pl.DataFrame) -> pl.DataFrame:
+   def transform_products(self, df: Frame) -> Frame:
        """Transform suppliers data into dimension table
            1. select columns `id` (rename to `supplier_key`), `company`, `first_name`, `last_name`
                , `email_address`, `job_title`, `business_phone`, `city`, `state_province`,
@@ -192,7 +242,7 @@ class DataTransformer:
       
        return dim_products
   
-   def transform_stores(self, df: pl.DataFrame) -> pl.DataFrame:
+   def transform_stores(self, df: Frame) -> Frame:
        """Transform suppliers data into dimension table
            1. select columns `id` (rename to `supplier_key`), `company`, `first_name`, `last_name`
                , `email_address`, `job_title`, `business_phone`, `city`, `state_province`,
@@ -227,6 +277,18 @@ class DataTransformer:
       
        return dim_stores
   
+   def date_key(self, column: str) -> pl.Expr:
+       """
+       Integer surrogate date key YYYYMMDD (e.g. 2024-03-15 -> 20240315)
+
+
+       Sorts in calendar order and is much cheaper to join, sort and prune than a string key.
+       """
+       date = pl.col(column)
+       return (date.dt.year().cast(pl.Int32) * 10000
+               + date.dt.month().cast(pl.Int32) * 100
+               + date.dt.day().cast(pl.Int32))
+
    def get_fiscal_quarter(self,start_month: int) -> pl.Expr:
        """
        Returns a Polars expression to calculate the fiscal quarter.
@@ -245,48 +307,127 @@ class DataTransformer:
        ) + 1
 
 
-   def create_date_dimension(self) -> pl.DataFrame:
+   @staticmethod
+   @functools.lru_cache(maxsize=None)
+   def calendar_names() -> Tuple[Dict[int, str], Dict[int, str]]:
+       """
+       Month names by month number and day names by ISO weekday (Monday = 1)
+
+       strftime runs once on 12 + 7 dates per process instead of twice per dimension row.
+       """
+       months = pl.date_range(date(2024, 1, 1), date(2024, 12, 1), interval="1mo", eager=True)
+       days = pl.date_range(date(2024, 1, 1), date(2024, 1, 7), interval="1d", eager=True)  # Monday .. Sunday
+       month_names = dict(zip(months.dt.month().to_list(), months.dt.strftime("%B").to_list()))
+       day_names = dict(zip(days.dt.weekday().to_list(), days.dt.strftime("%A").to_list()))
+       return month_names, day_names
+
+   def date_bounds(self, transactions: Frame) -> Optional[Tuple[date, date]]:
+       """
+       First and last transaction date (only the date column is read in lazy mode)
+
+       Returns:
+           (min date, max date) or None when there are no transactions
        """
-       Create a date dimension table
-       1. generate date range from 2015-01-01 to 2025-12-31
+       transactions = self.standardize_column_names(transactions)
+       bounds = transactions.select(
+           pl.col("date").cast(pl.Date).min().alias("start"),
+           pl.col("date").cast(pl.Date).max().alias("end"),
+       )
+       if isinstance(bounds, pl.LazyFrame):
+           bounds = bounds.collect()
+       start, end = bounds.row(0)
+       if start is None:
+           return None
+       return start, end
+
+   def create_date_dimension(self, start: Optional[date], end: Optional[date],
+                             loaded: Optional[Tuple[date, date]] = None) -> pl.DataFrame:
+       """
+       Create the rows of the date dimension that are not loaded yet
+       1. generate the dates from start to end that fall outside the loaded range
        2. create columns date_key, date, year, quarter, month, month_name
        day, day_of_week, day_name, week_of_year, is_weekend
        3. create fiscal_quarter based on the fiscal year starting in October
+
+
+       Args:
+       start: First date needed (e.g. the first transaction date), None when no date is needed
+       end: Last date needed
+       loaded: (first, last) date already in the warehouse dim_date, see DataLoader.get_date_range
+
+
+       Returns:
+       DataFrame with only the missing dates (empty when everything is loaded)
        """
-       logger.info("Creating date dimension")
+       logger.info(f"Creating date dimension for {start} .. {end}")
 
 
-       # Generate date range
-       date_range = pl.date_range(
-       start=pl.datetime(2023, 1, 1),
-       end=pl.datetime(2025, 12, 31),
-       interval="1d",
-       eager=True
-       )
+       # The loaded dimension is contiguous, so only dates before or after it are missing
+       ranges = [(start, end)] if start is not None else []
+       if start is not None and loaded is not None:
+           first, last = loaded
+           ranges = [(start, min(end, first - timedelta(days=1))),
+                     (max(start, last + timedelta(days=1)), end)]
+       dates = [pl.date_range(lo, hi, interval="1d", eager=True) for lo, hi in ranges if lo <= hi]
+       date_range = pl.concat(dates) if dates else pl.Series("date", [], dtype=pl.Date)
+
+       dim_date = self.date_attributes(pl.DataFrame({"date": date_range}))
+       logger.info(f"Created date dimension with {len(dim_date)} new records")
+       return dim_date
+
+   def plan_date_dimension(self, transactions: pl.LazyFrame,
+                           loaded: Optional[Tuple[date, date]] = None) -> pl.LazyFrame:
+       """
+       Lazy version of create_date_dimension over the transactions scan (lazy mode)
+
+       The first and last transaction date are an aggregate inside the plan, so collect_all reads
+       the transactions once for both dim_date and fact_transactions.
 
 
-       # Create date dimension with additional attributes
-       dim_date = pl.DataFrame({
-               "date": date_range,
-               "year": date_range.dt.year(),
-               "quarter": date_range.dt.quarter(),
-               "month": date_range.dt.month(),
-               "month_name": date_range.dt.strftime("%B"),
-               "day": date_range.dt.day(),
-               "day_of_week": date_range.dt.weekday(),
-               "day_name": date_range.dt.strftime("%A"),
-               "week_of_year": date_range.dt.week(),
-               "is_weekend": date_range.dt.weekday().is_in([6, 7])
-       }).with_columns(pl.col("date").dt.strftime("%d%m%Y").alias("date_key")
+       Args:
+       transactions: Raw transactions LazyFrame (the same one the fact table is planned on)
+       loaded: (first, last) date already in the warehouse dim_date
+
+
+       Returns:
+       LazyFrame of the missing dates
+       """
+       day = pl.col("date").cast(pl.Date)
+       dates = (
+           self.standardize_column_names(transactions)
+           .select(pl.date_ranges(day.min(), day.max(), interval="1d").alias("date"))
+           .explode("date")
+           # no transactions: the range is null
+           .filter(pl.col("date").is_not_null())
+       )
+       if loaded is not None:
+           first, last = loaded
+           dates = dates.filter((pl.col("date") < first) | (pl.col("date") > last))
+       return self.date_attributes(dates)
+
+   def date_attributes(self, dates: Frame) -> Frame:
+       """
+       Add the calendar attributes and the date key to a frame of dates (DataFrame or LazyFrame)
+       """
+       # Create date dimension with additional attributes (names come from the cached lookup)
+       month_names, day_names = self.calendar_names()
+       dim_date = dates.with_columns(
+               pl.col("date").dt.year().alias("year"),
+               pl.col("date").dt.quarter().alias("quarter"),
+               pl.col("date").dt.month().alias("month"),
+               pl.col("date").dt.month().replace_strict(month_names, return_dtype=pl.String).alias("month_name"),
+               pl.col("date").dt.day().alias("day"),
+               pl.col("date").dt.weekday().alias("day_of_week"),
+               pl.col("date").dt.weekday().replace_strict(day_names, return_dtype=pl.String).alias("day_name"),
+               pl.col("date").dt.week().alias("week_of_year"),
+               pl.col("date").dt.weekday().is_in([6, 7]).alias("is_weekend"),
+       ).with_columns(self.date_key("date").alias("date_key")
        ).sort(by="date_key")
 
 
        dim_date = dim_date.with_columns(
        self.get_fiscal_quarter(10).alias("fiscal_quarter")
            )
-
-
-       logger.info(f"Created date dimension with {len(dim_date)} records")
        return dim_date
 
 
@@ -322,15 +463,45 @@ class DataTransformer:
 
 
   
-   def transform_transactions_fact(self, transactions_df: pl.DataFrame ,exchange_rates: pl.DataFrame) -> pl.DataFrame:
+   def prepare_exchange_rates(self, exchange_rates: Frame) -> Frame:
+       """
+       Prepare the exchange rate lookup
+
+
+       - with a `date` column (daily rates): one row per (currency, date), sorted by date for join_asof
+       - without it: exactly one rate per currency, so the fact join can never multiply rows
+       """
+       rates = self.standardize_column_names(exchange_rates)
+       if "date" in rates.collect_schema().names():
+           return (rates
+                   .select(
+                       pl.col("currency"),
+                       pl.col("date").cast(pl.Date).alias("rate_date"),
+                       pl.col("rate_to_usd"))
+                   .unique(subset=["currency", "rate_date"], keep="last", maintain_order=True)
+                   .sort("rate_date"))
+       return (rates
+               .select(pl.col("currency"), pl.col("rate_to_usd"))
+               .unique(subset="currency", keep="last", maintain_order=True))
+
+   def transform_transactions_fact(self, transactions_df: Frame ,exchange_rates: Optional[Frame],
+                                   rates: Optional[Frame] = None) -> Frame:
        """Transform orders and order details into sales fact table
        1. Clean the data by standardizing column names
        2. Join orders with order details
        3. Select relevant columns and calculate derived metrics
        4. Create timestamp columns created_at and updated_at
+
+
+       Daily exchange rates are joined point-in-time (join_asof on currency + date: the latest rate
+       on or before the transaction date), so the fact row count never changes.
+       `rates` are exchange rates already prepared by prepare_exchange_rates (e.g. once for every batch);
+       without them exchange_rates is prepared here.
        """
        logger.info("Transforming sales fact table")
 
+       if rates is None:
+           rates = self.prepare_exchange_rates(exchange_rates)
        df_clean = self.standardize_column_names(transactions_df)
        transactions_fact = (
         df_clean
@@ -352,16 +523,32 @@ class DataTransformer:
             pl.col("unit_price"),
             pl.lit(datetime.now()).alias("created_at"),
             pl.lit(datetime.now()).alias("updated_at"),
-        ]).with_columns(pl.col("date").dt.strftime("%d%m%Y").alias("date_key"))
-        .join(exchange_rates, on="currency", how="left")
-        # สร้าง unit_price_usd ก่อน
+        ]).with_columns(self.date_key("date").alias("date_key"))
+       )
+
+       if "rate_date" in rates.collect_schema().names():
+           transactions_fact = (
+            transactions_fact
+            .with_columns(pl.col("date").cast(pl.Date).alias("rate_date"))
+            .sort("rate_date")
+            # ทั้งสองฝั่ง sort ด้วย rate_date แล้ว จึงไม่ต้องให้ Polars ตรวจซ้ำ
+            .join_asof(rates, on="rate_date", by="currency", strategy="backward", check_sortedness=False)
+            .drop("rate_date")
+           )
+       else:
+           transactions_fact = transactions_fact.join(rates, on="currency", how="left")
+
+       transactions_fact = (
+        transactions_fact
+        # สร้าง unit_price_usd และยอดรวม USD ครั้งเดียว แล้วใช้ต่อสำหรับ net/discount
         .with_columns(
             (pl.col("unit_price") * pl.col("rate_to_usd")).alias("unit_price_usd"))
-        # คำนวณ gross/net/discount ใช้สูตรเดิมโดยตรง ไม่เรียก unit_price_usd ที่สร้าง
+        .with_columns(
+            (pl.col("quantity") * pl.col("unit_price_usd")).alias("total_revenue_usd"))
         .with_columns([
-            (pl.col("quantity") * (pl.col("unit_price_usd") * pl.col("rate_to_usd"))).alias("total_revenue_usd"),
-            (pl.col("quantity") * (pl.col("unit_price_usd") * pl.col("rate_to_usd")) * (1 - pl.col("discount") / 100)).alias("net_amount_usd"),
-            (pl.col("quantity") * (pl.col("unit_price_usd") * pl.col("rate_to_usd")) * (pl.col("discount") / 100)).alias("discount_usd"),
+            # discount เป็นสัดส่วนอยู่แล้ว (0.2 = ลด 20%)
+            (pl.col("total_revenue_usd") * (1 - pl.col("discount"))).alias("net_amount_usd"),
+            (pl.col("total_revenue_usd") * pl.col("discount")).alias("discount_usd"),
             ])
         .sort("date_key")
     )
@@ -413,57 +600,181 @@ class DataTransformer:
     #                     ).sort(by='date_key')
                         
     #    return transactions_fact
-   def transform_all_data(self, raw_data: Dict[str, pl.DataFrame]) -> Dict[str, pl.DataFrame]:
+   def transform_table(self, table_name: str, raw_data: Dict[str, Frame]) -> Frame:
        """
-       Transform all raw data into dimensional model
+       Build one warehouse table from its raw sources
 
 
        Args:
-       raw_data: Dictionary of raw DataFrames
+       table_name: Name of the target table (a key of TABLE_SOURCES)
+       raw_data: Dictionary of raw DataFrames containing the table's sources
 
 
        Returns:
-       Dictionary of transformed DataFrames
+       Transformed DataFrame (or LazyFrame)
        """
-       logger.info("Starting data transformation process")
+       if table_name == "dim_customers":
+           return self.transform_customers(raw_data["customers"])
+       if table_name == "dim_discounts":
+           return self.transform_discounts(raw_data["discounts"])
+       if table_name == "dim_employees":
+           return self.transform_employees(raw_data["employees"])
+       if table_name == "dim_products":
+           return self.transform_products(raw_data["products"])
+       if table_name == "dim_stores":
+           return self.transform_stores(raw_data["stores"])
+       if table_name == "dim_date":
+           if "transaction_dates" in raw_data:
+               start, end = raw_data["transaction_dates"] or (None, None)
+               return self.create_date_dimension(start, end, loaded=self.loaded_dates)
+           if isinstance(raw_data["transactions"], pl.LazyFrame):
+               return self.plan_date_dimension(raw_data["transactions"], loaded=self.loaded_dates)
+           start, end = self.date_bounds(raw_data["transactions"]) or (None, None)
+           return self.create_date_dimension(start, end, loaded=self.loaded_dates)
+       if table_name == "fact_transactions":
+           return self.transform_transactions_fact(raw_data["transactions"], raw_data.get("exchange_rates"),
+                                                   rates=raw_data.get("exchange_rates_usd"))
+       raise ValueError(f"Unknown table: {table_name}")
+
+   @classmethod
+   def code_version(cls, table_name: str) -> str:
+       """
+       Hash of the source code of the methods that build a table (TABLE_TRANSFORMS)
 
 
-       transformed = {}
+       Changes only when one of those methods is edited, so editing one transform invalidates
+       only the tables it builds.
+       """
+       digest = hashlib.sha256()
+       for method in cls.TABLE_TRANSFORMS[table_name]:
+           digest.update(inspect.getsource(getattr(cls, method)).encode("utf-8"))
+       return digest.hexdigest()[:16]
 
+   def task_graph(self, raw_data: Dict[str, Frame], max_workers: Optional[int] = None,
+                  tables: Optional[List[str]] = None) -> TaskGraph:
+       """
+       One task per warehouse table, plus the intermediate tasks they share (PREPARE_TASKS)
 
-       # Create dimensions
-       if "customers" in raw_data:
-           transformed["dim_customers"] = self.transform_customers(raw_data["customers"])
 
+       The tasks depend on what they actually use: fact_transactions on the transactions and the
+       prepared exchange rates, dim_date on the transaction date range (in lazy mode on the
+       transactions scan, which collect_all shares with the fact table), every dimension on its source.
 
-       if "discounts" in raw_data:
-           transformed["dim_discounts"] = self.transform_discounts(raw_data["discounts"])
 
+       Args:
+       raw_data: Dictionary of raw DataFrames; tables whose sources are missing are left out
+       max_workers: Transforms running at the same time (default config.TRANSFORM_WORKERS)
+       tables: Build only these tables (default every table in TABLE_SOURCES)
 
-       if "employees" in raw_data:
-           transformed["dim_employees"] = self.transform_employees(raw_data["employees"])
 
+       Returns:
+       TaskGraph to run with the raw data as inputs
+       """
+       graph = TaskGraph(max_workers or self.config.TRANSFORM_WORKERS)
+       lazy = any(isinstance(frame, pl.LazyFrame) for frame in raw_data.values())
+       table_inputs = {}
+       for table_name, sources in self.TABLE_SOURCES.items():
+           if tables is not None and table_name not in tables:
+               continue
+           if all(source in raw_data for source in sources):
+               inputs = sources if lazy and table_name == "dim_date" else self.TABLE_INPUTS.get(table_name, sources)
+               table_inputs[table_name] = inputs
+
+       needed = {name for inputs in table_inputs.values() for name in inputs}
+       for task_name, (method, source) in self.PREPARE_TASKS.items():
+           if task_name in needed:
+               graph.add(task_name, functools.partial(self.prepare_task, method, source), depends_on=[source])
+       for table_name, inputs in table_inputs.items():
+           graph.add(table_name, functools.partial(self.transform_table, table_name), depends_on=inputs)
+       return graph
+
+   def prepare_task(self, method: str, source: str, inputs: Dict[str, Frame]):
+       """Run an intermediate task of the task graph (PREPARE_TASKS) on its raw source"""
+       return getattr(self, method)(inputs[source])
+
+   def iter_transform_data(self, raw_data: Dict[str, Frame], max_workers: Optional[int] = None,
+                           tables: Optional[List[str]] = None) -> Iterator[Tuple[str, pl.DataFrame]]:
+       """
+       Transform all raw data, yielding (table name, DataFrame) as each table is finished
 
-       if "products" in raw_data:
-           transformed["dim_products"] = self.transform_products(raw_data["products"])
-       if "stores" in raw_data:
-           transformed["dim_stores"] = self.transform_stores(raw_data["stores"])
-          
 
+       Independent tables are transformed concurrently, so the dimensions are ready (and can be
+       loaded) while the fact table is still being built. In lazy mode the tables are planned
+       first and collected together by collect_all, which parallelises inside Polars instead.
 
-       # Create date dimension
-       transformed["dim_date"] = self.create_date_dimension()
 
+       Args:
+       raw_data: Dictionary of raw DataFrames (or LazyFrames in lazy mode)
+       max_workers: Transforms running at the same time (default config.TRANSFORM_WORKERS)
+       tables: Build only these tables (default every table in TABLE_SOURCES)
+       """
+       logger.info("Starting data transformation process")
+       self.timings = {}
+       graph = self.task_graph(raw_data, max_workers, tables)
+       lazy = any(isinstance(frame, pl.LazyFrame) for frame in raw_data.values())
+       if lazy:
+           graph.max_workers = 1
 
-       # Create fact tables
-       if "transactions" in raw_data and 'exchange_rates' in raw_data:
-           transformed["fact_transactions"] = self.transform_transactions_fact(
-               raw_data["transactions"],
-               raw_data['exchange_rates'])
-              
+       transformed = {}
+       for table_name, frame in graph.run(raw_data):
+           if table_name in self.PREPARE_TASKS:
+               continue
+           self.timings[table_name] = graph.timings[table_name]["seconds"]
+           if lazy:
+               transformed[table_name] = frame
+           else:
+               yield table_name, frame
+       self.task_timings = graph.timings
+
+       # lazy mode: timings เป็นเวลาสร้าง query plan งานจริงเกิดตอน collect_all
+       yield from self.collect_all(transformed).items()
+
+   def transform_all_data(self, raw_data: Dict[str, Frame], max_workers: Optional[int] = None,
+                          tables: Optional[List[str]] = None) -> Dict[str, pl.DataFrame]:
+       """
+       Transform all raw data into dimensional model
 
 
+       Args:
+       raw_data: Dictionary of raw DataFrames (or LazyFrames in lazy mode, collected once at the end)
+       max_workers: Transforms running at the same time (default config.TRANSFORM_WORKERS)
+       tables: Build only these tables (default every table in TABLE_SOURCES)
+
+
+       Returns:
+       Dictionary of transformed DataFrames (in TABLE_SOURCES order)
+       """
+       transformed = dict(self.iter_transform_data(raw_data, max_workers, tables))
+       transformed = {name: transformed[name] for name in self.TABLE_SOURCES if name in transformed}
 
        logger.info(f"Transformation complete. Created {len(transformed)} tables")
        return transformed
 
+   def collect_all(self, transformed: Dict[str, Frame]) -> Dict[str, pl.DataFrame]:
+       """
+       Collect every LazyFrame in one pass with pl.collect_all
+
+
+       All lazy plans are optimized together, so shared inputs (e.g. the transactions scan)
+       are read once and projections/filters are pushed down into the CSV scans.
+
+
+       Args:
+       transformed: Dictionary of transformed DataFrames or LazyFrames
+
+
+       Returns:
+       Dictionary of DataFrames
+       """
+       lazy_names = [name for name, frame in transformed.items() if isinstance(frame, pl.LazyFrame)]
+       if not lazy_names:
+           return transformed
+
+       engine = "streaming" if self.config.STREAMING_ENGINE else "auto"
+       logger.info(f"Collecting {len(lazy_names)} lazy tables with the {engine} engine")
+       frames = pl.collect_all([transformed[name] for name in lazy_names], engine=engine)
+
+       collected = dict(transformed)
+       collected.update(zip(lazy_names, frames))
+       return collected
+
@@ -0,0 +1,275 @@
+"""
+Cached analytical queries over the warehouse for the dashboard
+
+Serves the standard retail KPIs (sales by store, category, date and currency, overall summary)
+from DuckDB. Results are kept in an LRU cache keyed by query and parameters, so dashboard
+refreshes from many users do not each rescan the warehouse.
+
+Cached results are tagged with the load generation DataLoader writes after every committed
+load (DataLoader.bump_generation); a result from an older generation is recomputed on its next
+request. The warehouse is opened read-only and only while a query runs, so the pipeline can take
+its write lock between queries; while it holds the lock, the last result of a query is served.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+import duckdb as dd
+import polars as pl
+
+from src.config import config
+from src.etl.aggregates import AggregateRefresher
+from src.etl.load_std import DataLoader
+
+# Setup logging
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL),
+                    format='%(asctime)s - %(levelname)s - %(message)s'
+                    )
+logger = logging.getLogger(__name__)
+
+
+class WarehouseQuery:
+    """
+    Class for running the dashboard KPI queries against a read-only warehouse connection
+
+    Every query takes optional start_date and end_date (date or "YYYY-MM-DD", both inclusive).
+    Daily and monthly KPIs read the aggregate tables when they are maintained (REFRESH_AGGREGATES);
+    otherwise the same rollup is computed from fact_transactions.
+    """
+
+    QUERIES = {
+        # Sales per store, best first
+        "sales_by_store": """
+            SELECT a.store_id, s.store_name,
+                   CAST(s.city AS VARCHAR) AS city, CAST(s.country AS VARCHAR) AS country,
+                   sum(a.invoices)::BIGINT AS invoices,
+                   sum(a.quantity)::BIGINT AS quantity,
+                   sum(a.total_revenue_usd) AS total_revenue_usd,
+                   sum(a.discount_usd) AS discount_usd,
+                   sum(a.net_amount_usd) AS net_amount_usd
+            FROM {daily} a
+            LEFT JOIN ({stores}) s ON s.store_id = a.store_id
+            WHERE {filter}
+            GROUP BY ALL
+            ORDER BY net_amount_usd DESC
+        """,
+        # Revenue per product category; months are the finest grain (agg_monthly_category_revenue)
+        "sales_by_category": """
+            SELECT category, sub_category,
+                   sum(line_items)::BIGINT AS line_items,
+                   sum(quantity)::BIGINT AS quantity,
+                   sum(total_revenue_usd) AS total_revenue_usd,
+                   sum(net_amount_usd) AS net_amount_usd
+            FROM {monthly}
+            WHERE {filter}
+            GROUP BY ALL
+            ORDER BY net_amount_usd DESC
+        """,
+        # Sales per period (grain: day, week, month, quarter or year)
+        "sales_by_date": """
+            SELECT date_trunc('{grain}', strptime(CAST(date_key AS VARCHAR), '%Y%m%d'))::DATE AS period,
+                   sum(invoices)::BIGINT AS invoices,
+                   sum(quantity)::BIGINT AS quantity,
+                   sum(total_revenue_usd) AS total_revenue_usd,
+                   sum(discount_usd) AS discount_usd,
+                   sum(net_amount_usd) AS net_amount_usd
+            FROM {daily}
+            WHERE {filter}
+            GROUP BY period
+            ORDER BY period
+        """,
+        # Sales per transaction currency (line_total is in that currency)
+        "sales_by_currency": """
+            SELECT CAST(currency AS VARCHAR) AS currency,
+                   count(DISTINCT invoice_id) AS invoices,
+                   sum(quantity)::BIGINT AS quantity,
+                   sum(line_total) AS line_total,
+                   sum(total_revenue_usd) AS total_revenue_usd,
+                   sum(net_amount_usd) AS net_amount_usd
+            FROM fact_transactions
+            WHERE {filter}
+            GROUP BY ALL
+            ORDER BY total_revenue_usd DESC
+        """,
+        # Headline numbers
+        "kpi_summary": """
+            SELECT sum(invoices)::BIGINT AS invoices,
+                   sum(quantity)::BIGINT AS quantity,
+                   sum(total_revenue_usd) AS total_revenue_usd,
+                   sum(discount_usd) AS discount_usd,
+                   sum(net_amount_usd) AS net_amount_usd,
+                   sum(net_amount_usd) / nullif(sum(invoices), 0) AS avg_invoice_usd,
+                   count(DISTINCT store_id) AS stores,
+                   count(DISTINCT date_key) AS days
+            FROM {daily}
+            WHERE {filter}
+        """,
+    }
+
+    # Date-key column each query filters on and how a date key maps onto it
+    FILTER_COLUMNS = {
+        "sales_by_store": ("a.date_key", 1),
+        "sales_by_category": ("month_key", 100),
+        "sales_by_date": ("date_key", 1),
+        "sales_by_currency": ("date_key", 1),
+        "kpi_summary": ("date_key", 1),
+    }
+
+    GRAINS = ["day", "week", "month", "quarter", "year"]
+
+    def __init__(self, db_path: Optional[str] = None, cache_size: Optional[int] = None,
+                 use_aggregates: Optional[bool] = None):
+        """
+        Args:
+            db_path: Warehouse file (default config.DATABASE_PATH)
+            cache_size: Results kept in the cache (default config.QUERY_CACHE_SIZE)
+            use_aggregates: Read the agg_* tables (default config.REFRESH_AGGREGATES; when they are
+                            not refreshed after every load they may be out of date)
+        """
+        self.config = config()
+        self.db_path = str(db_path or self.config.DATABASE_PATH)
+        self.cache_size = cache_size or self.config.QUERY_CACHE_SIZE
+        self.use_aggregates = self.config.REFRESH_AGGREGATES if use_aggregates is None else use_aggregates
+        # (query name, parameters) -> (generation, result); least recently used first
+        self._cache: "OrderedDict[tuple, Tuple[int, pl.DataFrame]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Only one query runs at a time: concurrent misses of the same query wait for the first one
+        self._query_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> int:
+        """Current load generation of the warehouse"""
+        return DataLoader.read_generation(f"{self.db_path}.generation")
+
+    @staticmethod
+    def _date_key(value) -> Optional[int]:
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = date.fromisoformat(value)
+        if isinstance(value, datetime):
+            value = value.date()
+        return value.year * 10000 + value.month * 100 + value.day
+
+    def _filter(self, name: str, start_date=None, end_date=None) -> str:
+        column, divisor = self.FILTER_COLUMNS[name]
+        conditions = []
+        for operator, value in ((">=", start_date), ("<=", end_date)):
+            key = self._date_key(value)
+            if key is not None:
+                conditions.append(f"{column} {operator} {key // divisor}")
+        return " AND ".join(conditions) or "true"
+
+    @staticmethod
+    def _current_rows(connection, table_name: str) -> str:
+        """A dimension with one row per key (the current version in scd2 mode)"""
+        has_is_current = connection.execute(
+            "SELECT count(*) FROM duckdb_columns() WHERE table_name = ? AND column_name = 'is_current'",
+            [table_name]).fetchone()[0] > 0
+        return f"SELECT * FROM {table_name}" + (" WHERE is_current" if has_is_current else "")
+
+    def _sources(self, connection) -> Dict[str, str]:
+        """Relations the queries read: the aggregate tables, or their rollup over the fact table"""
+        tables = {row[0] for row in connection.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+        products = self._current_rows(connection, "dim_products")
+        sources = {"stores": self._current_rows(connection, "dim_stores")}
+        for key, aggregate_name in (("daily", "agg_daily_store_sales"), ("monthly", "agg_monthly_category_revenue")):
+            if self.use_aggregates and aggregate_name in tables:
+                sources[key] = aggregate_name
+            else:
+                select = AggregateRefresher.AGGREGATES[aggregate_name]["select"]
+                sources[key] = f"({select.format(scope='true', products=products)})"
+        return sources
+
+    def _run(self, name: str, params: dict) -> pl.DataFrame:
+        """Run one query on a read-only connection that is closed right after"""
+        grain = params.get("grain", "day")
+        if grain not in self.GRAINS:
+            raise ValueError(f"grain must be one of {self.GRAINS}, got {grain!r}")
+        connection = dd.connect(self.db_path, read_only=True)
+        try:
+            sql = self.QUERIES[name].format(
+                filter=self._filter(name, params.get("start_date"), params.get("end_date")),
+                grain=grain, **self._sources(connection))
+            return connection.execute(sql).pl()
+        finally:
+            connection.close()
+
+    def query(self, name: str, **params) -> Optional[pl.DataFrame]:
+        """
+        Result of a KPI query, from the cache when it was computed at the current load generation
+
+        Args:
+            name: Name of the query in QUERIES
+            **params: start_date, end_date and, for sales_by_date, grain
+
+        Returns:
+            Polars DataFrame (shared with the cache, do not modify it in place), or None if the
+            query failed and there is no earlier result to fall back on
+        """
+        if name not in self.QUERIES:
+            logger.error(f"Unknown query {name}, expected one of {list(self.QUERIES)}")
+            return None
+        key = (name, tuple(sorted((k, str(v)) for k, v in params.items() if v is not None)))
+        generation = self.generation()
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == generation:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+
+        with self._query_lock:
+            # อาจถูกคำนวณไปแล้วระหว่างรอ lock
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == generation:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached[1]
+                self.misses += 1
+            try:
+                result = self._run(name, params)
+            except Exception as e:
+                if cached is not None:
+                    # e.g. the pipeline holds the write lock: the previous result is still consistent
+                    logger.warning(f"Query {name} failed, serving the result of generation {cached[0]}: {e}")
+                    return cached[1]
+                logger.error(f"Error running query {name}: {str(e)}")
+                return None
+
+        with self._cache_lock:
+            self._cache[key] = (generation, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def sales_by_store(self, start_date=None, end_date=None) -> Optional[pl.DataFrame]:
+        return self.query("sales_by_store", start_date=start_date, end_date=end_date)
+
+    def sales_by_category(self, start_date=None, end_date=None) -> Optional[pl.DataFrame]:
+        """Revenue per category and sub-category over the whole months of start_date to end_date"""
+        return self.query("sales_by_category", start_date=start_date, end_date=end_date)
+
+    def sales_by_date(self, grain: str = "day", start_date=None, end_date=None) -> Optional[pl.DataFrame]:
+        return self.query("sales_by_date", grain=grain, start_date=start_date, end_date=end_date)
+
+    def sales_by_currency(self, start_date=None, end_date=None) -> Optional[pl.DataFrame]:
+        return self.query("sales_by_currency", start_date=start_date, end_date=end_date)
+
+    def kpi_summary(self, start_date=None, end_date=None) -> Optional[pl.DataFrame]:
+        return self.query("kpi_summary", start_date=start_date, end_date=end_date)
+
+    def cache_info(self) -> dict:
+        with self._cache_lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache),
+                    "max_size": self.cache_size, "generation": self.generation()}
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
@@ -0,0 +1,110 @@
+import shutil
+from datetime import date
+
+import polars as pl
+import pytest
+
+from benchmarks.generate_data import SyntheticDataGenerator
+from src.config import config
+from src.etl.load_std import DataLoader
+
+# Polars dtype of each declared DuckDB type, for building source frames
+POLARS_TYPES = {
+    "VARCHAR": pl.String,
+    "ENUM": pl.String,
+    "BIGINT": pl.Int64,
+    "INTEGER": pl.Int32,
+    "DOUBLE": pl.Float64,
+    "BOOLEAN": pl.Boolean,
+    "DATE": pl.Date,
+    "TIMESTAMP": pl.Datetime("us"),
+}
+
+# Columns the loader computes itself
+COMPUTED_COLUMNS = ("row_hash", "valid_from", "valid_to", "is_current")
+
+# Optional modes, all off so every test starts from the plain pipeline
+DEFAULT_SETTINGS = {
+    "LAZY_EXECUTION": False,
+    "BATCHED_TRANSACTIONS": False,
+    "PIPELINED_LOAD": False,
+    "PARSE_CACHE_ENABLED": False,
+    "FACT_LOAD_MODE": "replace",
+    "DIM_LOAD_MODE": "replace",
+    "ETL_ENGINE": "polars",
+    "OPTIMIZE_LAYOUT": False,
+    "REFRESH_AGGREGATES": False,
+    "EXPORT_PARQUET": False,
+    "PROFILE": False,
+    "PROFILE_CPROFILE": False,
+    "SNAPSHOT_MODE": False,
+    "SNAPSHOT_DIR": None,
+    "CHECKPOINT_ENABLED": False,
+    "RETRY_TABLES": [],
+    "SKIP_UNCHANGED_TABLES": False,
+    "MAX_MEMORY_GB": None,
+    "THREAD_COUNT": None,
+}
+
+
+@pytest.fixture(scope="session")
+def source_dir(tmp_path_factory):
+    """Synthetic source CSVs (300 transaction lines in January 2024), generated once"""
+    directory = tmp_path_factory.mktemp("sources")
+    SyntheticDataGenerator(str(directory), transactions=300,
+                           start=date(2024, 1, 1), end=date(2024, 1, 31)).generate_all()
+    return directory
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch, source_dir):
+    """
+    Point config at a copy of the synthetic sources (tmp_path/data), a fresh warehouse
+    (tmp_path/dw.duckdb) and processed files under tmp_path/processed
+    """
+    shutil.copytree(source_dir, tmp_path / "data")
+    processed = tmp_path / "processed"
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update({
+        "RAW_DATA_PATH": str(tmp_path / "data"),
+        "DATABASE_PATH": str(tmp_path / "dw.duckdb"),
+        "PROCESSED_DATA_DIR": str(processed),
+        "PARSE_CACHE_DIR": str(processed / "parse_cache"),
+        "EXPORT_DIR": str(processed / "parquet"),
+        "PROFILE_DIR": str(processed / "profiles"),
+        "RUN_REPORT_DIR": str(processed / "run_reports"),
+        "CHECKPOINT_DIR": str(processed / "checkpoints"),
+        "SPILL_DIR": str(processed / "spill"),
+    })
+    for name, value in settings.items():
+        monkeypatch.setattr(config, name, value)
+    return tmp_path
+
+
+@pytest.fixture
+def loader(workspace):
+    """DataLoader connected to the warehouse of the workspace"""
+    data_loader = DataLoader()
+    data_loader.connect()
+    yield data_loader
+    data_loader.disconnect()
+
+
+@pytest.fixture
+def frame():
+    """Build a source frame for a warehouse table; declared columns not given are null"""
+    def build(table_name, rows):
+        columns = DataLoader.TABLE_SCHEMAS[table_name]["columns"]
+        schema = {col: POLARS_TYPES[col_type] for col, col_type in columns.items() if col not in COMPUTED_COLUMNS}
+        return pl.DataFrame([{col: row.get(col) for col in schema} for row in rows], schema=schema, orient="row")
+    return build
+
+
+@pytest.fixture
+def transaction():
+    """Build one fact_transactions row (store, product, customer and employee 1, paid in USD)"""
+    def build(invoice_id, date, line_item=1):
+        return {"invoice_id": invoice_id, "line_item": line_item, "customer_id": 1, "product_id": 1,
+                "quantity": 1, "date": date, "line_total": 10.0, "store_id": 1, "employee_id": 1,
+                "currency": "USD", "transaction_type": "Sale", "payment_method": "Cash"}
+    return build
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import duckdb
+import pytest
+
+import runpipeline
+from src.config import config
+from src.etl.load_std import DataLoader
+from src.etl.transform import DataTransformer
+
+
+@pytest.mark.parametrize("batches", [0, 2])
+def test_load_batches_replaces_the_table_first(loader, frame, transaction, batches):
+    rows = [transaction(f"INV-{i}", datetime(2024, 1, 1, i)) for i in range(4)]
+    assert loader.load_dataframe(frame("fact_transactions", rows), "fact_transactions", mode="replace")
+
+    chunks = [frame("fact_transactions", rows[i:i + 1]) for i in range(batches)]
+    assert loader.load_batches(iter(chunks), "fact_transactions")
+    assert loader.connection.execute("SELECT count(*) FROM fact_transactions").fetchone()[0] == batches
+
+
+def test_batched_run_loads_facts_and_dates(workspace, monkeypatch):
+    monkeypatch.setattr(config, "BATCHED_TRANSACTIONS", True)
+    monkeypatch.setattr(config, "BATCH_SIZE", 64)
+    runpipeline.main()
+
+    with duckdb.connect(str(workspace / "dw.duckdb"), read_only=True) as connection:
+        assert connection.execute("SELECT count(*) FROM fact_transactions").fetchone()[0] == 300
+        # every fact row has its date in dim_date
+        assert connection.execute("""
+            SELECT count(*) FROM fact_transactions f
+            WHERE NOT EXISTS (SELECT 1 FROM dim_date d WHERE d.date_key = f.date_key)
+        """).fetchone()[0] == 0
+
+
+@pytest.mark.parametrize("failing", ["batch", "dim_date"])
+def test_failed_batched_load_leaves_neither_facts_nor_dates(workspace, monkeypatch, failing):
+    monkeypatch.setattr(config, "BATCHED_TRANSACTIONS", True)
+    monkeypatch.setattr(config, "BATCH_SIZE", 64)
+    if failing == "batch":
+        transform = DataTransformer.transform_transactions_fact
+        calls = []
+
+        def failing_transform(self, *args, **kwargs):
+            calls.append(1)
+            if len(calls) == 3:
+                raise RuntimeError("bad batch")
+            return transform(self, *args, **kwargs)
+
+        monkeypatch.setattr(DataTransformer, "transform_transactions_fact", failing_transform)
+    else:
+        load_dataframe = DataLoader.load_dataframe
+        monkeypatch.setattr(DataLoader, "load_dataframe", lambda self, df, table_name, mode=None:
+                            table_name != "dim_date" and load_dataframe(self, df, table_name, mode))
+    runpipeline.main()
+
+    with duckdb.connect(str(workspace / "dw.duckdb"), read_only=True) as connection:
+        for table_name in ("fact_transactions", "dim_date"):
+            exists = connection.execute(
+                "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table_name]).fetchone()[0]
+            assert not exists or connection.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_batched_run_commits_once(workspace, monkeypatch, pipelined):
+    monkeypatch.setattr(config, "BATCHED_TRANSACTIONS", True)
+    monkeypatch.setattr(config, "PIPELINED_LOAD", pipelined)
+    monkeypatch.setattr(config, "BATCH_SIZE", 64)
+    runpipeline.main()
+    assert DataLoader.read_generation(f"{workspace / 'dw.duckdb'}.generation") == 1
+
+
+def test_failed_batch_rolls_back_the_dimensions(workspace, monkeypatch):
+    monkeypatch.setattr(config, "BATCHED_TRANSACTIONS", True)
+    monkeypatch.setattr(config, "BATCH_SIZE", 64)
+
+    def failing_transform(self, *args, **kwargs):
+        raise RuntimeError("bad batch")
+
+    monkeypatch.setattr(DataTransformer, "transform_transactions_fact", failing_transform)
+    runpipeline.main()
+
+    with duckdb.connect(str(workspace / "dw.duckdb"), read_only=True) as connection:
+        assert connection.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name LIKE 'dim_%'").fetchone()[0] == 0
+    assert DataLoader.read_generation(f"{workspace / 'dw.duckdb'}.generation") == 0
@@ -0,0 +1,51 @@
+import os
+
+import duckdb
+import polars as pl
+
+import runpipeline
+from src.config import config
+from src.etl.extract import DataExtractor
+from src.etl.load_std import DataLoader
+
+
+def fail_to_load(self, transformed_data, batches=None):
+    return False
+
+
+def fail_to_extract(self, *args, **kwargs):
+    raise AssertionError("the resumed run extracted the sources again")
+
+
+def run_dirs(workspace):
+    directory = workspace / "processed" / "checkpoints"
+    return sorted(os.listdir(directory)) if directory.exists() else []
+
+
+def test_failed_run_is_resumed_from_its_checkpoint(workspace, monkeypatch):
+    monkeypatch.setattr(config, "CHECKPOINT_ENABLED", True)
+    with monkeypatch.context() as patch:
+        patch.setattr(DataLoader, "load_all_data", fail_to_load)
+        runpipeline.main()
+    assert len(run_dirs(workspace)) == 1
+
+    with monkeypatch.context() as patch:
+        patch.setattr(DataExtractor, "extract_data", fail_to_extract)
+        runpipeline.main()
+    assert run_dirs(workspace) == []
+    with duckdb.connect(str(workspace / "dw.duckdb"), read_only=True) as connection:
+        rows = connection.execute("SELECT count(*) FROM fact_transactions").fetchone()[0]
+    assert rows == len(pl.read_csv(workspace / "data" / "transactions.csv", infer_schema=False))
+
+
+def test_changed_source_starts_a_new_run(workspace, monkeypatch):
+    monkeypatch.setattr(config, "CHECKPOINT_ENABLED", True)
+    monkeypatch.setattr(DataLoader, "load_all_data", fail_to_load)
+    runpipeline.main()
+    (failed_run,) = run_dirs(workspace)
+
+    source = workspace / "data" / "stores.csv"
+    pl.read_csv(source, infer_schema=False).head(3).write_csv(source)
+    runpipeline.main()
+    assert len(run_dirs(workspace)) == 2
+    assert failed_run in run_dirs(workspace)
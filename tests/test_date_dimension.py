@@ -0,0 +1,40 @@
+from datetime import date
+
+import duckdb
+import polars as pl
+
+import runpipeline
+from src.etl.transform import DataTransformer
+
+
+def test_only_missing_dates_are_created():
+    dim_date = DataTransformer().create_date_dimension(date(2024, 1, 1), date(2024, 1, 10),
+                                                       loaded=(date(2024, 1, 3), date(2024, 1, 8)))
+    assert dim_date["date"].to_list() == [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 9), date(2024, 1, 10)]
+    assert dim_date.row(0, named=True)["month_name"] == "January"
+    assert dim_date.row(0, named=True)["day_name"] == "Monday"
+
+    assert DataTransformer().create_date_dimension(date(2024, 1, 3), date(2024, 1, 8),
+                                                   loaded=(date(2024, 1, 1), date(2024, 1, 31))).is_empty()
+    assert DataTransformer().create_date_dimension(None, None).is_empty()
+
+
+def date_range(workspace):
+    with duckdb.connect(str(workspace / "dw.duckdb"), read_only=True) as connection:
+        return connection.execute("SELECT min(date), max(date), count(*) FROM dim_date").fetchone()
+
+
+def test_date_dimension_follows_the_transactions(workspace):
+    source = workspace / "data" / "transactions.csv"
+    transactions = pl.read_csv(source, infer_schema=False)
+    days = transactions["Date"].str.slice(0, 10).str.to_date()
+
+    runpipeline.main()
+    assert date_range(workspace) == (days.min(), days.max(), (days.max() - days.min()).days + 1)
+
+    # a later transaction only appends the missing days
+    later = transactions.head(1).with_columns(pl.lit("INV-LATER").alias("Invoice ID"),
+                                              pl.lit("2024-03-05 12:00:00").alias("Date"))
+    pl.concat([transactions, later]).write_csv(source)
+    runpipeline.main()
+    assert date_range(workspace) == (days.min(), date(2024, 3, 5), (date(2024, 3, 5) - days.min()).days + 1)
@@ -0,0 +1,40 @@
+from datetime import date, datetime
+
+import polars as pl
+
+from src.etl.transform import DataTransformer
+
+
+def test_date_key_is_an_integer_in_calendar_order():
+    dates = pl.DataFrame({"date": [date(2024, 3, 15), date(2023, 12, 31), date(2024, 1, 2)]})
+    keys = dates.select(DataTransformer().date_key("date")).to_series()
+    assert keys.dtype == pl.Int32
+    assert keys.to_list() == [20240315, 20231231, 20240102]
+    assert keys.sort().to_list() == sorted(keys.to_list())
+
+
+def test_string_date_keys_are_migrated(loader):
+    connection = loader.connection
+    connection.execute("CREATE TABLE dim_date (date_key VARCHAR PRIMARY KEY, date DATE, year INTEGER)")
+    connection.execute("INSERT INTO dim_date VALUES ('31122023', '2023-12-31', 2023), ('02012024', '2024-01-02', 2024)")
+    connection.execute("CREATE TABLE fact_transactions (invoice_id VARCHAR, line_item INTEGER, date TIMESTAMP, date_key VARCHAR)")
+    connection.execute("INSERT INTO fact_transactions VALUES ('INV-1', 1, '2024-01-02 10:00:00', '02012024')")
+
+    loader.prepare_warehouse()
+
+    assert loader.column_type("dim_date", "date_key") == "INTEGER"
+    assert connection.execute("SELECT date_key, date, year FROM dim_date ORDER BY date_key").fetchall() == [
+        (20231231, date(2023, 12, 31), 2023), (20240102, date(2024, 1, 2), 2024)]
+    assert loader.column_type("fact_transactions", "date_key") == "INTEGER"
+    assert connection.execute("SELECT invoice_id, date, date_key FROM fact_transactions").fetchall() == [
+        ("INV-1", datetime(2024, 1, 2, 10), 20240102)]
+
+
+def test_date_typed_keys_are_migrated(loader):
+    connection = loader.connection
+    connection.execute("CREATE TABLE dim_date (date_key DATE PRIMARY KEY, date DATE)")
+    connection.execute("INSERT INTO dim_date VALUES ('2024-01-02', '2024-01-02')")
+
+    loader.prepare_warehouse()
+
+    assert connection.execute("SELECT date_key, date FROM dim_date").fetchall() == [(20240102, date(2024, 1, 2))]
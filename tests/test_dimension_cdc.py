@@ -0,0 +1,40 @@
+from src.config import config
+
+
+def employee(employee_id, name, position):
+    return {"employee_id": employee_id, "store_id": 1, "name": name, "position": position}
+
+
+def test_scd2_expires_and_inserts_changed_row(loader, frame, monkeypatch):
+    monkeypatch.setattr(config, "DIM_LOAD_MODE", "scd2")
+    assert loader.load_dataframe(frame("dim_employees", [employee(1, "Alice", "Cashier"), employee(2, "Bob", "Cashier")]),
+                                 "dim_employees")
+    assert loader.load_dataframe(frame("dim_employees", [employee(1, "Alice", "Manager"), employee(2, "Bob", "Cashier")]),
+                                 "dim_employees")
+
+    versions = loader.connection.execute("""
+        SELECT employee_id, CAST(position AS VARCHAR), is_current, valid_to IS NOT NULL
+        FROM dim_employees ORDER BY employee_id, valid_from
+    """).fetchall()
+    assert versions == [
+        (1, "Cashier", False, True),
+        (1, "Manager", True, False),
+        (2, "Cashier", True, False),
+    ]
+
+
+def test_upsert_does_not_duplicate_keys(loader, frame, monkeypatch):
+    monkeypatch.setattr(config, "DIM_LOAD_MODE", "upsert")
+    assert loader.load_dataframe(frame("dim_employees", [employee(1, "Alice", "Cashier"), employee(2, "Bob", "Cashier")]),
+                                 "dim_employees")
+    changed = frame("dim_employees", [employee(2, "Bob", "Manager"), employee(3, "Carol", "Cashier")])
+    assert loader.load_dataframe(changed, "dim_employees")
+    # the same source again changes nothing
+    assert loader.load_dataframe(changed, "dim_employees")
+
+    rows = loader.connection.execute(
+        "SELECT employee_id, CAST(position AS VARCHAR) FROM dim_employees ORDER BY employee_id").fetchall()
+    assert rows == [(2, "Manager"), (3, "Cashier")]
+    keys, distinct_keys = loader.connection.execute(
+        "SELECT count(*), count(DISTINCT employee_id) FROM dim_employees").fetchone()
+    assert keys == distinct_keys
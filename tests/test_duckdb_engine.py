@@ -0,0 +1,37 @@
+import duckdb
+import polars as pl
+
+import runpipeline
+from src.config import config
+
+
+def fact_rows(workspace):
+    with duckdb.connect(str(workspace / "dw.duckdb"), read_only=True) as connection:
+        return connection.execute("SELECT count(*) FROM fact_transactions").fetchone()[0]
+
+
+def test_engine_switch_keeps_incremental_loads_complete(workspace, monkeypatch):
+    source = workspace / "data" / "transactions.csv"
+    full = pl.read_csv(source, infer_schema=False)
+
+    monkeypatch.setattr(config, "FACT_LOAD_MODE", "incremental")
+    runpipeline.main()
+    assert fact_rows(workspace) == len(full)
+
+    # a replace run of the duckdb engine on an older file drops the watermark with the rows
+    full.head(200).write_csv(source)
+    monkeypatch.setattr(config, "FACT_LOAD_MODE", "replace")
+    monkeypatch.setattr(config, "ETL_ENGINE", "duckdb")
+    runpipeline.main()
+    with duckdb.connect(str(workspace / "dw.duckdb"), read_only=True) as connection:
+        assert connection.execute("SELECT count(*) FROM fact_transactions").fetchone()[0] == 200
+        assert connection.execute(
+            "SELECT count(*) FROM etl_watermarks WHERE table_name = 'fact_transactions'").fetchone()[0] == 0
+        assert connection.execute(
+            "SELECT clustered_rows FROM etl_layout WHERE table_name = 'fact_transactions'").fetchone()[0] == 200
+
+    full.write_csv(source)
+    monkeypatch.setattr(config, "FACT_LOAD_MODE", "incremental")
+    monkeypatch.setattr(config, "ETL_ENGINE", "polars")
+    runpipeline.main()
+    assert fact_rows(workspace) == len(full)
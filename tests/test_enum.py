@@ -0,0 +1,42 @@
+import polars as pl
+
+import runpipeline
+from src.config import config
+from src.etl.extract import DataExtractor
+from src.etl.load_std import DataLoader
+
+
+def dictionaries():
+    loader = DataLoader()
+    try:
+        return loader.enum_dictionaries()
+    finally:
+        loader.disconnect()
+
+
+def test_eager_reads_follow_the_warehouse_dictionary(workspace):
+    runpipeline.main()
+    persisted = dictionaries()
+    assert persisted["position"]
+
+    source = workspace / "data" / "employees.csv"
+    employees = pl.read_csv(source, infer_schema=False)
+    employees.with_columns(pl.when(pl.int_range(pl.len()) == 0).then(pl.lit("Astronaut"))
+                           .otherwise(pl.col("Position")).alias("Position")).write_csv(source)
+
+    extractor = DataExtractor()
+    extractor.enum_values = persisted
+    position = extractor.extract_csv(str(source), "employees")["Position"]
+    assert position.dtype == pl.Enum(persisted["position"] + ["Astronaut"])
+
+    runpipeline.main()
+    assert dictionaries()["position"] == persisted["position"] + ["Astronaut"]
+
+
+def test_columns_without_a_dictionary_stay_categorical(workspace):
+    extractor = DataExtractor()
+    extractor.enum_values = {"position": []}
+    transactions = extractor.extract_csv(config.get_csv_path("transactions"), "transactions")
+    assert transactions["Currency"].dtype == pl.Categorical
+    employees = extractor.extract_csv(config.get_csv_path("employees"), "employees")
+    assert employees["Position"].dtype == pl.Enum(sorted(employees["Position"].cast(pl.String).unique().to_list()))
@@ -0,0 +1,55 @@
+import os
+from datetime import datetime
+
+from src.etl.export import ParquetExporter
+
+
+def load_facts(loader, frame, rows):
+    assert loader.load_dataframe(frame("fact_transactions", rows), "fact_transactions", mode="replace")
+
+
+def parquet_files(export_dir):
+    return sorted(os.path.relpath(os.path.join(root, name), export_dir)
+                  for root, _, names in os.walk(export_dir / "fact_transactions") for name in names)
+
+
+def test_null_partition_is_kept_and_not_rewritten(loader, frame, transaction, workspace):
+    rows = [transaction("INV-1", datetime(2024, 1, 1)),
+            dict(transaction("INV-2", datetime(2024, 1, 1)), store_id=None)]
+    load_facts(loader, frame, rows)
+    export_dir = workspace / "export"
+
+    exporter = ParquetExporter(loader, export_dir=str(export_dir))
+    manifest = exporter.export_all()
+    files = parquet_files(export_dir)
+    assert len(files) == 2
+    assert all(part["files"] for part in manifest["tables"]["fact_transactions"]["partitions"].values())
+
+    exporter.export_all()
+    assert exporter.bytes_written == {}
+    assert parquet_files(export_dir) == files
+
+
+def test_duplicated_rows_change_the_checksum(loader, frame, transaction, workspace):
+    day = datetime(2024, 1, 1)
+    load_facts(loader, frame, [transaction("INV-1", day), transaction("INV-2", day), transaction("INV-2", day)])
+    exporter = ParquetExporter(loader, export_dir=str(workspace / "export"))
+    exporter.export_all()
+
+    # same row count and the same bit_xor of the row hashes, different rows
+    load_facts(loader, frame, [transaction("INV-1", day), transaction("INV-3", day), transaction("INV-3", day)])
+    exporter.export_all()
+    assert "fact_transactions" in exporter.bytes_written
+
+
+def test_settings_change_leaves_no_orphaned_partitions(loader, frame, transaction, workspace):
+    load_facts(loader, frame, [transaction("INV-1", datetime(2024, 1, 1)),
+                               transaction("INV-2", datetime(2024, 2, 1))])
+    export_dir = workspace / "export"
+    ParquetExporter(loader, export_dir=str(export_dir)).export_all()
+
+    load_facts(loader, frame, [transaction("INV-1", datetime(2024, 1, 1))])
+    manifest = ParquetExporter(loader, export_dir=str(export_dir), compression="snappy").export_all()
+    partitions = manifest["tables"]["fact_transactions"]["partitions"]
+    assert list(partitions) == ["year=2024/month=1/store_id=1"]
+    assert parquet_files(export_dir) == partitions["year=2024/month=1/store_id=1"]["files"]
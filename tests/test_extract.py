@@ -0,0 +1,65 @@
+import os
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from src.config import config
+from src.etl.extract import DataExtractor
+
+
+def cached_files(workspace):
+    directory = workspace / "processed" / "parse_cache"
+    if not directory.exists():
+        return []
+    return sorted(name for name in os.listdir(directory) if name.endswith(".arrow"))
+
+
+def fail_to_parse(*args, **kwargs):
+    raise AssertionError("the CSV was parsed again")
+
+
+def test_parse_cache_hit_matches_the_csv(workspace, monkeypatch):
+    path = config.get_csv_path("products")
+    parsed = DataExtractor(use_cache=True).extract_csv(path, "products")
+    assert [name.split("-")[0] for name in cached_files(workspace)] == ["products"]
+
+    monkeypatch.setattr(pl, "read_csv", fail_to_parse)
+    assert_frame_equal(DataExtractor(use_cache=True).extract_csv(path, "products"), parsed)
+
+
+def test_changed_file_misses_the_parse_cache(workspace):
+    path = config.get_csv_path("products")
+    DataExtractor(use_cache=True).extract_csv(path, "products")
+    (before,) = cached_files(workspace)
+
+    source = pl.read_csv(path, infer_schema=False)
+    source.head(3).write_csv(path)
+    assert len(DataExtractor(use_cache=True).extract_csv(path, "products")) == 3
+    # the stale copy of the table is purged
+    (after,) = cached_files(workspace)
+    assert after != before
+
+
+def test_lazy_scan_does_not_write_the_parse_cache(workspace):
+    frame = DataExtractor(use_cache=True).extract_csv(config.get_csv_path("products"), "products", lazy=True)
+    assert isinstance(frame, pl.LazyFrame)
+    assert len(frame.collect()) > 0
+    assert cached_files(workspace) == []
+
+
+
+def test_concurrent_extraction_matches_sequential(workspace):
+    extractor = DataExtractor()
+    sequential = extractor.extract_data(max_workers=1)
+    concurrent = extractor.extract_data(max_workers=4)
+
+    assert list(concurrent) == list(sequential) == list(config.CSV_FILES)
+    for name, frame in sequential.items():
+        assert_frame_equal(concurrent[name], frame)
+    assert set(extractor.timings) == set(config.CSV_FILES)
+
+
+def test_concurrent_extraction_reports_a_failed_table(workspace, caplog):
+    (workspace / "data" / "stores.csv").write_text("Store ID,Country\n1,France\nnot a number,France\n")
+    assert DataExtractor().extract_data(max_workers=4) is None
+    assert "Failed to read: stores" in caplog.text
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import polars as pl
+
+from src.etl.extract import DataExtractor
+from src.etl.transform import DataTransformer
+
+
+def test_usd_measures_apply_the_rate_and_the_discount_once(workspace):
+    raw = DataExtractor().extract_data(tables=["transactions", "exchange_rates"])
+    fact = DataTransformer().transform_transactions_fact(raw["transactions"], raw["exchange_rates"])
+
+    assert fact["discount"].max() < 1
+    expected = fact.select(
+        (pl.col("quantity") * pl.col("unit_price") * pl.col("rate_to_usd")).alias("total_revenue_usd"),
+        (pl.col("quantity") * pl.col("unit_price") * pl.col("rate_to_usd") * (1 - pl.col("discount"))).alias("net_amount_usd"),
+    )
+    for column in expected.columns:
+        assert (fact[column] - expected[column]).abs().max() < 1e-9
+    assert ((fact["net_amount_usd"] + fact["discount_usd"]) - fact["total_revenue_usd"]).abs().max() < 1e-9
+
+
+def test_rows_loaded_by_older_versions_are_recomputed_once(loader, frame, transaction):
+    old = dict(transaction("INV-1", datetime(2024, 1, 1)), quantity=3, unit_price=10.0, discount=0.2,
+               rate_to_usd=2.0, unit_price_usd=20.0, total_revenue_usd=120.0,
+               net_amount_usd=119.76, discount_usd=0.24)
+    loader.connection.execute("CREATE TABLE etl_aggregates (aggregate_name VARCHAR, fact_watermark VARCHAR)")
+    loader.connection.execute("INSERT INTO etl_aggregates VALUES ('agg_daily_store_sales', '2024-01-01 00:00:00')")
+    loader.create_table("fact_transactions")
+    loader.connection.register("old_rows", frame("fact_transactions", [old]))
+    loader.connection.execute("INSERT INTO fact_transactions BY NAME SELECT * FROM old_rows")
+
+    loader.prepare_warehouse()
+    measures = "SELECT unit_price_usd, total_revenue_usd, net_amount_usd, discount_usd FROM fact_transactions"
+    assert loader.connection.execute(measures).fetchall() == [(20.0, 60.0, 48.0, 12.0)]
+    # the aggregates built from the old values are rebuilt at their next refresh
+    assert loader.connection.execute("SELECT count(*) FROM etl_aggregates").fetchone()[0] == 0
+
+    loader.connection.execute("UPDATE fact_transactions SET discount_usd = 1.0")
+    loader.prepare_warehouse()
+    assert loader.connection.execute("SELECT discount_usd FROM fact_transactions").fetchone()[0] == 1.0
@@ -0,0 +1,31 @@
+import duckdb
+import polars as pl
+
+import runpipeline
+from src.config import config
+
+
+def loaded_by(workspace):
+    """run_id of the run that last loaded each table"""
+    with duckdb.connect(str(workspace / "dw.duckdb"), read_only=True) as connection:
+        return dict(connection.execute("SELECT table_name, run_id FROM etl_source_fingerprints").fetchall())
+
+
+def test_only_tables_of_a_changed_source_are_rebuilt(workspace, monkeypatch):
+    monkeypatch.setattr(config, "SKIP_UNCHANGED_TABLES", True)
+    runpipeline.main()
+    first = loaded_by(workspace)
+    assert len(set(first.values())) == 1
+
+    pipeline = runpipeline.ETLPipeline()
+    assert pipeline.plan_tables() == []
+    pipeline.loader.disconnect()
+
+    runpipeline.main()
+    assert loaded_by(workspace) == first
+
+    source = workspace / "data" / "exchange_rates.csv"
+    pl.read_csv(source, infer_schema=False).head(40).write_csv(source)
+    runpipeline.main()
+    rebuilt = {name for name, run_id in loaded_by(workspace).items() if run_id != first[name]}
+    assert rebuilt == {"fact_transactions"}
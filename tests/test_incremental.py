@@ -0,0 +1,19 @@
+from datetime import datetime
+
+
+def test_incremental_append_at_watermark_boundary(loader, frame, transaction):
+    first = [transaction("INV-1", datetime(2024, 1, 1, 10)), transaction("INV-2", datetime(2024, 1, 2, 9))]
+    assert loader.load_dataframe(frame("fact_transactions", first), "fact_transactions", mode="incremental")
+    assert loader.get_watermark("fact_transactions") == "2024-01-02 09:00:00"
+
+    second = [
+        transaction("INV-2", datetime(2024, 1, 2, 9)),  # already loaded, at the watermark
+        transaction("INV-3", datetime(2024, 1, 2, 9)),  # new key at the watermark
+        transaction("INV-0", datetime(2024, 1, 1, 8)),  # older than the watermark
+    ]
+    assert loader.load_dataframe(frame("fact_transactions", second), "fact_transactions", mode="incremental")
+
+    invoices = loader.connection.execute(
+        "SELECT invoice_id FROM fact_transactions ORDER BY invoice_id").fetchall()
+    assert [row[0] for row in invoices] == ["INV-1", "INV-2", "INV-3"]
+    assert loader.get_watermark("fact_transactions") == "2024-01-02 09:00:00"
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from src.etl.layout import LayoutOptimizer
+
+
+def test_appended_rows_out_of_order_are_re_sorted(loader, frame, transaction):
+    first = [transaction("INV-1", datetime(2024, 1, 1)), dict(transaction("INV-2", datetime(2024, 1, 2)), store_id=2)]
+    assert loader.load_dataframe(frame("fact_transactions", first), "fact_transactions", mode="incremental")
+    optimizer = LayoutOptimizer(loader)
+    assert optimizer.optimize()["clustered"] == []
+
+    # a late line at the watermark sorts before the last stored row
+    late = [transaction("INV-3", datetime(2024, 1, 2))]
+    assert loader.load_dataframe(frame("fact_transactions", late), "fact_transactions", mode="incremental")
+    assert not optimizer.is_clustered("fact_transactions", optimizer.clustered_rows("fact_transactions"))
+
+    assert optimizer.optimize()["clustered"] == ["fact_transactions"]
+    rows = loader.connection.execute("SELECT invoice_id FROM fact_transactions ORDER BY rowid").fetchall()
+    assert [row[0] for row in rows] == ["INV-1", "INV-3", "INV-2"]
+    assert optimizer.clustered_rows("fact_transactions") == 3
+    assert optimizer.optimize()["clustered"] == []
+
+
+def test_missing_dimension_key_index_is_rebuilt(loader, frame):
+    employees = frame("dim_employees", [{"employee_id": 2, "name": "Bob"}, {"employee_id": 1, "name": "Alice"}])
+    # older runs created the dimensions with CTAS, which has no primary key
+    loader.connection.execute("CREATE TABLE dim_employees AS SELECT * FROM employees")
+    optimizer = LayoutOptimizer(loader)
+    assert not optimizer.has_primary_key("dim_employees")
+
+    assert optimizer.optimize()["rebuilt_indexes"] == ["dim_employees"]
+    assert optimizer.has_primary_key("dim_employees")
+    rows = loader.connection.execute("SELECT employee_id, name FROM dim_employees ORDER BY rowid").fetchall()
+    assert rows == [(1, "Alice"), (2, "Bob")]
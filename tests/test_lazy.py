@@ -0,0 +1,29 @@
+from datetime import date
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from src.etl.extract import DataExtractor
+from src.etl.transform import DataTransformer
+
+
+def test_date_dimension_shares_the_transactions_scan(workspace):
+    raw = DataExtractor().extract_data(lazy=True, tables=["transactions", "exchange_rates"])
+    transformer = DataTransformer()
+    plans = [transformer.transform_table(name, raw) for name in ("dim_date", "fact_transactions")]
+    assert all(isinstance(plan, pl.LazyFrame) for plan in plans)
+    assert pl.explain_all(plans).count("transactions.csv") == 1
+
+    eager = DataExtractor().extract_data(tables=["transactions"])
+    bounds = transformer.date_bounds(eager["transactions"])
+    dim_date, _ = transformer.collect_all(dict(zip(("dim_date", "fact_transactions"), plans))).values()
+    assert_frame_equal(dim_date, transformer.create_date_dimension(*bounds))
+
+
+def test_lazy_date_dimension_leaves_out_loaded_dates(workspace):
+    raw = DataExtractor().extract_data(lazy=True, tables=["transactions"])
+    transformer = DataTransformer()
+    transformer.loaded_dates = (date(2024, 1, 1), date(2024, 1, 20))
+    dates = transformer.transform_table("dim_date", raw).collect()["date"]
+    assert dates.min() > date(2024, 1, 20)
+    assert dates.is_sorted()
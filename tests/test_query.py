@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import polars as pl
+
+from src.query import WarehouseQuery
+
+
+def load_facts(loader, frame, rows):
+    assert loader.load_all_data({"fact_transactions": frame("fact_transactions", rows)})
+
+
+def test_committed_load_invalidates_cached_results(loader, frame, transaction, workspace):
+    load_facts(loader, frame, [transaction("INV-1", datetime(2024, 1, 1))])
+    loader.disconnect()
+    warehouse = WarehouseQuery(str(workspace / "dw.duckdb"))
+
+    first = warehouse.query("sales_by_currency")
+    assert first["invoices"].to_list() == [1]
+    assert warehouse.query("sales_by_currency") is first
+    assert (warehouse.hits, warehouse.misses) == (1, 1)
+
+    loader.connect()
+    load_facts(loader, frame, [transaction("INV-1", datetime(2024, 1, 1)), transaction("INV-2", datetime(2024, 1, 2))])
+    loader.disconnect()
+    assert warehouse.query("sales_by_currency")["invoices"].to_list() == [2]
+    assert warehouse.misses == 2
+
+
+def test_cached_result_is_served_while_the_warehouse_is_locked(loader, frame, transaction, workspace):
+    load_facts(loader, frame, [transaction("INV-1", datetime(2024, 1, 1))])
+    loader.disconnect()
+    warehouse = WarehouseQuery(str(workspace / "dw.duckdb"))
+    first = warehouse.query("sales_by_currency", start_date="2024-01-01")
+
+    # the pipeline holds the write lock of the warehouse and has committed a new generation
+    loader.connect()
+    loader.bump_generation()
+    assert warehouse.query("sales_by_currency", start_date="2024-01-01") is first
+    assert warehouse.query("sales_by_currency", start_date="2024-01-02") is None
+
+
+def test_least_recently_used_results_are_evicted(loader, frame, transaction, workspace):
+    load_facts(loader, frame, [transaction("INV-1", datetime(2024, 1, 1))])
+    loader.disconnect()
+    warehouse = WarehouseQuery(str(workspace / "dw.duckdb"), cache_size=2)
+    for day in ("2024-01-01", "2024-01-02", "2024-01-01", "2024-01-03"):
+        assert isinstance(warehouse.query("kpi_summary", start_date=day), pl.DataFrame)
+    assert [dict(key[1])["start_date"] for key in warehouse._cache] == ["2024-01-01", "2024-01-03"]
@@ -0,0 +1,37 @@
+import os
+
+import duckdb
+import polars as pl
+import pytest
+
+import runpipeline
+from src.config import config
+from src.etl.resources import ResourceGovernor
+
+
+def test_batches_are_sized_to_the_budget_with_a_floor(workspace):
+    assert ResourceGovernor().batch_rows("transactions") == config.BATCH_SIZE
+    assert ResourceGovernor(max_memory_gb=0.0001).batch_rows("transactions") == ResourceGovernor.MIN_BATCH_ROWS
+    assert ResourceGovernor(max_memory_gb=0.5).batch_rows("transactions") > ResourceGovernor(max_memory_gb=0.1).batch_rows("transactions")
+
+
+def test_polars_streaming_chunks_follow_the_budget(workspace):
+    with pl.Config():
+        assert ResourceGovernor().configure_polars() is None
+        rows = ResourceGovernor(max_memory_gb=0.1, threads=4).configure_polars()
+        assert rows == ResourceGovernor(max_memory_gb=0.1).batch_rows("transactions") // 4
+        assert os.environ["POLARS_IDEAL_MORSEL_SIZE"] == str(rows)
+
+
+@pytest.mark.parametrize("settings", [{}, {"PIPELINED_LOAD": True}, {"ETL_ENGINE": "duckdb"}, {"ETL_ENGINE": "compare"}])
+def test_warehouse_out_of_memory_fails_the_run_cleanly(workspace, monkeypatch, settings):
+    monkeypatch.setattr(config, "MAX_MEMORY_GB", 0.0001)
+    for name, value in settings.items():
+        monkeypatch.setattr(config, name, value)
+    with pl.Config():
+        runpipeline.main()
+
+    monkeypatch.setattr(config, "MAX_MEMORY_GB", None)
+    with duckdb.connect(str(workspace / "dw.duckdb")) as connection:
+        tables = {row[0] for row in connection.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+    assert "fact_transactions" not in tables
@@ -0,0 +1,44 @@
+import os
+
+import duckdb
+import polars as pl
+
+import runpipeline
+from src.config import config
+from src.etl.load_std import DataLoader
+from src.etl.snapshot import SnapshotManager
+
+
+def fact_rows(workspace):
+    with duckdb.connect(str(workspace / "dw.duckdb"), read_only=True) as connection:
+        return connection.execute("SELECT count(*) FROM fact_transactions").fetchone()[0]
+
+
+def fail_to_load(self, transformed_data, batches=None):
+    return False
+
+
+def test_failed_load_keeps_the_published_snapshot_and_rollback_restores_the_previous(workspace, monkeypatch):
+    monkeypatch.setattr(config, "SNAPSHOT_MODE", True)
+    source = workspace / "data" / "transactions.csv"
+    full = pl.read_csv(source, infer_schema=False)
+    runpipeline.main()
+    first = os.path.realpath(workspace / "dw.duckdb")
+
+    full.head(200).write_csv(source)
+    runpipeline.main()
+    assert os.path.islink(workspace / "dw.duckdb")
+    second = os.path.realpath(workspace / "dw.duckdb")
+    assert second != first
+    assert fact_rows(workspace) == 200
+
+    with monkeypatch.context() as patch:
+        patch.setattr(DataLoader, "load_all_data", fail_to_load)
+        runpipeline.main()
+    assert os.path.realpath(workspace / "dw.duckdb") == second
+    assert SnapshotManager(DataLoader()).snapshots() == [first, second]
+
+    generation = DataLoader.read_generation(f"{workspace / 'dw.duckdb'}.generation")
+    assert SnapshotManager(DataLoader()).rollback() == first
+    assert fact_rows(workspace) == len(full)
+    assert DataLoader.read_generation(f"{workspace / 'dw.duckdb'}.generation") == generation + 1
@@ -0,0 +1,43 @@
+from polars.testing import assert_frame_equal
+
+from src.etl.extract import DataExtractor
+from src.etl.transform import DataTransformer
+
+
+def dependencies(graph):
+    return {name: depends_on for name, (_, depends_on) in graph.tasks.items()}
+
+
+def test_fact_and_date_tasks_depend_on_their_prepared_inputs(workspace):
+    raw = DataExtractor().extract_data()
+    graph = dependencies(DataTransformer().task_graph(raw))
+    assert graph["exchange_rates_usd"] == ["exchange_rates"]
+    assert graph["transaction_dates"] == ["transactions"]
+    assert graph["fact_transactions"] == ["transactions", "exchange_rates_usd"]
+    assert graph["dim_date"] == ["transaction_dates"]
+    assert graph["dim_products"] == ["products"]
+
+    # lazy dim_date is planned over the transactions scan shared with the fact table
+    lazy = dependencies(DataTransformer().task_graph(DataExtractor().extract_data(lazy=True)))
+    assert lazy["dim_date"] == ["transactions"]
+    assert "transaction_dates" not in lazy
+
+
+def test_exchange_rates_are_prepared_once(workspace, monkeypatch):
+    raw = DataExtractor().extract_data()
+    transformer = DataTransformer()
+    prepare = transformer.prepare_exchange_rates
+    calls = []
+    monkeypatch.setattr(transformer, "prepare_exchange_rates", lambda rates: calls.append(1) or prepare(rates))
+
+    tables = dict(transformer.iter_transform_data(raw))
+    assert len(calls) == 1
+    assert set(tables) == set(DataTransformer.TABLE_SOURCES)
+    assert "exchange_rates_usd" in transformer.task_timings
+
+    # same tables as transforming straight from the raw sources
+    reference = DataTransformer()
+    for name in ("fact_transactions", "dim_date"):
+        stamps = ["created_at", "updated_at"]
+        assert_frame_equal(tables[name].drop(stamps, strict=False),
+                           reference.transform_table(name, raw).drop(stamps, strict=False))